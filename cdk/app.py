@@ -75,6 +75,8 @@ class MCPServerStack(Stack):
             **config.get('clickhouse', {}),
             "ACCESS_TOKEN_SECRET": config.get('SERVICE_SECRETS', {}).get('TEST_ACCESS_TOKEN_SECRET' if is_dev else 'PROD_ACCESS_TOKEN_SECRET', ''),
             "ENV": config.get('deployment', {}).get('ENV', 'dev'),
+            # One worker process per vCPU of the instance type below.
+            "MCP_WORKERS": config.get('deployment', {}).get('WORKERS', '2'),
         }
         
         # Create option settings
@@ -114,6 +116,40 @@ class MCPServerStack(Stack):
                 option_name="MaxSize",
                 value="4"
             ),
+            # SSE sessions live on one instance; pin clients that keep the ALB cookie
+            # to it. Clients without cookies should use the stateless /mcp endpoint.
+            elasticbeanstalk.CfnEnvironment.OptionSettingProperty(
+                namespace="aws:elasticbeanstalk:environment:process:default",
+                option_name="StickinessEnabled",
+                value="true"
+            ),
+            elasticbeanstalk.CfnEnvironment.OptionSettingProperty(
+                namespace="aws:elasticbeanstalk:environment:process:default",
+                option_name="StickinessLBCookieDuration",
+                value="86400"
+            ),
+            # Only route to instances that have opened their ClickHouse connections and
+            # loaded the schema index; /readyz answers 503 until then.
+            elasticbeanstalk.CfnEnvironment.OptionSettingProperty(
+                namespace="aws:elasticbeanstalk:environment:process:default",
+                option_name="HealthCheckPath",
+                value="/readyz"
+            ),
+            elasticbeanstalk.CfnEnvironment.OptionSettingProperty(
+                namespace="aws:elasticbeanstalk:environment:process:default",
+                option_name="HealthCheckInterval",
+                value="10"
+            ),
+            elasticbeanstalk.CfnEnvironment.OptionSettingProperty(
+                namespace="aws:elasticbeanstalk:environment:process:default",
+                option_name="HealthyThresholdCount",
+                value="2"
+            ),
+            elasticbeanstalk.CfnEnvironment.OptionSettingProperty(
+                namespace="aws:elasticbeanstalk:application",
+                option_name="Application Healthcheck URL",
+                value="/readyz"
+            ),
             elasticbeanstalk.CfnEnvironment.OptionSettingProperty(
                 namespace="aws:elasticbeanstalk:environment:proxy",
                 option_name="ProxyServer",
@@ -0,0 +1,208 @@
+import math
+import time
+import asyncio
+import contextvars
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Deque, Dict, Mapping, Optional, Tuple
+
+ANONYMOUS = "anonymous"
+
+# Tenant of the request being served, set by the auth middleware from the token's
+# claims. Tool calls of an SSE session run in tasks started under its /sse request,
+# so they see the tenant that opened the session.
+current_tenant: contextvars.ContextVar[str] = contextvars.ContextVar("current_tenant", default=ANONYMOUS)
+
+
+def tenant_id(claims: Mapping[str, Any]) -> str:
+    """Identify a tenant by its token's issuer and subject."""
+    return f"{claims.get('iss', '')}:{claims.get('sub', '')}"
+
+
+class AdmissionRejected(Exception):
+    """Raised when a tenant's query is shed; `retry_after` is a suggested wait in seconds."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class _TokenBucket:
+    __slots__ = ("rate", "burst", "tokens", "updated_at")
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated_at = time.monotonic()
+
+    def take(self) -> float:
+        """Take a token; returns 0, or the seconds until one is available."""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class _Tenant:
+    __slots__ = ("name", "weight", "current_weight", "running", "queue", "bucket", "admitted", "rejected", "wait_total", "hold_ewma")
+
+    def __init__(self, name: str, weight: int, bucket: Optional[_TokenBucket]):
+        self.name = name
+        self.weight = weight
+        self.current_weight = 0
+        self.running = 0
+        self.queue: Deque[Tuple["asyncio.Future[None]", float]] = deque()
+        self.bucket = bucket
+        self.admitted = 0
+        self.rejected = 0
+        self.wait_total = 0.0
+        self.hold_ewma = 1.0
+
+
+class TenantScheduler:
+    """
+    Admits ClickHouse work per tenant.
+
+    At most `capacity` queries run at once overall and `max_concurrency` per
+    tenant (by default half the capacity, so one tenant can't take every slot); `rate` (queries per second, with bursts of `burst`) caps how fast a
+    tenant may start them. Work over those limits waits in a per-tenant queue of
+    at most `queue_limit` entries, and freed slots go to queued tenants by smooth
+    weighted round-robin, so a busy tenant can't starve the others. Beyond the
+    queue limit, or past the rate, calls are rejected with a retry-after hint.
+    """
+
+    def __init__(
+        self,
+        capacity: int,
+        max_concurrency: Optional[int] = None,
+        queue_limit: int = 20,
+        rate: float = 0.0,
+        burst: Optional[float] = None,
+        weights: Optional[Mapping[str, int]] = None,
+        on_wait=None,
+    ):
+        self.capacity = capacity
+        self.max_concurrency = max_concurrency if max_concurrency is not None else max(1, capacity // 2)
+        self.queue_limit = queue_limit
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1.0, rate)
+        self.weights = dict(weights or {})
+        # Called with (tenant, seconds) for every admitted call.
+        self.on_wait = on_wait
+        self._tenants: Dict[str, _Tenant] = {}
+        self._running = 0
+
+    def _tenant(self, name: str) -> _Tenant:
+        tenant = self._tenants.get(name)
+        if tenant is None:
+            bucket = _TokenBucket(self.rate, self.burst) if self.rate > 0 else None
+            tenant = self._tenants[name] = _Tenant(name, max(1, int(self.weights.get(name, 1))), bucket)
+        return tenant
+
+    def _eligible(self, tenant: _Tenant) -> bool:
+        return tenant.running < self.max_concurrency
+
+    @asynccontextmanager
+    async def slot(self, name: str, timeout: Optional[float] = None):
+        """Hold one of the tenant's query slots for the duration of the block."""
+        tenant = await self.acquire(name, timeout)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            tenant.hold_ewma = 0.8 * tenant.hold_ewma + 0.2 * (time.monotonic() - started)
+            self.release(tenant)
+
+    async def acquire(self, name: str, timeout: Optional[float] = None) -> _Tenant:
+        tenant = self._tenant(name)
+        if tenant.bucket is not None:
+            wait = tenant.bucket.take()
+            if wait:
+                tenant.rejected += 1
+                raise AdmissionRejected(f"Rate limit of {self.rate:g} queries/s exceeded", retry_after=wait)
+
+        if self._running < self.capacity and self._eligible(tenant) and not tenant.queue:
+            self._start(tenant, 0.0)
+            return tenant
+
+        if len(tenant.queue) >= self.queue_limit:
+            tenant.rejected += 1
+            raise AdmissionRejected(
+                f"Too many queued queries ({len(tenant.queue)}); retry later",
+                retry_after=self._retry_after(tenant),
+            )
+
+        future = asyncio.get_running_loop().create_future()
+        entry = (future, time.monotonic())
+        tenant.queue.append(entry)
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout)
+        except (asyncio.CancelledError, asyncio.TimeoutError) as e:
+            if future.done() and not future.cancelled():
+                # The slot was granted as we gave up; hand it on.
+                self.release(tenant)
+            else:
+                future.cancel()
+                tenant.queue.remove(entry)
+            if isinstance(e, asyncio.TimeoutError):
+                tenant.rejected += 1
+                raise AdmissionRejected(f"No query slot became free within {timeout:g}s", retry_after=self._retry_after(tenant))
+            raise
+        return tenant
+
+    def _start(self, tenant: _Tenant, waited: float):
+        tenant.running += 1
+        tenant.admitted += 1
+        tenant.wait_total += waited
+        self._running += 1
+        if self.on_wait is not None:
+            self.on_wait(tenant.name, waited)
+
+    def release(self, tenant: _Tenant):
+        tenant.running -= 1
+        self._running -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        while self._running < self.capacity:
+            tenant = self._next_tenant()
+            if tenant is None:
+                return
+            future, enqueued_at = tenant.queue.popleft()
+            self._start(tenant, time.monotonic() - enqueued_at)
+            future.set_result(None)
+
+    def _next_tenant(self) -> Optional[_Tenant]:
+        """Smooth weighted round-robin over tenants with queued work and a free slot."""
+        candidates = [tenant for tenant in self._tenants.values() if tenant.queue and self._eligible(tenant)]
+        if not candidates:
+            return None
+        total = 0
+        best = None
+        for tenant in candidates:
+            tenant.current_weight += tenant.weight
+            total += tenant.weight
+            if best is None or tenant.current_weight > best.current_weight:
+                best = tenant
+        best.current_weight -= total
+        return best
+
+    def _retry_after(self, tenant: _Tenant) -> float:
+        """Rough time until this tenant's queue has room: its backlog over its slots, by recent hold time."""
+        return max(1.0, math.ceil(tenant.hold_ewma * (len(tenant.queue) + 1) / self.max_concurrency))
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            name: {
+                "running": tenant.running,
+                "queued": len(tenant.queue),
+                "admitted": tenant.admitted,
+                "rejected": tenant.rejected,
+                "wait_seconds_total": round(tenant.wait_total, 3),
+            }
+            for name, tenant in self._tenants.items()
+        }
@@ -0,0 +1,474 @@
+"""
+Approximate answers for exploratory aggregation queries.
+
+`approximate_query` rewrites a SELECT in two ways:
+
+- Exact aggregates with cheaper approximate versions are replaced by them:
+  `count(DISTINCT x)` and `uniqExact` by `uniq`, `quantileExact` and
+  `medianExact` by their t-digest versions.
+- An aggregation over a single table that has a sampling key and enough rows
+  reads a `SAMPLE` of it. Counts and sums are scaled back up with ClickHouse's
+  `_sample_factor`; averages and quantiles need no scaling. Any other aggregate,
+  or combinator a sample can't estimate (min, max, distinct counts, `sumOrNull`,
+  `-State`...), keeps the query unsampled.
+
+Columns whose expression changed keep their name as written. A sampled query
+also counts the rows it read for each result row, and adds up the sampled values
+(and their squares) behind each scaled count and sum it selects;
+`Approximation.finish` drops those columns and turns them into error estimates.
+"""
+import math
+import statistics
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from query_profile import quote_identifier
+from result_format import QueryData
+from sql_lexer import tokenize
+
+SAMPLE_ROWS_COLUMN = "_sample_rows"
+# Sampled values (and their squares) behind the n-th scaled count or sum selected.
+SAMPLE_SUM_COLUMN = "_sample_{}_sum"
+SAMPLE_SQUARES_COLUMN = "_sample_{}_squares"
+
+# Exact aggregates (lower case) and the approximate functions that replace them.
+SUBSTITUTES = {
+    "uniqexact": "uniq",
+    "countdistinct": "uniq",
+    "quantileexact": "quantileTDigest",
+    "quantilesexact": "quantilesTDigest",
+    "medianexact": "medianTDigest",
+}
+
+FUNCTION_ERRORS = {
+    "uniq": "exact up to 65536 distinct values, typically within 1% above that",
+    "quantileTDigest": "rank error typically within 1%",
+    "quantilesTDigest": "rank error typically within 1%",
+    "medianTDigest": "rank error typically within 1%",
+}
+
+# ClickHouse aggregate and window functions (lower case). Only the ones below are
+# estimated from a sample: counts and sums once scaled (just the forms `_scaled`
+# rewrites), averages, quantiles and moments as they are. Any other aggregate
+# (extremes, distinct counts, particular rows, states...) keeps the query unsampled.
+_AGGREGATES = frozenset(name.lower() for name in """
+    count sum avg avgWeighted min max any anyLast anyHeavy any_value anyRespectNulls
+    anyLastRespectNulls first_value last_value argMin argMax singleValueOrNull
+    stddevPop stddevSamp stddevPopStable stddevSampStable varPop varSamp varPopStable
+    varSampStable covarPop covarSamp covarPopStable covarSampStable corr corrStable
+    corrMatrix covarPopMatrix covarSampMatrix skewPop skewSamp kurtPop kurtSamp
+    sumWithOverflow sumKahan sumCount sumMap sumMapWithOverflow minMap maxMap deltaSum
+    deltaSumTimestamp uniq uniqExact uniqCombined uniqCombined64 uniqHLL12 uniqTheta
+    uniqUpTo topK topKWeighted approx_top_k approx_top_sum groupArray groupArrayLast
+    groupArraySample groupArraySorted groupArrayInsertAt groupArrayMovingAvg
+    groupArrayMovingSum groupArrayIntersect groupUniqArray groupConcat groupBitAnd
+    groupBitOr groupBitXor groupBitmap groupBitmapAnd groupBitmapOr groupBitmapXor
+    histogram entropy rankCorr boundingRatio contingency cramersV cramersVBiasCorrected
+    theilsU categoricalInformationValue simpleLinearRegression
+    stochasticLinearRegression stochasticLogisticRegression studentTTest welchTTest
+    meanZTest mannWhitneyUTest kolmogorovSmirnovTest analysisOfVariance
+    exponentialMovingAverage intervalLengthSum maxIntersections maxIntersectionsPosition
+    sequenceMatch sequenceCount sequenceNextNode windowFunnel retention sparkbar
+    largestTriangleThreeBuckets flameGraph nothing nothingNull
+    quantile quantiles quantileExact quantilesExact quantileExactLow quantilesExactLow
+    quantileExactHigh quantilesExactHigh quantileExactExclusive quantilesExactExclusive
+    quantileExactInclusive quantilesExactInclusive quantileExactWeighted
+    quantilesExactWeighted quantileExactWeightedInterpolated
+    quantilesExactWeightedInterpolated quantileInterpolatedWeighted
+    quantilesInterpolatedWeighted quantileTiming quantilesTiming quantileTimingWeighted
+    quantilesTimingWeighted quantileDeterministic quantilesDeterministic quantileTDigest
+    quantilesTDigest quantileTDigestWeighted quantilesTDigestWeighted quantileBFloat16
+    quantilesBFloat16 quantileBFloat16Weighted quantilesBFloat16Weighted quantileDD
+    quantilesDD quantileGK quantilesGK median medianExact medianExactLow medianExactHigh
+    medianExactWeighted medianInterpolatedWeighted medianTiming medianTimingWeighted
+    medianDeterministic medianTDigest medianTDigestWeighted medianBFloat16
+    medianBFloat16Weighted medianDD medianGK
+    row_number rank dense_rank percent_rank cume_dist ntile nth_value lagInFrame leadInFrame
+""".split())
+
+_SCALED = frozenset({"count", "sum"})
+_UNSCALED = frozenset(name.lower() for name in """
+    avgWeighted stddevPop stddevSamp stddevPopStable stddevSampStable varPop varSamp
+    varPopStable varSampStable covarPop covarSamp covarPopStable covarSampStable corr corrStable
+""".split())
+_UNSCALED_PREFIXES = ("avg", "quantile", "median")
+
+# Combinator suffixes (lower case, longest first where one ends another), and the
+# ones that leave an aggregate's estimate from a sample as it was.
+_COMBINATORS = (
+    "simplestate", "mergestate", "state", "merge", "ordefault", "ornull", "if", "array",
+    "foreach", "distinct", "resample", "map", "argmin", "argmax",
+)
+_KEEPS_ESTIMATE = frozenset({"if", "ornull", "ordefault", "array", "foreach"})
+# Words that end a table reference (after the name and an optional alias).
+_CLAUSES = frozenset("""
+    AS FINAL SAMPLE PREWHERE WHERE GROUP ORDER LIMIT HAVING SETTINGS FORMAT WITH
+    UNION JOIN INNER LEFT RIGHT FULL CROSS ARRAY GLOBAL ANY ALL ASOF SEMI ANTI USING
+    INTERSECT EXCEPT OFFSET WINDOW QUALIFY
+""".split())
+
+_SELECT_END = frozenset({"FROM", "WHERE", "PREWHERE", "GROUP", "ORDER", "LIMIT", "HAVING", "SETTINGS", "FORMAT", "UNION"})
+
+# Two-sided 95% normal quantile.
+_Z95 = 1.96
+
+
+def _split_combinators(name: str) -> Tuple[str, List[str]]:
+    """An aggregate's base name and combinator suffixes, e.g. `sumArrayIf` -> ("sum", ["array", "if"])."""
+    base, combinators = name.lower(), []
+    while base not in _AGGREGATES:
+        suffix = next((s for s in _COMBINATORS if base.endswith(s) and len(base) > len(s)), None)
+        if suffix is None:
+            return name.lower(), []
+        base, combinators = base[:-len(suffix)], [suffix] + combinators
+    return base, combinators
+
+
+def aggregate_kind(name: str) -> Optional[str]:
+    """Classify an aggregate as "scaled", "unscaled" or "unsampleable"; None for other functions."""
+    base, combinators = _split_combinators(name)
+    if base in _SCALED:
+        return "scaled" if combinators in ([], ["if"]) else "unsampleable"
+    if base in _UNSCALED or base.startswith(_UNSCALED_PREFIXES):
+        return "unscaled" if set(combinators) <= _KEEPS_ESTIMATE else "unsampleable"
+    if base in _AGGREGATES:
+        return "unsampleable"
+    return None
+
+
+class Approximation:
+    """A rewritten query and what was approximated; `finish` completes its result."""
+
+    def __init__(
+        self,
+        sql: str,
+        sample_ratio: Optional[float] = None,
+        table: Optional[str] = None,
+        substitutions: Sequence[str] = (),
+        notes: Sequence[str] = (),
+        estimates: Sequence[Tuple[str, bool]] = (),
+    ):
+        self.sql = sql
+        self.sample_ratio = sample_ratio
+        self.table = table
+        self.substitutions = list(substitutions)
+        self.notes = list(notes)
+        # (expression, is a sum) of each scaled count and sum selected, in SAMPLE_SUM_COLUMN order.
+        self.estimates = list(estimates)
+
+    def finish(self, data: QueryData) -> Tuple[QueryData, Dict[str, Any]]:
+        """Drop the sample columns from a result and describe the approximation, with error estimates."""
+        info: Dict[str, Any] = {
+            "sample_ratio": self.sample_ratio,
+            "table": self.table,
+            "substitutions": self.substitutions,
+            "function_errors": {
+                name: FUNCTION_ERRORS[name]
+                for name in dict.fromkeys(s.split(" -> ")[1] for s in self.substitutions)
+                if name in FUNCTION_ERRORS
+            },
+            "notes": list(self.notes),
+            "sql": self.sql,
+        }
+        # A new result either way: `data` may be shared with the result cache.
+        names, columns = list(data.column_names), list(data.columns)
+
+        def pop(name: str) -> Optional[List[float]]:
+            if name not in names:
+                return None
+            index = names.index(name)
+            del names[index]
+            return [float(value or 0) for value in columns.pop(index)]
+
+        sampled = self.sample_ratio is not None and SAMPLE_ROWS_COLUMN in names
+        counts = pop(SAMPLE_ROWS_COLUMN) if sampled else None
+        moments = [
+            (expression, pop(SAMPLE_SUM_COLUMN.format(n)), pop(SAMPLE_SQUARES_COLUMN.format(n)) if is_sum else None)
+            for n, (expression, is_sum) in enumerate(self.estimates)
+        ]
+        finished = QueryData(names, columns)
+        finished.stats = dict(data.stats)
+        if not sampled:
+            return finished, info
+
+        info["sampled_rows"] = int(sum(counts))
+        bounds = {}
+        for expression, totals, squares in moments:
+            if not totals:
+                continue
+            errors = [relative_error(total, self.sample_ratio, square) for total, square in zip(totals, squares or totals)]
+            bounds[expression] = {"median": round(statistics.median(errors), 4), "max": round(max(errors), 4)}
+        if bounds:
+            info["relative_error_95"] = bounds
+        info["notes"].append(
+            "Counts and sums are scaled estimates; relative_error_95 gives, for each one selected, the median "
+            "and largest 95% relative error over result rows, estimated from the sampled values and assuming "
+            "rows are sampled independently (more error when many rows share a sampling key value). "
+            "Averages and quantiles are computed over the sample."
+        )
+        return finished, info
+
+
+def relative_error(total: float, ratio: float, squares: Optional[float] = None) -> float:
+    """
+    95% relative error of a sum scaled up from a sample read at `ratio`, whose values
+    add up to `total` and their squares to `squares`. For a count, both are the
+    number of rows counted, which is the default.
+    """
+    squares = total if squares is None else squares
+    if total == 0:
+        return math.inf
+    return _Z95 * math.sqrt((1 - ratio) * squares) / abs(total)
+
+
+class _Query:
+    """Tokens of a query, with paren depth and significant (non-space, non-comment) positions."""
+
+    def __init__(self, sql: str):
+        self.tokens = tokenize(sql)
+        self.texts = [text for _, text in self.tokens]
+        self.sig = [i for i, (kind, _) in enumerate(self.tokens) if kind not in ("space", "comment")]
+        self.depth: List[int] = []
+        self.closing: Dict[int, int] = {}
+        self.balanced = True
+        opened: List[int] = []
+        for i, (kind, text) in enumerate(self.tokens):
+            self.depth.append(len(opened))
+            if kind == "other" and text == "(":
+                opened.append(i)
+            elif kind == "other" and text == ")":
+                if not opened:
+                    self.balanced = False
+                    return
+                self.closing[opened.pop()] = i
+        self.balanced = not opened
+
+    def word(self, i: int) -> str:
+        kind, text = self.tokens[i]
+        return text.upper() if kind == "word" else ""
+
+    def is_text(self, i: int, text: str) -> bool:
+        return self.tokens[i][0] == "other" and self.tokens[i][1] == text
+
+    def next_sig(self, i: int) -> Optional[int]:
+        for j in range(i + 1, len(self.tokens)):
+            if self.tokens[j][0] not in ("space", "comment"):
+                return j
+        return None
+
+    def calls(self) -> List[Tuple[int, int, int]]:
+        """(name, opening paren, closing paren) of each function call; for parametric calls, the argument parens."""
+        calls = []
+        for i in self.sig:
+            following = self.next_sig(i)
+            if self.tokens[i][0] != "word" or following is None or not self.is_text(following, "("):
+                continue
+            opening = following
+            closing = self.closing[opening]
+            after = self.next_sig(closing)
+            if after is not None and self.is_text(after, "("):
+                opening, closing = after, self.closing[after]
+            calls.append((i, opening, closing))
+        return calls
+
+    def arguments(self, opening: int, closing: int) -> List[str]:
+        """The current (rewritten) text of each argument between these parens."""
+        arguments, current = [], []
+        for i in range(opening + 1, closing):
+            if self.is_text(i, ",") and self.depth[i] == self.depth[opening] + 1:
+                arguments.append("".join(current).strip())
+                current = []
+            else:
+                current.append(self.texts[i])
+        arguments.append("".join(current).strip())
+        return arguments
+
+    def replace(self, start: int, end: int, text: str):
+        """Replace tokens `start` to `end` (inclusive) with `text`."""
+        self.texts[start] = text
+        for i in range(start + 1, end + 1):
+            self.texts[i] = ""
+
+    def select_items(self) -> List[Tuple[int, int]]:
+        """Token ranges `[start, end)` of the outermost SELECT's expressions."""
+        select = next((i for i in self.sig if self.depth[i] == 0 and self.word(i) == "SELECT"), None)
+        if select is None:
+            return []
+        start = select + 1
+        following = self.next_sig(select)
+        if following is not None and self.word(following) == "DISTINCT":
+            start = following + 1
+        end = next((i for i in self.sig if i > start and self.depth[i] == 0 and self.word(i) in _SELECT_END), len(self.tokens))
+        items, item_start = [], start
+        for i in range(start, end):
+            if self.depth[i] == 0 and self.is_text(i, ","):
+                items.append((item_start, i))
+                item_start = i + 1
+        items.append((item_start, end))
+        return items
+
+    def has_alias(self, start: int, end: int) -> bool:
+        sig = [i for i in self.sig if start <= i < end]
+        if any(self.depth[i] == 0 and self.word(i) == "AS" for i in sig):
+            return True
+        if len(sig) < 2 or self.tokens[sig[-1]][0] not in ("word", "quoted"):
+            return False
+        previous = sig[-2]
+        return self.is_text(previous, ")") or self.tokens[previous][0] in ("word", "quoted", "number")
+
+
+def _table_reference(query: _Query) -> Tuple[Optional[str], Optional[int], Optional[str]]:
+    """The table an aggregation reads, and the token after which SAMPLE goes; or why it can't be sampled."""
+    if not query.sig or query.word(query.sig[0]) != "SELECT":
+        return None, None, "only plain SELECT queries are sampled"
+    words = [query.word(i) for i in query.sig]
+    if words.count("SELECT") > 1 or {"JOIN", "UNION", "SAMPLE", "ARRAY", "INTERSECT", "EXCEPT"} & set(words):
+        return None, None, "only single-table queries without joins, unions or subqueries are sampled"
+    from_index = next((i for i in query.sig if query.depth[i] == 0 and query.word(i) == "FROM"), None)
+    name_index = query.next_sig(from_index) if from_index is not None else None
+    if name_index is None or query.tokens[name_index][0] not in ("word", "quoted"):
+        return None, None, "only queries reading a table are sampled"
+    name, last = query.tokens[name_index][1], name_index
+    following = query.next_sig(last)
+    if following is not None and query.is_text(following, "("):
+        return None, None, "table functions are not sampled"
+    if following is not None and query.is_text(following, "."):
+        table = query.next_sig(following)
+        if table is None:
+            return None, None, "only queries reading a table are sampled"
+        name, last = name + "." + query.tokens[table][1], table
+        following = query.next_sig(last)
+    if following is not None and query.word(following) == "AS":
+        last = query.next_sig(following) or following
+        following = query.next_sig(last)
+    elif following is not None and query.tokens[following][0] in ("word", "quoted") and query.word(following) not in _CLAUSES:
+        last = following
+        following = query.next_sig(last)
+    if following is not None and query.word(following) == "FINAL":
+        last = following
+    return name, last, None
+
+
+def _scaled(name: str, arguments: List[str]) -> Optional[str]:
+    """A count or sum scaled by the sample factor, or None for arguments it doesn't expect."""
+    name = name.lower()
+    if name == "count" and arguments in ([""], ["*"]):
+        return "round(sum(_sample_factor))"
+    if name == "count" and len(arguments) == 1:
+        return f"round(sumIf(_sample_factor, ({arguments[0]}) IS NOT NULL))"
+    if name == "countif" and len(arguments) == 1:
+        return f"round(sumIf(_sample_factor, {arguments[0]}))"
+    if name == "sum" and len(arguments) == 1:
+        return f"sum(({arguments[0]}) * _sample_factor)"
+    if name == "sumif" and len(arguments) == 2:
+        return f"sumIf(({arguments[0]}) * _sample_factor, {arguments[1]})"
+    return None
+
+
+def _moments(name: str, arguments: List[str]) -> Tuple[str, Optional[str]]:
+    """Sample sum behind a scaled count or sum, and for sums the sum of squares; see `_scaled`."""
+    name = name.lower()
+    if name == "count":
+        return f"count({arguments[0]})", None
+    if name == "countif":
+        return f"countIf({arguments[0]})", None
+    if name == "sum":
+        return f"sum({arguments[0]})", f"sum(pow({arguments[0]}, 2))"
+    return f"sumIf({arguments[0]}, {arguments[1]})", f"sumIf(pow({arguments[0]}, 2), {arguments[1]})"
+
+
+def approximate_query(
+    sql: str,
+    describe_table: Callable[[str], Optional[Dict[str, Any]]],
+    sample_ratio: float = 0.1,
+    min_rows: int = 1_000_000,
+) -> Approximation:
+    """
+    Rewrite `sql` to answer approximately. `describe_table` returns a table's
+    schema entry ("sampling_key", "total_rows"); tables with fewer than `min_rows`
+    rows are read in full.
+    """
+    query = _Query(sql)
+    if not query.balanced:
+        return Approximation(sql, notes=["Not rewritten: unbalanced parentheses"])
+    original = list(query.texts)
+    calls = query.calls()
+
+    substitutions = []
+    for name, opening, _ in calls:
+        lower = query.texts[name].lower()
+        first = query.next_sig(opening)
+        if lower == "count" and first is not None and query.word(first) == "DISTINCT":
+            query.texts[name] = "uniq"
+            query.replace(first, query.next_sig(first) - 1, "")
+            substitutions.append("count(DISTINCT) -> uniq")
+        elif lower in SUBSTITUTES:
+            query.texts[name] = SUBSTITUTES[lower]
+            substitutions.append(f"{query.tokens[name][1]} -> {SUBSTITUTES[lower]}")
+
+    table, sample_after, reason = _table_reference(query)
+    kinds = [(query.texts[name], aggregate_kind(query.texts[name])) for name, _, _ in calls]
+    info = None
+    if reason is None:
+        unsampleable = sorted({name for name, kind in kinds if kind == "unsampleable"})
+        info = describe_table(table)
+        if unsampleable:
+            reason = f"{', '.join(unsampleable)} can't be estimated from a sample"
+        elif not any(kind in ("scaled", "unscaled") for _, kind in kinds):
+            reason = "no counts, sums, averages or quantiles to estimate"
+        elif info is None:
+            reason = f"unknown table {table}"
+        elif not info.get("sampling_key"):
+            reason = f"table {info['name']} has no sampling key"
+        elif (info.get("total_rows") or 0) < min_rows:
+            reason = f"table {info['name']} has fewer than {min_rows} rows"
+
+    substituted = list(query.texts)
+    sampled = reason is None
+    items = query.select_items()
+    selected: Dict[int, Tuple[str, bool, str, Optional[str]]] = {}
+    if sampled:
+        # Innermost calls first, so an enclosing call's arguments include their rewrite.
+        for name, opening, closing in reversed(calls):
+            if aggregate_kind(query.texts[name]) != "scaled":
+                continue
+            arguments = query.arguments(opening, closing)
+            rewritten = _scaled(query.texts[name], arguments)
+            if rewritten is None:
+                sampled, reason = False, f"unexpected arguments to {query.texts[name]}"
+                break
+            if any(start <= name < end for start, end in items):
+                total, squares = _moments(query.texts[name], arguments)
+                expression = " ".join("".join(original[name:closing + 1]).split())
+                selected[name] = (expression, squares is not None, total, squares)
+            query.replace(name, closing, rewritten)
+    if not sampled:
+        query.texts = substituted
+    estimates: Dict[str, Tuple[bool, str, Optional[str]]] = {}
+    for name in sorted(selected):
+        expression, is_sum, total, squares = selected[name]
+        estimates.setdefault(expression, (is_sum, total, squares))
+
+    for start, end in items:
+        before = "".join(original[start:end]).strip()
+        if before != "".join(query.texts[start:end]).strip() and not query.has_alias(start, end):
+            last = max(i for i in query.sig if start <= i < end)
+            query.texts[last] += f" AS {quote_identifier(' '.join(before.split()))}"
+    notes = []
+    if sampled:
+        last = max(i for i in query.sig if items[-1][0] <= i < items[-1][1])
+        query.texts[last] += f", count() AS {SAMPLE_ROWS_COLUMN}"
+        for n, (is_sum, total, squares) in enumerate(estimates.values()):
+            query.texts[last] += f", {total} AS {SAMPLE_SUM_COLUMN.format(n)}"
+            if is_sum:
+                query.texts[last] += f", {squares} AS {SAMPLE_SQUARES_COLUMN.format(n)}"
+        query.texts[sample_after] += f" SAMPLE {sample_ratio:g}"
+    else:
+        notes.append(f"Not sampled: {reason}")
+    return Approximation(
+        "".join(query.texts),
+        sample_ratio=sample_ratio if sampled else None,
+        table=info["name"] if sampled else None,
+        substitutions=list(dict.fromkeys(substitutions)),
+        notes=notes,
+        estimates=[(expression, is_sum) for expression, (is_sum, _, _) in estimates.items()] if sampled else (),
+    )
@@ -0,0 +1,87 @@
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence
+
+import jwt
+
+
+class TokenVerifier:
+    """
+    Verifies HS256 bearer tokens and caches the verified claims.
+
+    Tokens are cached by their SHA-256 digest until their `exp` claim (tokens
+    without `exp` for at most `max_cache_ttl` seconds), so reconnecting agents
+    skip signature verification. Several secrets may be active at once to allow
+    rotation: tokens are accepted if any of them verifies the signature.
+    """
+
+    def __init__(
+        self,
+        secrets: Sequence[str],
+        algorithms: Sequence[str] = ("HS256",),
+        cache_size: int = 10000,
+        max_cache_ttl: float = 300.0,
+    ):
+        self.secrets: List[str] = [secret for secret in secrets if secret]
+        self.algorithms = list(algorithms)
+        self.cache_size = cache_size
+        self.max_cache_ttl = max_cache_ttl
+        self._cache: "OrderedDict[bytes, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls) -> "TokenVerifier":
+        """
+        Read secrets from ACCESS_TOKEN_SECRET (the current secret) and the optional,
+        comma-separated ACCESS_TOKEN_PREVIOUS_SECRETS still accepted during rotation.
+        """
+        secrets = [os.getenv("ACCESS_TOKEN_SECRET", "")]  # change to TEST_ACCESS_TOKEN_SECRET for local
+        secrets += [secret.strip() for secret in os.getenv("ACCESS_TOKEN_PREVIOUS_SECRETS", "").split(",")]
+        return cls(secrets, cache_size=int(os.getenv("AUTH_CACHE_SIZE", "10000")))
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.secrets)
+
+    def verify(self, token: str) -> Dict[str, Any]:
+        """Return the token's claims; raises jwt.InvalidTokenError (or a subclass) if it is not valid."""
+        key = hashlib.sha256(token.encode()).digest()
+        now = time.time()
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                claims, expires_at = cached
+                if expires_at > now:
+                    self._cache.move_to_end(key)
+                    self.hits += 1
+                    return claims
+                del self._cache[key]
+            self.misses += 1
+
+        claims = self._decode(token)
+        exp = claims.get("exp")
+        expires_at = float(exp) if exp is not None else now + self.max_cache_ttl
+        with self._lock:
+            self._cache[key] = (claims, expires_at)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return claims
+
+    def _decode(self, token: str) -> Dict[str, Any]:
+        error: Optional[Exception] = None
+        for secret in self.secrets:
+            try:
+                return jwt.decode(token, secret, algorithms=self.algorithms)
+            except jwt.InvalidSignatureError as e:
+                # Signed with a different key; try the next active secret.
+                error = e
+        raise error or jwt.InvalidTokenError("No secret configured")
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
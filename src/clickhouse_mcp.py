@@ -1,11 +1,38 @@
 from mcp.server.fastmcp import FastMCP
 import os
-import clickhouse_connect
-from typing import Dict, List, Any
+import hmac
+import time
+import asyncio
+import anyio
+import functools
+from datetime import datetime, timezone
+import json
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, asynccontextmanager
+from clickhouse_pool import ClickHousePool
+from cursors import Cursor, CursorLimitError, CursorStore
+from result_format import FORMATS, QueryData, encode_result
+from query_budget import QueryBudget
+from query_tracker import QueryDeadlineError, QueryTracker
+from query_profile import parse_profile, profile_sql
+from named_queries import NamedQueryRegistry, parameters_key
+from result_store import ResultStore, aggregate, to_query_data
+from schema_index import SchemaIndex
+from query_cache import ResultCache, SingleFlight, estimate_size, referenced_tables
+from sql_lexer import QueryValidator, subquery
+from approximate import approximate_query
+from transfer import Transfer
+from response_compression import CompressionMiddleware
+from typing import Dict, List, Any, Optional, Tuple, Union
 import logging
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.responses import Response, JSONResponse
+from starlette.responses import Response, JSONResponse, PlainTextResponse
+from starlette.routing import Route
 import jwt
+from auth import TokenVerifier
+from session_routing import SessionRouter
+from stateless_http import StatelessHTTPEndpoint
+from metrics import SIZE_BUCKETS, Registry
+from admission import AdmissionRejected, TenantScheduler, current_tenant, tenant_id
 
 # from dotenv import load_dotenv
 
@@ -14,110 +41,1230 @@ import jwt
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-class JWTAuthMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request, call_next):
-        # Handle root path without auth
-        if request.url.path == "/":
-            return JSONResponse({
-                "status": "online",
-                "service": "ClickhouseTools API",
-                "endpoints": ["/sse"]
-            })
+# Served on /metrics in the Prometheus text format. Each worker process keeps its own.
+metrics = Registry()
+tool_duration_seconds = metrics.histogram("mcp_tool_duration_seconds", "Tool call duration.", ["tool"])
+tool_phase_seconds = metrics.histogram(
+    "mcp_tool_phase_seconds",
+    "Time spent in each phase of a query: validate, queue_wait (worker and pooled client), plan (pre-flight estimate), execute, serialize.",
+    ["tool", "phase"],
+)
+tool_errors = metrics.counter("mcp_tool_errors_total", "Tool calls that returned an error, by error type.", ["tool", "type"])
+result_rows = metrics.histogram("mcp_result_rows", "Rows returned per query.", ["tool"], SIZE_BUCKETS)
+result_bytes = metrics.histogram("mcp_result_bytes", "Approximate in-memory bytes of the rows returned per query.", ["tool"], SIZE_BUCKETS)
+query_cancellations = metrics.counter("mcp_query_cancellations_total", "Queries cancelled because the call was cancelled or hit the deadline.", ["reason"])
+clickhouse_read_rows = metrics.counter("clickhouse_read_rows_total", "Rows read by ClickHouse, from the query summary.")
+clickhouse_read_bytes = metrics.counter("clickhouse_read_bytes_total", "Bytes read by ClickHouse, from the query summary.")
+clickhouse_elapsed_seconds = metrics.histogram("clickhouse_query_elapsed_seconds", "Query time reported by ClickHouse in the query summary.")
+sse_sessions = metrics.gauge("mcp_sse_sessions", "Open SSE sessions.")
+
+STATUS_RESPONSE = {
+    "status": "online",
+    "service": "ClickhouseTools API",
+    "endpoints": ["/sse", "/mcp", "/metrics", "/healthz", "/readyz"]
+}
+
+
+async def serve_until_disconnect(app, scope, receive, send):
+    """
+    Serve an SSE request, cancelling everything it runs once the client disconnects.
+
+    mcp's `connect_sse` keeps the session's server running after the event stream
+    ends, so without this a dropped client would leave its tool calls, and their
+    ClickHouse queries, running. Cancelled calls kill their queries (see run_tracked).
+    """
+    with anyio.CancelScope() as cancel_scope:
+        async def receive_until_disconnect():
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                cancel_scope.cancel()
+            return message
 
-        # Apply JWT auth only to /sse endpoint
-        if request.url.path == "/sse":
-            auth_header = request.headers.get("Authorization")
-            if not auth_header or not auth_header.startswith("Bearer "):
-                return Response("Unauthorized: Missing or invalid token", status_code=401)
+        await app(scope, receive_until_disconnect, send)
 
-            token = auth_header.split(" ")[1]
-            jwt_secret = os.getenv("ACCESS_TOKEN_SECRET") # change to TEST_ACCESS_TOKEN_SECRET for local
+class JWTAuthMiddleware:
+    """
+    Pure ASGI auth layer.
+
+    The bearer token is checked once when a request starts; accepted requests are
+    handed to the app with the original `send`, so long-lived SSE streams and
+    message posts pass through without extra tasks or buffering. SSE streams only
+    have their `receive` watched, to end the session when the client disconnects.
+    """
+
+    def __init__(
+        self,
+        app,
+        verifier: Optional[TokenVerifier] = None,
+        sse_path: str = "/sse",
+        message_path: str = "/messages/",
+        metrics_token: Optional[str] = None,
+    ):
+        self.app = app
+        # Secrets are read once here rather than on every request.
+        self.verifier = verifier or TokenVerifier.from_env()
+        # Static bearer token for Prometheus scrapes, which can't mint client tokens.
+        self.metrics_token = metrics_token if metrics_token is not None else os.getenv('METRICS_TOKEN', '')
+        self.sse_path = sse_path
+        # The message endpoint is a mount, so every path under it reaches the SSE transport.
+        self.protected_prefixes = (message_path.rstrip("/"), "/mcp")
+
+    def protects(self, path: str) -> bool:
+        """Whether `path` requires a bearer token; everything else passes through."""
+        return path == self.sse_path or path.startswith(self.protected_prefixes)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        path = scope["path"]
+        # Handle root path without auth
+        if path == "/":
+            return await JSONResponse(STATUS_RESPONSE)(scope, receive, send)
+        if path == "/metrics":
+            denied = self.authorize_scrape(scope)
+            if denied is not None:
+                return await denied(scope, receive, send)
+            return await PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")(scope, receive, send)
+        # Liveness (the process serves requests) and readiness (warmed up) for load balancer health checks.
+        if path == "/healthz":
+            return await JSONResponse({"status": "ok"})(scope, receive, send)
+        if path == "/readyz":
+            ready, checks = readiness()
+            return await JSONResponse({"status": "ready" if ready else "warming", **checks}, status_code=200 if ready else 503)(scope, receive, send)
 
-            if not jwt_secret:
-                return Response("Server configuration error: Missing JWT secret", status_code=500)
+        if not self.protects(path):
+            return await self.app(scope, receive, send)
 
+        claims = self.authenticate(scope)
+        if isinstance(claims, Response):
+            return await claims(scope, receive, send)
+        # Tools called on this request (or SSE session) are admitted as this tenant.
+        token = current_tenant.set(tenant_id(claims))
+        try:
+            if path != self.sse_path:
+                return await self.app(scope, receive, send)
+            sse_sessions.inc()
             try:
-                jwt.decode(token, jwt_secret, algorithms=["HS256"], verify=True)
-                return await call_next(request)
-            except jwt.ExpiredSignatureError:
-                return Response("Unauthorized: Token expired", status_code=401)
-            except jwt.InvalidTokenError as e:
-                return Response(f"Unauthorized: Invalid token - {str(e)}", status_code=401)
-            except Exception as e:
-                return Response(f"Server error: {str(e)}", status_code=500)
+                return await serve_until_disconnect(self.app, scope, receive, send)
+            finally:
+                sse_sessions.dec()
+        finally:
+            current_tenant.reset(token)
+
+    def authorize_scrape(self, scope) -> Optional[Response]:
+        """None if the request may read /metrics (it carries METRICS_TOKEN or a valid client token), else the error response."""
+        if self.metrics_token:
+            expected = f"Bearer {self.metrics_token}".encode("latin-1")
+            if any(name == b"authorization" and hmac.compare_digest(value, expected) for name, value in scope["headers"]):
+                return None
+        claims = self.authenticate(scope)
+        return claims if isinstance(claims, Response) else None
+
+    def authenticate(self, scope) -> Union[Response, Dict[str, Any]]:
+        """Return the token's claims, or an error response if the request has no valid token."""
+        auth_header = None
+        for name, value in scope["headers"]:
+            if name == b"authorization":
+                auth_header = value.decode("latin-1")
+                break
+        if not auth_header or not auth_header.startswith("Bearer "):
+            return Response("Unauthorized: Missing or invalid token", status_code=401)
+
+        if not self.verifier.configured:
+            return Response("Server configuration error: Missing JWT secret", status_code=500)
 
-        # For all other endpoints, proceed without auth
-        return await call_next(request)
+        try:
+            claims = self.verifier.verify(auth_header[7:])
+        except jwt.ExpiredSignatureError:
+            return Response("Unauthorized: Token expired", status_code=401)
+        except jwt.InvalidTokenError as e:
+            return Response(f"Unauthorized: Invalid token - {str(e)}", status_code=401)
+        except Exception as e:
+            return Response(f"Server error: {str(e)}", status_code=500)
+        return claims
 
 
 mcp = FastMCP("ClickhouseTools")
 
 original_sse_app = mcp.sse_app
 
-def custom_sse_app():
+# Serve MCP as plain JSON-RPC POSTs on /mcp as well as over SSE. The stateless
+# endpoint needs no session affinity, so it scales across workers and instances.
+STATELESS_HTTP = os.getenv('MCP_STATELESS_HTTP', 'true').lower() == 'true'
+
+# Gzip responses to clients that accept it: SSE streams event by event, other
+# responses from this many bytes.
+RESPONSE_COMPRESSION = os.getenv('MCP_RESPONSE_COMPRESSION', 'true').lower() == 'true'
+RESPONSE_COMPRESSION_MIN_BYTES = int(os.getenv('MCP_COMPRESSION_MIN_BYTES', '1024'))
+
+def custom_sse_app(session_registry=None, session_owner: Optional[str] = None):
+    """
+    Build the ASGI app. With a `session_registry`, message posts for SSE sessions
+    held by another worker are forwarded to that worker (see workers.serve).
+    """
     app = original_sse_app()
-    app.add_middleware(JWTAuthMiddleware)
+    app.router.lifespan_context = lifespan
+    if STATELESS_HTTP:
+        app.router.routes.append(Route("/mcp", endpoint=StatelessHTTPEndpoint(mcp._mcp_server), methods=["POST"]))
+    if session_registry is not None:
+        app.add_middleware(
+            SessionRouter,
+            registry=session_registry,
+            owner=session_owner,
+            sse_path=mcp.settings.sse_path,
+            message_path=mcp.settings.message_path,
+        )
+    app.add_middleware(JWTAuthMiddleware, sse_path=mcp.settings.sse_path, message_path=mcp.settings.message_path)
+    if RESPONSE_COMPRESSION:
+        app.add_middleware(CompressionMiddleware, minimum_size=RESPONSE_COMPRESSION_MIN_BYTES)
     return app
 
 mcp.sse_app = custom_sse_app
 
-client = clickhouse_connect.get_client(
-    host=os.getenv('CLICKHOUSE_HOSTNAME'),
-    user=os.getenv('CLICKHOUSE_USERNAME'),
-    password=os.getenv('CLICKHOUSE_PASSWORD'),
-    database=os.getenv('CLICKHOUSE_DBNAME'),
-    secure=True,
+# Maximum number of ClickHouse queries executing at once. Queries run on this
+# many worker threads so a slow query never blocks the event loop serving SSE.
+QUERY_CONCURRENCY = int(os.getenv('CLICKHOUSE_QUERY_CONCURRENCY', '8'))
+
+query_executor = ThreadPoolExecutor(max_workers=QUERY_CONCURRENCY, thread_name_prefix="clickhouse-query")
+
+# Wire compression and binary format for results read from ClickHouse (see transfer.py).
+transfer = Transfer(
+    compression=os.getenv('CLICKHOUSE_COMPRESSION', 'auto'),
+    transfer_format=os.getenv('CLICKHOUSE_TRANSFER_FORMAT', 'native'),
+)
+
+def create_client():
+    """Open a new ClickHouse client for the pool."""
+    # Imported here rather than at startup: it is slow to import and only needed once a client is opened.
+    import clickhouse_connect
+
+    return clickhouse_connect.get_client(
+        host=os.getenv('CLICKHOUSE_HOSTNAME'),
+        user=os.getenv('CLICKHOUSE_USERNAME'),
+        password=os.getenv('CLICKHOUSE_PASSWORD'),
+        database=os.getenv('CLICKHOUSE_DBNAME'),
+        secure=True,
+        compress=transfer.client_compression,
+    )
+
+# Clients are opened lazily on first checkout; by default there is one per worker thread.
+pool = ClickHousePool(
+    create_client,
+    size=int(os.getenv('CLICKHOUSE_POOL_SIZE', str(QUERY_CONCURRENCY))),
+    idle_timeout=float(os.getenv('CLICKHOUSE_POOL_IDLE_TIMEOUT', '300')),
+    health_check_interval=float(os.getenv('CLICKHOUSE_POOL_HEALTH_CHECK_INTERVAL', '30')),
+    connect_retries=int(os.getenv('CLICKHOUSE_CONNECT_RETRIES', '5')),
+)
+
+query_budget = QueryBudget(
+    max_rows=int(os.getenv('QUERY_BUDGET_MAX_ROWS', '1000000000')),
+    max_bytes=int(os.getenv('QUERY_BUDGET_MAX_BYTES', str(50 * 1024 ** 3))),
+    action=os.getenv('QUERY_BUDGET_ACTION', 'reject'),
+    limit_rows=int(os.getenv('QUERY_BUDGET_LIMIT_ROWS', '1000')),
+    preflight=os.getenv('QUERY_PREFLIGHT_ESTIMATE', 'true').lower() == 'true',
+    max_execution_time=int(os.getenv('QUERY_MAX_EXECUTION_TIME', '60')),
+    max_result_rows=int(os.getenv('QUERY_MAX_RESULT_ROWS', '100000')),
+    max_bytes_to_read=int(os.getenv('QUERY_MAX_BYTES_TO_READ', str(100 * 1024 ** 3))),
+)
+
+def plan_query(
+    client,
+    sql_query: str,
+    streaming: bool = False,
+    parameters: Optional[Dict[str, Any]] = None,
+) -> Tuple[str, Dict[str, Any], Dict[str, Any]]:
+    """Estimate a query's cost and return the SQL and settings to run it with, plus stats."""
+    estimate = query_budget.estimate(client, sql_query, parameters) if query_budget.preflight else None
+    sql_query, settings, truncated = query_budget.plan(sql_query, estimate, streaming)
+    stats = {"estimate": estimate}
+    if truncated:
+        stats["truncated"] = True
+    return sql_query, settings, stats
+
+# Queries still running after this many seconds are killed on the server.
+QUERY_DEADLINE = float(os.getenv('QUERY_DEADLINE_SECONDS', '120'))
+
+query_tracker = QueryTracker(create_client)
+
+# Per-tenant (token issuer and subject) admission. Limits apply per worker process.
+tenant_queue_wait_seconds = metrics.histogram("mcp_tenant_queue_wait_seconds", "Time queries waited for admission, by tenant.", ["tenant"])
+
+# The first tenants seen get their own metric labels; later ones share OTHER_TENANTS,
+# so new token subjects can't grow the number of series without bound.
+METRICS_MAX_TENANTS = int(os.getenv('METRICS_MAX_TENANTS', '20'))
+OTHER_TENANTS = "other"
+labelled_tenants = set()
+
+def tenant_label(tenant: str) -> str:
+    if tenant not in labelled_tenants and len(labelled_tenants) < METRICS_MAX_TENANTS:
+        labelled_tenants.add(tenant)
+    return tenant if tenant in labelled_tenants else OTHER_TENANTS
+
+scheduler = TenantScheduler(
+    capacity=QUERY_CONCURRENCY,
+    max_concurrency=int(os.environ['TENANT_MAX_CONCURRENCY']) if os.getenv('TENANT_MAX_CONCURRENCY') else None,
+    queue_limit=int(os.getenv('TENANT_QUEUE_LIMIT', '32')),
+    rate=float(os.getenv('TENANT_RATE_LIMIT', '0')),
+    burst=float(os.environ['TENANT_RATE_BURST']) if os.getenv('TENANT_RATE_BURST') else None,
+    weights=json.loads(os.getenv('TENANT_WEIGHTS', '{}')),
+    on_wait=lambda tenant, waited: tenant_queue_wait_seconds.observe(waited, tenant_label(tenant)),
+)
+
+async def run_tracked(fn, sql_query: str, *args):
+    """
+    Run `fn(sql_query, query_id, submitted_at, *args)` on the query executor
+    once the calling tenant is admitted by the scheduler.
+
+    If the awaiting call is cancelled (the MCP request was cancelled or its SSE
+    session closed) or the deadline passes, the query is killed in ClickHouse
+    rather than left to run to completion.
+    """
+    async with scheduler.slot(current_tenant.get(), timeout=QUERY_DEADLINE):
+        query_id = query_tracker.register(sql_query)
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(query_executor, fn, sql_query, query_id, time.perf_counter(), *args)
+        try:
+            return await asyncio.wait_for(future, QUERY_DEADLINE)
+        except asyncio.TimeoutError:
+            query_tracker.cancel(query_id)
+            query_cancellations.inc("deadline")
+            raise QueryDeadlineError(f"Query cancelled after exceeding the {QUERY_DEADLINE:g}s deadline")
+        except asyncio.CancelledError:
+            query_tracker.cancel(query_id)
+            query_cancellations.inc("cancelled")
+            raise
+
+def observe_phase(phase: str, started: float) -> float:
+    """Record the time since `started` as a query phase; returns now, the start of the next phase."""
+    now = time.perf_counter()
+    tool_phase_seconds.observe(now - started, "query_clickhouse", phase)
+    return now
+
+def record_summary(query_id: str, data: QueryData, summary: Dict[str, Any], elapsed: float):
+    """Count what ClickHouse reports having read, and log it next to what the call saw."""
+    read_rows = int(summary.get("read_rows") or 0)
+    read_bytes = int(summary.get("read_bytes") or 0)
+    clickhouse_read_rows.inc(amount=read_rows)
+    clickhouse_read_bytes.inc(amount=read_bytes)
+    server_elapsed = summary.get("elapsed_ns")
+    if server_elapsed is not None:
+        clickhouse_elapsed_seconds.observe(int(server_elapsed) / 1e9)
+    logger.info(
+        f"Query {query_id}: {data.row_count} rows in {elapsed * 1000:.0f}ms, "
+        f"ClickHouse read {read_rows} rows / {read_bytes} bytes"
+        + (f" in {int(server_elapsed) / 1e6:.0f}ms" if server_elapsed is not None else "")
+    )
+
+def run_query(sql_query: str, query_id: str, submitted_at: float, parameters: Optional[Dict[str, Any]] = None) -> QueryData:
+    """Execute a query on the calling (worker) thread and collect its columns; `parameters` are bound by ClickHouse."""
+    try:
+        with pool.connection() as client:
+            started = observe_phase("queue_wait", submitted_at)
+            sql_query, settings, stats = plan_query(client, sql_query, parameters=parameters)
+            planned = observe_phase("plan", started)
+            query_tracker.start(query_id)
+            data, summary = transfer.query(client, sql_query, parameters, {**settings, "query_id": query_id})
+            observe_phase("execute", planned)
+            record_summary(query_id, data, summary, time.perf_counter() - planned)
+            data.stats.update(stats)
+            return data
+    finally:
+        query_tracker.finish(query_id)
+
+# Streamed results keep a pooled client checked out until the cursor is drained,
+# closed or idles out, so keep the cap below the pool size.
+cursor_store = CursorStore(
+    max_open=int(os.getenv('CURSOR_MAX_OPEN', '4')),
+    idle_timeout=float(os.getenv('CURSOR_IDLE_TIMEOUT', '300')),
+)
+
+DEFAULT_PAGE_SIZE = int(os.getenv('CURSOR_PAGE_SIZE', '1000'))
+
+# Idle cursors are closed by a background sweep, not only when another cursor is used.
+CURSOR_SWEEP_INTERVAL = max(1.0, cursor_store.idle_timeout / 10)
+
+def open_stream(sql_query: str, query_id: str, submitted_at: float, page_size: int) -> Tuple[QueryData, Optional[str]]:
+    """
+    Start a block stream, read its first page and register a cursor for the rest.
+
+    The query stays tracked until the cursor is closed, drained or swept, so the
+    rest of its stream can still be killed.
+    """
+    stack = ExitStack()
+    stack.callback(query_tracker.finish, query_id)
+    try:
+        if not cursor_store.has_capacity():
+            raise CursorLimitError(f"Too many open cursors (max {cursor_store.max_open}); fetch or close an existing cursor first")
+        client = stack.enter_context(pool.connection())
+        started = observe_phase("queue_wait", submitted_at)
+        sql_query, settings, stats = plan_query(client, sql_query, streaming=True)
+        planned = observe_phase("plan", started)
+        query_tracker.start(query_id)
+        stream = stack.enter_context(client.query_column_block_stream(sql_query, settings={**settings, "query_id": query_id}))
+        cursor = Cursor(stream.source.column_names, stream, stack.close, page_size)
+        page = cursor.read_page()
+        observe_phase("execute", planned)
+        page.stats.update(stats)
+    except BaseException:
+        stack.close()
+        raise
+    if cursor.exhausted:
+        cursor.close()
+        return page, None
+    return page, cursor_store.add(cursor)
+
+def read_cursor(token: str) -> Tuple[QueryData, Optional[str]]:
+    """Read the next page of an open cursor, closing it once the stream is drained."""
+    cursor = cursor_store.get(token)
+    page = cursor.read_page()
+    if cursor.exhausted:
+        cursor_store.close(token)
+        return page, None
+    return page, token
+
+def page_response(page: QueryData, cursor: Optional[str], format: str) -> Dict[str, Any]:
+    return {
+        **encode_result(page, format),
+        "row_count": page.row_count,
+        **page.stats,
+        "cursor": cursor,
+        "has_more": cursor is not None,
+    }
+
+result_cache = ResultCache(
+    ttl=float(os.getenv('QUERY_CACHE_TTL_SECONDS', '60')),
+    max_bytes=int(os.getenv('QUERY_CACHE_MAX_BYTES', str(64 * 1024 * 1024))),
+)
+
+# Identical queries already running (from any session) are joined rather than re-sent.
+single_flight = SingleFlight()
+
+# Results larger than RESULT_SPILL_BYTES are written to disk and returned as a handle
+# with a preview; read_result and aggregate_result then work on the stored copy.
+result_store = ResultStore(
+    directory=os.getenv('RESULT_STORE_DIR'),
+    max_bytes=int(os.getenv('RESULT_STORE_MAX_BYTES', str(1024 ** 3))),
 )
+RESULT_SPILL_BYTES = int(os.getenv('RESULT_SPILL_BYTES', str(4 * 1024 * 1024)))
+RESULT_PREVIEW_ROWS = int(os.getenv('RESULT_PREVIEW_ROWS', '20'))
+
+def head(data: QueryData, rows: int) -> QueryData:
+    return QueryData(data.column_names, [values[:rows] for values in data.columns])
+
+def should_spill(data: QueryData, spill: Optional[bool]) -> bool:
+    if spill is not None:
+        return spill
+    return result_store.available and RESULT_SPILL_BYTES > 0 and estimate_size(data.columns) > RESULT_SPILL_BYTES
+
+def instrumented(fn):
+    """Record a tool's call duration under its name."""
+    if asyncio.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await fn(*args, **kwargs)
+            finally:
+                tool_duration_seconds.observe(time.perf_counter() - started, fn.__name__)
+    else:
+        @functools.wraps(fn)
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                tool_duration_seconds.observe(time.perf_counter() - started, fn.__name__)
+    return timed
+
+def tool_error(tool: str, error) -> Dict[str, Any]:
+    """Count a failed call by error type and build its response; rejected arguments count as "InvalidRequest"."""
+    tool_errors.inc(tool, type(error).__name__ if isinstance(error, Exception) else "InvalidRequest")
+    if isinstance(error, AdmissionRejected):
+        return {"error": str(error), "retry_after": error.retry_after}
+    return {"error": str(error)}
+
+def record_result(tool: str, data: QueryData):
+    result_rows.observe(data.row_count, tool)
+    result_bytes.observe(estimate_size(data.columns), tool)
+
+# Verdicts for recently seen query texts, so retried and repeated queries skip the checks.
+query_validator = QueryValidator()
+
+def validate_query(sql_query: str) -> Optional[str]:
+    """Return why a query is not allowed, or None if it may run."""
+    return query_validator.check(sql_query).error
+
+# Approximate mode (see approximate.py): the fraction of rows sampled, and the
+# smallest table worth sampling rather than reading in full.
+APPROXIMATE_SAMPLE_RATIO = float(os.getenv('APPROXIMATE_SAMPLE_RATIO', '0.1'))
+APPROXIMATE_MIN_ROWS = int(os.getenv('APPROXIMATE_MIN_ROWS', '1000000'))
 
 @mcp.tool()
-def query_clickhouse(sql_query: str) -> List[Dict[str, Any]]:
+@instrumented
+async def query_clickhouse(
+    sql_query: str,
+    format: str = "rows",
+    use_cache: bool = True,
+    stream: bool = False,
+    page_size: int = DEFAULT_PAGE_SIZE,
+    spill: Optional[bool] = None,
+    approximate: bool = False,
+) -> Dict[str, Any]:
     """
     Execute a read-only SQL query against the ClickHouse database.
     
     This tool allows you to run SELECT queries on the platformance_core_db database
-    and retrieve the results as structured data. 
+    and retrieve the results as structured data. Identical queries are answered
+    from a short-lived result cache.
     
     Parameters:
         sql_query (str): A SQL SELECT query to execute against the ClickHouse database.
-                         Only SELECT statements are permitted. The query must not contain
-                         INSERT, UPDATE, DELETE, DROP, CREATE, ALTER, or TRUNCATE statements.
+                         Only a single SELECT statement is permitted, optionally starting
+                         with WITH or EXPLAIN. The keywords INSERT, UPDATE, DELETE, DROP,
+                         CREATE, ALTER and TRUNCATE are rejected outside string literals,
+                         quoted identifiers and comments.
+        format (str): Layout of the returned data:
+                      - "rows" (default): "rows" is a list of {column: value} dictionaries.
+                      - "columnar": "columns" lists the column names once and "data" holds
+                        one list of values per column. Smallest payload for wide results.
+                      - "compact": "columns" lists the column names once and "rows" holds
+                        one list of values per row.
+                      - "csv" / "tsv": "text" holds the result as delimited text with a
+                        header line.
+        use_cache (bool): Set to False to skip the result cache and fetch fresh data.
+                          The query is sent even if an identical one is already
+                          running. The fresh result replaces any cached one.
+        stream (bool): Set to True for queries that may return many rows. Only the
+                       first `page_size` rows are returned, together with a "cursor"
+                       token; pass it to `fetch_page` to read the following pages.
+                       Streamed results are never cached.
+        page_size (int): Rows per page when `stream` is True.
+        spill (bool, optional): Store the result on the server and return a "handle"
+                       instead of the data. By default only large results are stored.
+                       Use `read_result` and `aggregate_result` on the handle to page
+                       through, project or summarise the result without re-running the query.
+        approximate (bool): Set to True for exploratory aggregations that don't need exact
+                       answers. Exact distinct counts and quantiles use approximate functions
+                       (uniq, quantileTDigest), and single-table aggregations over large tables
+                       with a sampling key read a sample, with counts and sums scaled back up.
+                       Can't be combined with `stream`.
     
     Returns:
-        List[Dict[str, Any]]: A list of dictionaries where each dictionary represents a row
-                             in the result set. Dictionary keys are column names and values
-                             are the corresponding data values.
+        Dict[str, Any]: A dictionary with:
+            - the result data laid out as described for `format`, e.g. "rows": a list
+              of dictionaries where each dictionary represents a row in the result set.
+              Dictionary keys are column names and values are the corresponding data values.
+            - "row_count": the number of rows in the result.
+            - "estimate": ClickHouse's pre-flight estimate of the "rows", "bytes", "parts"
+              and "marks" the query reads. Queries estimated over the server's budget are
+              rejected; filter on the table's sorting key or aggregate to read less.
+              If "truncated" is present, the server capped the query at its read budget
+              and the result is partial.
+            - "cache": whether this call was served from the cache ("hit") or joined an
+              identical query already in flight ("coalesced"), plus the server-wide
+              "hits"/"misses"/"coalesced_calls" counters.
+            When `stream` is True, "cursor" and "has_more" replace "cache"; "cursor" is
+            None once the last page has been returned.
+            When the result is stored, "handle", "schema" (column names and types),
+            "bytes" and a "preview" of the first rows replace the data.
+            When `approximate` is True, "approximation" gives the "sample_ratio" (None if
+            the table was read in full), the function "substitutions" and their typical
+            "function_errors", "relative_error_95" (for each scaled count and sum selected,
+            "median" and "max" over result rows), "notes" on what was or wasn't approximated and
+            the rewritten "sql".
                              
         If an error occurs, returns a dictionary with a single key "error" containing
         the error message.
 
     """
     original_query = sql_query
-    sql_query_upper = sql_query.strip().upper()
-    if not sql_query_upper.startswith('SELECT'):
-        return {"error": "Only SELECT queries are allowed"}
+    started = time.perf_counter()
+    verdict = query_validator.check(sql_query)
+    observe_phase("validate", started)
+    if verdict.error:
+        return tool_error("query_clickhouse", verdict.error)
+
+    if format not in FORMATS:
+        return tool_error("query_clickhouse", f"Unknown format '{format}'. Use one of: {', '.join(FORMATS)}")
+
+    if stream and page_size < 1:
+        return tool_error("query_clickhouse", "page_size must be at least 1")
+
+    if stream and spill:
+        return tool_error("query_clickhouse", "Streamed results can't be stored; use either stream or spill")
+
+    if stream and approximate:
+        return tool_error("query_clickhouse", "Approximate results can't be streamed; use either stream or approximate")
+
+    try:
+        approximation = None
+        if approximate:
+            index = await get_schema_index()
+            approximation = approximate_query(original_query, index.describe_table, APPROXIMATE_SAMPLE_RATIO, APPROXIMATE_MIN_ROWS)
+            original_query = approximation.sql
+            verdict = query_validator.check(original_query)
+            if verdict.error:
+                return tool_error("query_clickhouse", verdict.error)
+
+        if stream:
+            page, cursor = await run_tracked(open_stream, original_query, page_size)
+            record_result("query_clickhouse", page)
+            started = time.perf_counter()
+            response = page_response(page, cursor, format)
+            observe_phase("serialize", started)
+            return response
+
+        cache_key = verdict.normalized
+        hit = False
+        if use_cache and result_cache.enabled:
+            hit, data = result_cache.get(cache_key)
+
+        coalesced = False
+        if not hit:
+            async def execute():
+                data = await run_tracked(run_query, original_query)
+                result_cache.put(cache_key, data, estimate_size(data.columns), referenced_tables(original_query))
+                return data
+
+            if use_cache:
+                data, coalesced = await single_flight.do(cache_key, execute)
+            else:
+                # A fresh read must not join a query that was already running when it was made.
+                data = await execute()
+
+        if approximation is not None:
+            data, approximated = approximation.finish(data)
+            data.stats = {**data.stats, "approximation": approximated}
+
+        record_result("query_clickhouse", data)
+        started = time.perf_counter()
+        if should_spill(data, spill):
+            loop = asyncio.get_running_loop()
+            preview = head(data, RESULT_PREVIEW_ROWS)
+            body = {
+                **await loop.run_in_executor(query_executor, result_store.put, data),
+                "preview": {**encode_result(preview, format), "row_count": preview.row_count},
+            }
+        else:
+            body = {**encode_result(data, format), "row_count": data.row_count}
+        stats = result_cache.stats()
+        response = {
+            **body,
+            **data.stats,
+            "cache": {
+                "hit": hit,
+                "coalesced": coalesced,
+                "hits": stats["hits"],
+                "misses": stats["misses"],
+                "coalesced_calls": single_flight.stats()["coalesced"],
+            },
+        }
+        observe_phase("serialize", started)
+        return response
+    except Exception as e:
+        return tool_error("query_clickhouse", e)
+
+@mcp.tool()
+@instrumented
+def invalidate_cache(table: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Drop cached query results.
+
+    Parameters:
+        table (str, optional): Only drop results of queries that read from this table.
+                               If omitted, the whole cache is cleared.
+
+    Returns:
+        Dict[str, Any]: The number of cache entries removed, under "invalidated".
+    """
+    return {"invalidated": result_cache.invalidate(table)}
+
+BATCH_MAX_QUERIES = int(os.getenv('BATCH_MAX_QUERIES', '20'))
+BATCH_CONCURRENCY = int(os.getenv('BATCH_CONCURRENCY', '4'))
+
+@mcp.tool()
+@instrumented
+async def query_clickhouse_batch(
+    queries: List[str],
+    format: str = "rows",
+    use_cache: bool = True,
+    max_concurrency: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Execute several independent read-only SQL queries in one call.
+
+    Use this instead of repeated `query_clickhouse` calls when the queries don't depend
+    on each other, e.g. row counts across several tables. Queries run in parallel.
+
+    Parameters:
+        queries (List[str]): SELECT queries, with the same rules as `query_clickhouse`.
+        format (str): Layout of each result's data, as for `query_clickhouse`.
+        use_cache (bool): Set to False to skip the result cache, as for `query_clickhouse`.
+        max_concurrency (int, optional): Maximum number of these queries running at once.
+
+    Returns:
+        Dict[str, Any]: "results", one entry per query in the order given. Each entry has
+        the "index" of its query, "elapsed_ms", and either the fields `query_clickhouse`
+        returns or an "error" for that query alone. "errors" counts the failed queries.
+    """
+    if not queries:
+        return tool_error("query_clickhouse_batch", "No queries given")
+    if len(queries) > BATCH_MAX_QUERIES:
+        return tool_error("query_clickhouse_batch", f"At most {BATCH_MAX_QUERIES} queries are allowed per batch")
+    if format not in FORMATS:
+        return tool_error("query_clickhouse_batch", f"Unknown format '{format}'. Use one of: {', '.join(FORMATS)}")
+
+    limit = max(1, min(max_concurrency or BATCH_CONCURRENCY, BATCH_CONCURRENCY))
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run_one(index: int, sql_query: str) -> Dict[str, Any]:
+        started = time.perf_counter()
+        error = validate_query(sql_query)
+        if error:
+            result = tool_error("query_clickhouse_batch", error)
+        else:
+            async with semaphore:
+                result = await query_clickhouse(sql_query, format=format, use_cache=use_cache)
+        return {"index": index, "elapsed_ms": round((time.perf_counter() - started) * 1000, 1), **result}
+
+    results = await asyncio.gather(*[run_one(i, sql_query) for i, sql_query in enumerate(queries)])
+    return {"results": results, "errors": sum(1 for result in results if "error" in result)}
+
+@mcp.tool()
+@instrumented
+async def fetch_page(cursor: str, format: str = "rows") -> Dict[str, Any]:
+    """
+    Fetch the next page of a streamed query result.
+
+    Parameters:
+        cursor (str): The "cursor" token returned by `query_clickhouse(stream=True)` or a
+                      previous `fetch_page` call. Cursors expire after a period of inactivity.
+        format (str): Layout of the returned data, as for `query_clickhouse`.
+
+    Returns:
+        Dict[str, Any]: The page data, "row_count", "has_more" and the "cursor" to pass
+        to the next call (None after the last page).
+
+        If an error occurs, returns a dictionary with a single key "error" containing
+        the error message.
+    """
+    if format not in FORMATS:
+        return tool_error("fetch_page", f"Unknown format '{format}'. Use one of: {', '.join(FORMATS)}")
+    try:
+        loop = asyncio.get_running_loop()
+        page, next_cursor = await loop.run_in_executor(query_executor, read_cursor, cursor)
+        record_result("fetch_page", page)
+        return page_response(page, next_cursor, format)
+    except Exception as e:
+        return tool_error("fetch_page", e)
+
+@mcp.tool()
+@instrumented
+async def close_cursor(cursor: str) -> Dict[str, Any]:
+    """
+    Close a streamed query result that is no longer needed, freeing its server resources.
+
+    Parameters:
+        cursor (str): The cursor token to close.
+
+    Returns:
+        Dict[str, Any]: "closed" is True if the cursor was open.
+    """
+    loop = asyncio.get_running_loop()
+    return {"closed": await loop.run_in_executor(query_executor, cursor_store.close, cursor)}
+
+def slice_result(handle: str, offset: int, limit: int, columns: Optional[List[str]]) -> Tuple[QueryData, int]:
+    table = result_store.table(handle)
+    if columns:
+        table = table.select(columns)
+    return to_query_data(table.slice(offset, limit)), table.num_rows
+
+@mcp.tool()
+@instrumented
+async def read_result(
+    handle: str,
+    offset: int = 0,
+    limit: int = 100,
+    columns: Optional[List[str]] = None,
+    format: str = "rows",
+) -> Dict[str, Any]:
+    """
+    Read rows of a stored query result without re-running the query.
+
+    Parameters:
+        handle (str): The "handle" returned by `query_clickhouse` for a stored result.
+        offset (int): Index of the first row to return.
+        limit (int): Maximum number of rows to return.
+        columns (List[str], optional): Only return these columns, in this order.
+        format (str): Layout of the returned data, as for `query_clickhouse`.
+
+    Returns:
+        Dict[str, Any]: The rows laid out as described for `format`, "row_count" (rows
+        returned), "total_rows" and "has_more".
+
+        If an error occurs, returns a dictionary with a single key "error" containing
+        the error message.
+    """
+    if format not in FORMATS:
+        return tool_error("read_result", f"Unknown format '{format}'. Use one of: {', '.join(FORMATS)}")
+    if offset < 0 or limit < 1:
+        return tool_error("read_result", "offset must be at least 0 and limit at least 1")
+    try:
+        loop = asyncio.get_running_loop()
+        data, total = await loop.run_in_executor(query_executor, slice_result, handle, offset, limit, columns)
+        record_result("read_result", data)
+        return {
+            **encode_result(data, format),
+            "row_count": data.row_count,
+            "total_rows": total,
+            "has_more": offset + data.row_count < total,
+        }
+    except Exception as e:
+        return tool_error("read_result", e)
+
+def aggregate_stored(handle: str, aggregations: List[str], group_by: List[str], limit: int) -> Tuple[QueryData, int]:
+    table = aggregate(result_store.table(handle), aggregations, group_by)
+    return to_query_data(table.slice(0, limit)), table.num_rows
+
+@mcp.tool()
+@instrumented
+async def aggregate_result(
+    handle: str,
+    aggregations: List[str],
+    group_by: Optional[List[str]] = None,
+    limit: int = 1000,
+    format: str = "rows",
+) -> Dict[str, Any]:
+    """
+    Summarise a stored query result without re-running the query.
+
+    Parameters:
+        handle (str): The "handle" returned by `query_clickhouse` for a stored result.
+        aggregations (List[str]): Expressions such as "sum(value)", "mean(price)" or
+                                  "count(*)". Functions: count, count_distinct, sum, min,
+                                  max and mean.
+        group_by (List[str], optional): Columns to group by. Without it, one row
+                                        summarises the whole result.
+        limit (int): Maximum number of groups to return.
+        format (str): Layout of the returned data, as for `query_clickhouse`.
+
+    Returns:
+        Dict[str, Any]: One row per group with the group_by columns followed by one
+        column per aggregation (named after its expression), "row_count" (groups
+        returned) and "total_groups".
+
+        If an error occurs, returns a dictionary with a single key "error" containing
+        the error message.
+    """
+    if format not in FORMATS:
+        return tool_error("aggregate_result", f"Unknown format '{format}'. Use one of: {', '.join(FORMATS)}")
+    try:
+        loop = asyncio.get_running_loop()
+        data, total = await loop.run_in_executor(query_executor, aggregate_stored, handle, aggregations, group_by or [], limit)
+        record_result("aggregate_result", data)
+        return {**encode_result(data, format), "row_count": data.row_count, "total_groups": total}
+    except Exception as e:
+        return tool_error("aggregate_result", e)
+
+@mcp.tool()
+@instrumented
+def drop_result(handle: str) -> Dict[str, Any]:
+    """
+    Delete a stored query result that is no longer needed.
+
+    Parameters:
+        handle (str): The handle to delete.
 
-    forbidden_keywords = ['INSERT', 'UPDATE', 'DELETE', 'DROP', 'CREATE', 'ALTER', 'TRUNCATE']
-    if any(keyword in sql_query_upper for keyword in forbidden_keywords):
-        return {"error": "Query contains forbidden keywords"}
+    Returns:
+        Dict[str, Any]: "dropped" is True if the result was stored.
+    """
+    return {"dropped": result_store.drop(handle)}
 
+def run_profile(sql_query: str, query_id: str, submitted_at: float, columns: Optional[List[str]], top_k: int) -> Dict[str, Any]:
+    """Describe the query's result columns, then compute their statistics in one aggregate query."""
     try:
-        logger.info(f"Executing query: {original_query.split('FROM')[1].strip()}" if 'FROM' in original_query.upper() else original_query)
-        result = client.query(original_query)
-        column_names = result.column_names
-        result_rows = []
+        with pool.connection() as client:
+            sql_query, settings, stats = plan_query(client, sql_query)
+            described = client.query(f"DESCRIBE TABLE {subquery(sql_query)}")
+            result_columns = list(zip(described.result_columns[0], described.result_columns[1]))
+            if columns:
+                types = dict(result_columns)
+                unknown = [name for name in columns if name not in types]
+                if unknown:
+                    raise ValueError(f"Unknown columns: {', '.join(unknown)}. The query returns: {', '.join(types)}")
+                result_columns = [(name, types[name]) for name in columns]
+            started = time.perf_counter()
+            query_tracker.start(query_id)
+            result = client.query(profile_sql(sql_query, result_columns, top_k), settings={**settings, "query_id": query_id}, column_oriented=True)
+            data = QueryData.from_result(result)
+            record_summary(query_id, data, result.summary, time.perf_counter() - started)
+            profile = parse_profile(result_columns, data.column_names, [values[0] for values in data.columns])
+            profile.update(stats)
+            return profile
+    finally:
+        query_tracker.finish(query_id)
+
+@mcp.tool()
+@instrumented
+async def profile_query(sql_query: str, columns: Optional[List[str]] = None, top_k: int = 5) -> Dict[str, Any]:
+    """
+    Summarise the result of a SELECT query without returning its rows.
 
-        for row in result.result_set:
-            result_row = {col: row[i] for i, col in enumerate(column_names)}
-            result_rows.append(result_row)
+    Use this instead of fetching rows to describe or summarise data. ClickHouse computes
+    the statistics of every column in one pass over the query's result.
 
-        return result_rows
+    Parameters:
+        sql_query (str): A SELECT query, with the same rules as `query_clickhouse`.
+        columns (List[str], optional): Only profile these result columns.
+        top_k (int): Number of most frequent values reported for text and enum columns.
+
+    Returns:
+        Dict[str, Any]: "row_count", and under "columns" one entry per column with its
+        "type", "nulls" and "approx_distinct". Numeric columns add "min", "max", "mean"
+        and approximate "quantiles" (p5, p25, p50, p75, p95); date columns add "min" and
+        "max"; text and enum columns add "top", the most frequent values, most frequent
+        first. "estimate" (and "truncated") are reported as for `query_clickhouse`.
+
+        If an error occurs, returns a dictionary with a single key "error" containing
+        the error message.
+    """
+    error = validate_query(sql_query)
+    if error:
+        return tool_error("profile_query", error)
+    if not 0 <= top_k <= 100:
+        return tool_error("profile_query", "top_k must be between 0 and 100")
+    try:
+        return await run_tracked(run_profile, sql_query, columns, top_k)
     except Exception as e:
-        return {"error": str(e)}
+        return tool_error("profile_query", e)
+
+# Named queries answer frequent questions from results kept in memory; see named_queries.py.
+NAMED_QUERIES_FILE = os.getenv('NAMED_QUERIES_FILE', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'named_queries.json'))
+named_queries = NamedQueryRegistry.load(NAMED_QUERIES_FILE) if os.path.exists(NAMED_QUERIES_FILE) else NamedQueryRegistry()
+# Scheduled refreshes are admitted as their own tenant.
+NAMED_QUERY_TENANT = "named_queries"
+NAMED_QUERY_RETRY_SECONDS = 30.0
+
+async def compute_named_query(query, params: Dict[str, Any]):
+    async def execute():
+        data = await run_tracked(run_query, query.sql, params)
+        return named_queries.store(query.name, params, data)
+
+    result, _ = await single_flight.do(f"named:{query.name}:{parameters_key(params)}", execute)
+    return result
+
+async def refresh_named_queries():
+    """Recompute scheduled named queries as their results go stale."""
+    current_tenant.set(NAMED_QUERY_TENANT)
+    while True:
+        failed = False
+        for query, params in named_queries.due():
+            try:
+                await compute_named_query(query, params)
+            except Exception as e:
+                failed = True
+                logger.warning(f"Refreshing named query {query.name} {params} failed: {e}")
+        wait = named_queries.next_refresh_in()
+        await asyncio.sleep(max(1.0, NAMED_QUERY_RETRY_SECONDS if failed else wait))
+
+async def sweep_cursors():
+    """Close idle cursors, returning their pooled clients, every CURSOR_SWEEP_INTERVAL seconds."""
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(CURSOR_SWEEP_INTERVAL)
+        try:
+            closed = await loop.run_in_executor(query_executor, cursor_store.sweep)
+            if closed:
+                logger.info(f"Closed {closed} idle cursor(s)")
+        except Exception as e:
+            logger.warning(f"Sweeping idle cursors failed: {e}")
+
+@asynccontextmanager
+async def lifespan(app):
+    tasks = [spawn(warm_up()), spawn(sweep_cursors())]
+    if named_queries.scheduled:
+        tasks.append(spawn(refresh_named_queries()))
+    try:
+        yield
+    finally:
+        for task in tasks:
+            task.cancel()
+
+@mcp.tool()
+@instrumented
+def list_named_queries() -> Dict[str, Any]:
+    """
+    List the named queries that `run_named_query` can answer.
+
+    Returns:
+        Dict[str, Any]: "queries", a list of {"name", "description", "parameters",
+        "refresh_seconds"} where "parameters" maps each parameter to its ClickHouse type.
+    """
+    return {"queries": named_queries.list()}
+
+@mcp.tool()
+@instrumented
+async def run_named_query(
+    name: str,
+    params: Optional[Dict[str, Any]] = None,
+    format: str = "rows",
+    max_age_seconds: Optional[float] = None,
+) -> Dict[str, Any]:
+    """
+    Answer a frequently asked question from a named, precomputed query.
+
+    Prefer this over `query_clickhouse` when `list_named_queries` has a query for the
+    question: results are usually already computed and are returned immediately.
+
+    Parameters:
+        name (str): The named query, from `list_named_queries`.
+        params (Dict[str, Any], optional): A value for each of the query's parameters.
+        format (str): Layout of the returned data, as for `query_clickhouse`.
+        max_age_seconds (float, optional): Recompute the result if it is older than this.
+
+    Returns:
+        Dict[str, Any]: The result data laid out as described for `format`, "row_count",
+        "age_seconds" and "computed_at" (UTC) of the result, and "precomputed", which is
+        False if the result was computed for this call.
+
+        If an error occurs, returns a dictionary with a single key "error" containing
+        the error message.
+    """
+    if format not in FORMATS:
+        return tool_error("run_named_query", f"Unknown format '{format}'. Use one of: {', '.join(FORMATS)}")
+    try:
+        query = named_queries.get(name)
+        bound = query.bind(params or {})
+        if max_age_seconds is None:
+            # Scheduled results are kept fresh in the background; serve them at any age.
+            max_age_seconds = float("inf") if query.refresh_seconds else query.max_age_seconds
+        result = named_queries.lookup(name, bound)
+        precomputed = result is not None and result.age() <= max_age_seconds
+        if not precomputed:
+            result = await compute_named_query(query, bound)
+        record_result("run_named_query", result.data)
+        return {
+            **encode_result(result.data, format),
+            "row_count": result.data.row_count,
+            "age_seconds": round(result.age(), 1),
+            "computed_at": datetime.fromtimestamp(result.computed_at, timezone.utc).isoformat(timespec="seconds"),
+            "precomputed": precomputed,
+        }
+    except Exception as e:
+        return tool_error("run_named_query", e)
+
+# Strong references to fire-and-forget tasks, which asyncio would otherwise let be collected.
+background_tasks = set()
+
+def spawn(coro) -> "asyncio.Future[Any]":
+    task = asyncio.ensure_future(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
+
+schema_index = SchemaIndex(refresh_interval=float(os.getenv('SCHEMA_REFRESH_SECONDS', '60')))
+
+def refresh_schema_index() -> List[str]:
+    with pool.connection() as client:
+        return schema_index.refresh(client)
+
+async def get_schema_index() -> SchemaIndex:
+    """Return the schema index, loading it on first use and refreshing it in the background when stale."""
+    loop = asyncio.get_running_loop()
+    if not schema_index.loaded:
+        await single_flight.do("schema_index", lambda: loop.run_in_executor(query_executor, refresh_schema_index))
+    elif schema_index.is_stale():
+        # Serve the current snapshot; callers arriving during the refresh join it.
+        spawn(single_flight.do("schema_index", lambda: loop.run_in_executor(query_executor, refresh_schema_index)))
+    return schema_index
+
+
+# Once the server is listening, pooled clients are opened and the schema index is
+# loaded in the background; /readyz answers 503 until both are done, so load
+# balancers only route to warm instances.
+WARMUP = os.getenv('MCP_WARMUP', 'true').lower() == 'true'
+WARMUP_CONNECTIONS = int(os.getenv('MCP_WARMUP_CONNECTIONS', str(pool.size)))
+WARMUP_RETRY_SECONDS = 5.0
+
+warmup_state: Dict[str, Any] = {"clickhouse": not WARMUP, "schema_index": not WARMUP, "error": None}
+warmup_seconds = metrics.gauge("mcp_warmup_seconds", "Time the startup warm-up took, including retries.")
+
+def readiness() -> Tuple[bool, Dict[str, Any]]:
+    checks = {"clickhouse": warmup_state["clickhouse"], "schema_index": warmup_state["schema_index"]}
+    if warmup_state["error"]:
+        checks["error"] = warmup_state["error"]
+    return all(checks.values()) and not warmup_state["error"], checks
+
+async def warm_up():
+    """Open `WARMUP_CONNECTIONS` pooled clients and load the schema index, retrying until both succeed."""
+    if not WARMUP:
+        return
+    started = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    while True:
+        try:
+            if not warmup_state["clickhouse"]:
+                # One call per connection, so they open in parallel.
+                await asyncio.gather(*(
+                    loop.run_in_executor(query_executor, pool.warm, WARMUP_CONNECTIONS) for _ in range(WARMUP_CONNECTIONS)
+                ))
+                warmup_state["clickhouse"] = True
+            await get_schema_index()
+            warmup_state["schema_index"] = True
+            warmup_state["error"] = None
+            break
+        except Exception as e:
+            warmup_state["error"] = str(e)
+            logger.warning(f"Warm-up failed: {e}; retrying in {WARMUP_RETRY_SECONDS:g}s")
+            await asyncio.sleep(WARMUP_RETRY_SECONDS)
+    warmup_seconds.set(time.perf_counter() - started)
+    logger.info(f"Warm-up finished in {time.perf_counter() - started:.2f}s")
+
+@mcp.tool()
+@instrumented
+async def list_tables(pattern: Optional[str] = None) -> Dict[str, Any]:
+    """
+    List the tables in the database without running a query.
+
+    Parameters:
+        pattern (str, optional): Only list tables whose name contains this text (case-insensitive).
+
+    Returns:
+        Dict[str, Any]: "tables", a list of {"name", "engine", "total_rows", "columns", "comment"}
+        where "columns" is the number of columns in the table.
+
+        If an error occurs, returns a dictionary with a single key "error" containing
+        the error message.
+    """
+    try:
+        index = await get_schema_index()
+        return {"tables": index.list_tables(pattern)}
+    except Exception as e:
+        return tool_error("list_tables", e)
+
+@mcp.tool()
+@instrumented
+async def describe_table(table: str) -> Dict[str, Any]:
+    """
+    Describe a table's columns, types and comments without running a query.
+
+    Parameters:
+        table (str): The table name.
+
+    Returns:
+        Dict[str, Any]: The table's "name", "engine", "comment", "sorting_key", "sampling_key",
+        "total_rows", "total_bytes" and "columns" (a list of {"name", "type", "comment"}).
+        Filtering on the sorting key makes queries much cheaper.
+
+        If the table does not exist, returns an "error" and "similar_tables".
+    """
+    try:
+        index = await get_schema_index()
+        schema = index.describe_table(table)
+        if schema is None:
+            return {"error": f"Unknown table '{table}'", "similar_tables": index.similar_tables(table)}
+        return schema
+    except Exception as e:
+        return tool_error("describe_table", e)
+
+@mcp.tool()
+@instrumented
+async def search_columns(pattern: str, limit: int = 50) -> Dict[str, Any]:
+    """
+    Find columns by name across all tables without running a query.
+
+    Parameters:
+        pattern (str): Text contained in the column name, or a glob such as "campaign*id"
+                       (`*` any text, `?` one character); case-insensitive.
+        limit (int): Maximum number of matches to return.
+
+    Returns:
+        Dict[str, Any]: "columns", a list of {"table", "name", "type", "comment"}.
+
+        If an error occurs, returns a dictionary with a single key "error" containing
+        the error message.
+    """
+    try:
+        index = await get_schema_index()
+        return {"columns": index.search_columns(pattern, limit)}
+    except Exception as e:
+        return tool_error("search_columns", e)
+
+def collect_component_stats():
+    """Pool, cache, cursor and query tracker figures, read from their stats at scrape time."""
+    pool_stats = pool.stats()
+    cache_stats = result_cache.stats()
+    flight_stats = single_flight.stats()
+    tracker_stats = query_tracker.stats()
+    yield ("clickhouse_pool_clients", "gauge", "Pooled ClickHouse clients by state.", [
+        ("clickhouse_pool_clients", {"state": "in_use"}, pool_stats["in_use"]),
+        ("clickhouse_pool_clients", {"state": "idle"}, pool_stats["idle"]),
+    ])
+    yield ("clickhouse_pool_size", "gauge", "Maximum pooled ClickHouse clients.", [("clickhouse_pool_size", {}, pool_stats["size"])])
+    for key, help in (("opened", "ClickHouse clients opened."), ("reconnects", "Connection attempts retried."), ("evicted", "Pooled clients closed as idle or broken.")):
+        yield (f"clickhouse_pool_{key}_total", "counter", help, [(f"clickhouse_pool_{key}_total", {}, pool_stats[key])])
+    yield ("mcp_cache_requests_total", "counter", "Result cache lookups by outcome.", [
+        ("mcp_cache_requests_total", {"result": "hit"}, cache_stats["hits"]),
+        ("mcp_cache_requests_total", {"result": "miss"}, cache_stats["misses"]),
+    ])
+    yield ("mcp_cache_evictions_total", "counter", "Cached results evicted for space.", [("mcp_cache_evictions_total", {}, cache_stats["evictions"])])
+    yield ("mcp_cache_entries", "gauge", "Cached results.", [("mcp_cache_entries", {}, cache_stats["entries"])])
+    yield ("mcp_cache_bytes", "gauge", "Approximate memory held by cached results.", [("mcp_cache_bytes", {}, cache_stats["bytes"])])
+    yield ("mcp_coalesced_calls_total", "counter", "Calls that joined an identical query already in flight.", [
+        ("mcp_coalesced_calls_total", {}, flight_stats["coalesced"]),
+    ])
+    validator_stats = query_validator.stats()
+    yield ("mcp_sql_verdict_cache_requests_total", "counter", "Query validations answered from remembered verdicts (hit) or checked (miss).", [
+        ("mcp_sql_verdict_cache_requests_total", {"result": "hit"}, validator_stats["hits"]),
+        ("mcp_sql_verdict_cache_requests_total", {"result": "miss"}, validator_stats["misses"]),
+    ])
+    yield ("mcp_open_cursors", "gauge", "Open streamed-result cursors.", [("mcp_open_cursors", {}, len(cursor_store))])
+    store_stats = result_store.stats()
+    yield ("mcp_stored_results", "gauge", "Query results stored on disk.", [("mcp_stored_results", {}, store_stats["entries"])])
+    yield ("mcp_stored_result_bytes", "gauge", "Disk used by stored query results.", [("mcp_stored_result_bytes", {}, store_stats["bytes"])])
+    yield ("mcp_stored_result_evictions_total", "counter", "Stored results deleted to stay within the disk budget.", [
+        ("mcp_stored_result_evictions_total", {}, store_stats["evictions"]),
+    ])
+    states = [query["state"] for query in query_tracker.in_flight()]
+    yield ("clickhouse_queries_in_flight", "gauge", "Queries waiting for a worker or pooled client (queued) or sent to ClickHouse (running).", [
+        ("clickhouse_queries_in_flight", {"state": state}, states.count(state)) for state in ("queued", "running")
+    ])
+    yield ("clickhouse_queries_killed_total", "counter", "Running queries killed with KILL QUERY.", [
+        ("clickhouse_queries_killed_total", {}, tracker_stats["killed"]),
+    ])
+    tenants: Dict[str, Dict[str, int]] = {}
+    for tenant, stats in scheduler.stats().items():
+        totals = tenants.setdefault(tenant_label(tenant), {"queued": 0, "running": 0, "rejected": 0})
+        for key in totals:
+            totals[key] += stats[key]
+    yield ("mcp_tenant_queries", "gauge", "Queries per tenant waiting for admission (queued) or admitted and not yet finished (running).", [
+        ("mcp_tenant_queries", {"tenant": tenant, "state": state}, stats[state]) for tenant, stats in tenants.items() for state in ("queued", "running")
+    ])
+    yield ("mcp_tenant_rejections_total", "counter", "Queries shed by admission control (rate limit, full queue or no slot before the deadline).", [
+        ("mcp_tenant_rejections_total", {"tenant": tenant}, stats["rejected"]) for tenant, stats in tenants.items()
+    ])
+
+metrics.add_collector(collect_component_stats)
+
+# Worker processes serving the same port. Pools, caches and cursors are per worker.
+MCP_WORKERS = int(os.getenv('MCP_WORKERS', '1'))
 
 if __name__ == "__main__":
     try:
         mcp.settings.port = 8081
         logger.info(f"Starting ClickhouseTools API on port {mcp.settings.port}")
-        mcp.run(transport="sse")
+        if MCP_WORKERS > 1:
+            import workers
+            workers.serve(
+                custom_sse_app,
+                mcp.settings.host,
+                mcp.settings.port,
+                MCP_WORKERS,
+                registry_dir=os.getenv('SESSION_REGISTRY_DIR'),
+                log_level=mcp.settings.log_level.lower(),
+            )
+        else:
+            mcp.run(transport="sse")
     except Exception as e:
         logger.error(f"Error: {e}")
\ No newline at end of file
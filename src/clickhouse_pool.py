@@ -0,0 +1,234 @@
+import sys
+import time
+import uuid
+import random
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def is_connection_error(error: BaseException) -> bool:
+    """True for clickhouse_connect's network and server failures (OperationalError)."""
+    # Looked up rather than imported: clickhouse_connect is slow to import and is
+    # loaded by the clients themselves, before any of their errors can be raised.
+    exceptions = sys.modules.get("clickhouse_connect.driver.exceptions")
+    return exceptions is not None and isinstance(error, exceptions.OperationalError)
+
+
+class PoolTimeoutError(Exception):
+    """Raised when no pooled client becomes available within the checkout timeout."""
+
+
+class _PooledClient:
+    __slots__ = ("client", "created_at", "last_used")
+
+    def __init__(self, client):
+        now = time.monotonic()
+        self.client = client
+        self.created_at = now
+        self.last_used = now
+
+
+class ClickHousePool:
+    """
+    Thread-safe pool of ClickHouse clients.
+
+    Every checkout gets exclusive use of one client and a fresh server session id,
+    so session state (settings, temporary tables) never leaks between borrowers.
+    Clients idle longer than `health_check_interval` are pinged before reuse,
+    clients idle longer than `idle_timeout` are closed, and connection failures
+    are retried with exponential backoff.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[], Any],
+        size: int = 8,
+        idle_timeout: float = 300.0,
+        health_check_interval: float = 30.0,
+        checkout_timeout: float = 30.0,
+        connect_retries: int = 5,
+        backoff_base: float = 0.2,
+        backoff_max: float = 10.0,
+    ):
+        if size < 1:
+            raise ValueError("Pool size must be at least 1")
+        self._factory = factory
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self.health_check_interval = health_check_interval
+        self.checkout_timeout = checkout_timeout
+        self.connect_retries = connect_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self._idle: List[_PooledClient] = []
+        self._in_use = 0
+        self._warming = 0
+        self._opened = 0
+        self._reconnects = 0
+        self._evicted = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    @contextmanager
+    def connection(self):
+        """Borrow a client for the duration of the `with` block."""
+        pooled = self._acquire()
+        broken = False
+        try:
+            yield pooled.client
+        except Exception as e:
+            # Network or server failure: don't hand this client to anyone else.
+            broken = is_connection_error(e)
+            raise
+        finally:
+            self._release(pooled, broken)
+
+    def _acquire(self) -> _PooledClient:
+        deadline = time.monotonic() + self.checkout_timeout
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError("Pool is closed")
+                self._evict_idle_locked()
+                if self._idle:
+                    # LIFO keeps a small hot set of connections and lets the rest age out.
+                    pooled = self._idle.pop()
+                    self._in_use += 1
+                    break
+                if self._in_use + len(self._idle) < self.size:
+                    pooled = None
+                    self._in_use += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolTimeoutError(f"No ClickHouse client available after {self.checkout_timeout}s")
+                self._cond.wait(remaining)
+
+        try:
+            if pooled is None:
+                pooled = _PooledClient(self._connect())
+            elif time.monotonic() - pooled.last_used > self.health_check_interval and not self._is_healthy(pooled):
+                self._close_client(pooled)
+                with self._cond:
+                    self._reconnects += 1
+                pooled = _PooledClient(self._connect())
+            pooled.client.set_client_setting("session_id", str(uuid.uuid4()))
+            return pooled
+        except BaseException:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+    def warm(self, count: Optional[int] = None) -> int:
+        """
+        Open clients until `count` (by default the pool size) are idle, without
+        waiting for clients in use. Several threads warming at once connect in
+        parallel. Returns the number this call opened.
+        """
+        count = self.size if count is None else min(count, self.size)
+        opened = 0
+        while True:
+            with self._cond:
+                if (self._closed or len(self._idle) + self._warming >= count
+                        or self._in_use + len(self._idle) >= self.size):
+                    return opened
+                self._in_use += 1
+                self._warming += 1
+            try:
+                pooled = _PooledClient(self._connect())
+            except BaseException:
+                with self._cond:
+                    self._in_use -= 1
+                    self._warming -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self._warming -= 1
+            self._release(pooled)
+            opened += 1
+
+    def _release(self, pooled: _PooledClient, broken: bool = False):
+        if broken:
+            self._close_client(pooled)
+        with self._cond:
+            self._in_use -= 1
+            if not broken and not self._closed:
+                pooled.last_used = time.monotonic()
+                self._idle.append(pooled)
+            elif not broken:
+                self._close_client(pooled)
+            self._cond.notify()
+
+    def _connect(self):
+        """Create a new client, retrying with exponential backoff and jitter."""
+        attempt = 0
+        while True:
+            try:
+                client = self._factory()
+                with self._cond:
+                    self._opened += 1
+                return client
+            except Exception as e:
+                attempt += 1
+                if attempt > self.connect_retries:
+                    raise
+                delay = min(self.backoff_max, self.backoff_base * (2 ** (attempt - 1)))
+                delay *= random.uniform(0.5, 1.0)
+                logger.warning(f"ClickHouse connect failed (attempt {attempt}): {e}; retrying in {delay:.2f}s")
+                time.sleep(delay)
+
+    def _is_healthy(self, pooled: _PooledClient) -> bool:
+        try:
+            return bool(pooled.client.ping())
+        except Exception:
+            return False
+
+    def _close_client(self, pooled: _PooledClient):
+        try:
+            pooled.client.close()
+        except Exception:
+            logger.debug("Error closing ClickHouse client", exc_info=True)
+
+    def _evict_idle_locked(self):
+        if not self._idle:
+            return
+        cutoff = time.monotonic() - self.idle_timeout
+        keep = []
+        for pooled in self._idle:
+            if pooled.last_used < cutoff:
+                self._close_client(pooled)
+                self._evicted += 1
+            else:
+                keep.append(pooled)
+        self._idle = keep
+
+    def evict_idle(self):
+        """Close clients that have been idle longer than `idle_timeout`."""
+        with self._cond:
+            self._evict_idle_locked()
+
+    def close(self):
+        """Close all idle clients; clients still checked out are closed on return."""
+        with self._cond:
+            self._closed = True
+            for pooled in self._idle:
+                self._close_client(pooled)
+            self._idle = []
+            self._cond.notify_all()
+
+    def stats(self) -> Dict[str, int]:
+        with self._cond:
+            return {
+                "size": self.size,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "opened": self._opened,
+                "reconnects": self._reconnects,
+                "evicted": self._evicted,
+            }
@@ -0,0 +1,138 @@
+import time
+import secrets
+import logging
+import threading
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+
+from result_format import QueryData
+
+logger = logging.getLogger(__name__)
+
+
+class CursorLimitError(Exception):
+    """Raised when the maximum number of open cursors has been reached."""
+
+
+class CursorNotFoundError(LookupError):
+    """Raised for cursor tokens that are unknown, closed or expired."""
+
+
+class Cursor:
+    """
+    Server-side cursor over a streamed, column-oriented ClickHouse result.
+
+    Blocks are pulled from the stream only as pages are requested, so at most one
+    page (plus the remainder of the current block) is held in memory.
+    """
+
+    def __init__(
+        self,
+        column_names: Sequence[str],
+        blocks: Iterator[Sequence[Sequence[Any]]],
+        close: Callable[[], None],
+        page_size: int,
+    ):
+        self.column_names = list(column_names)
+        self.page_size = page_size
+        self.rows_served = 0
+        self.exhausted = False
+        self.last_used = time.monotonic()
+        self._blocks = blocks
+        self._close = close
+        self._pending: Optional[List[Sequence[Any]]] = None
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def read_page(self) -> QueryData:
+        """Read the next page of at most `page_size` rows."""
+        with self._lock:
+            if self._closed:
+                raise CursorNotFoundError("Cursor is closed")
+            columns: List[List[Any]] = [[] for _ in self.column_names]
+            count = 0
+            while count < self.page_size:
+                block = self._pending
+                self._pending = None
+                if block is None:
+                    try:
+                        block = next(self._blocks)
+                    except StopIteration:
+                        self.exhausted = True
+                        break
+                block_rows = len(block[0]) if block else 0
+                take = min(self.page_size - count, block_rows)
+                for column, values in zip(columns, block):
+                    column.extend(values[:take])
+                if take < block_rows:
+                    self._pending = [values[take:] for values in block]
+                count += take
+            self.rows_served += count
+            self.last_used = time.monotonic()
+            return QueryData(self.column_names, columns)
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._pending = None
+        try:
+            self._close()
+        except Exception:
+            logger.debug("Error closing cursor stream", exc_info=True)
+
+
+class CursorStore:
+    """Registry of open cursors with a cap on open cursors and an idle timeout."""
+
+    def __init__(self, max_open: int = 4, idle_timeout: float = 300.0):
+        self.max_open = max_open
+        self.idle_timeout = idle_timeout
+        self._cursors: Dict[str, Cursor] = {}
+        self._lock = threading.Lock()
+
+    def has_capacity(self) -> bool:
+        self.sweep()
+        with self._lock:
+            return len(self._cursors) < self.max_open
+
+    def add(self, cursor: Cursor) -> str:
+        """Register a cursor and return its token; closes it if no slot is free."""
+        self.sweep()
+        with self._lock:
+            if len(self._cursors) < self.max_open:
+                token = secrets.token_urlsafe(16)
+                self._cursors[token] = cursor
+                return token
+        cursor.close()
+        raise CursorLimitError(f"Too many open cursors (max {self.max_open}); fetch or close an existing cursor first")
+
+    def get(self, token: str) -> Cursor:
+        self.sweep()
+        with self._lock:
+            cursor = self._cursors.get(token)
+        if cursor is None:
+            raise CursorNotFoundError("Unknown or expired cursor")
+        return cursor
+
+    def close(self, token: str) -> bool:
+        with self._lock:
+            cursor = self._cursors.pop(token, None)
+        if cursor is None:
+            return False
+        cursor.close()
+        return True
+
+    def sweep(self) -> int:
+        """Close cursors idle longer than `idle_timeout`."""
+        cutoff = time.monotonic() - self.idle_timeout
+        with self._lock:
+            expired = [token for token, cursor in self._cursors.items() if cursor.last_used < cutoff]
+            cursors = [self._cursors.pop(token) for token in expired]
+        for cursor in cursors:
+            cursor.close()
+        return len(cursors)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._cursors)
@@ -0,0 +1,199 @@
+"""
+Named, parameterized queries for frequently asked questions.
+
+Queries are loaded from a JSON object keyed by name:
+
+    {
+      "volumes_by_campaign": {
+        "description": "Actualized volume and revenue per campaign of an organization.",
+        "sql": "SELECT campaignId, sum(actualizedVolume) AS volume FROM actualized_volumes WHERE organizationId = {organization_id:String} GROUP BY campaignId",
+        "refresh_seconds": 300,
+        "precompute": [{"organization_id": "org-1"}]
+      }
+    }
+
+Parameters use ClickHouse's `{name:Type}` placeholders and are sent separately
+from the SQL, so the server binds and type-checks them. Results are kept in
+memory per parameter set; queries with `refresh_seconds` are recomputed in the
+background for their `precompute` parameter sets and any set requested since.
+"""
+import re
+import json
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+from result_format import QueryData
+
+PARAMETER_RE = re.compile(r"\{\s*([A-Za-z_]\w*)\s*:\s*([^{}]+?)\s*\}")
+
+_SCALARS = (str, int, float, bool, type(None))
+
+
+class NamedQueryError(ValueError):
+    """Raised for unknown named queries and missing, unexpected or malformed parameters."""
+
+
+def _valid_value(value: Any) -> bool:
+    if isinstance(value, (list, tuple)):
+        return all(_valid_value(item) for item in value)
+    return isinstance(value, _SCALARS)
+
+
+class NamedQuery:
+    def __init__(
+        self,
+        name: str,
+        sql: str,
+        description: str = "",
+        refresh_seconds: Optional[float] = None,
+        max_age_seconds: float = 300.0,
+        precompute: Sequence[Mapping[str, Any]] = (),
+    ):
+        self.name = name
+        self.sql = sql
+        self.description = description
+        self.refresh_seconds = refresh_seconds
+        self.max_age_seconds = max_age_seconds
+        self.parameters: Dict[str, str] = {}
+        for parameter, parameter_type in PARAMETER_RE.findall(sql):
+            self.parameters.setdefault(parameter, parameter_type)
+        self.precompute = [self.bind(params) for params in (precompute or ([{}] if not self.parameters else []))]
+
+    @classmethod
+    def from_config(cls, name: str, config: Mapping[str, Any]) -> "NamedQuery":
+        if not isinstance(config.get("sql"), str):
+            raise NamedQueryError(f"Named query '{name}' has no sql")
+        return cls(
+            name,
+            config["sql"],
+            description=config.get("description", ""),
+            refresh_seconds=config.get("refresh_seconds"),
+            max_age_seconds=config.get("max_age_seconds", 300.0),
+            precompute=config.get("precompute", ()),
+        )
+
+    def bind(self, params: Mapping[str, Any]) -> Dict[str, Any]:
+        """Check `params` against the query's placeholders; values are bound by ClickHouse, not spliced in."""
+        missing = [name for name in self.parameters if name not in params]
+        unexpected = [name for name in params if name not in self.parameters]
+        if missing or unexpected:
+            problems = []
+            if missing:
+                problems.append(f"missing {', '.join(missing)}")
+            if unexpected:
+                problems.append(f"unexpected {', '.join(unexpected)}")
+            expected = ", ".join(f"{name} ({parameter_type})" for name, parameter_type in self.parameters.items()) or "none"
+            raise NamedQueryError(f"Parameters for '{self.name}': {'; '.join(problems)}. Expected: {expected}")
+        for name, value in params.items():
+            if not _valid_value(value):
+                raise NamedQueryError(f"Parameter '{name}' must be a string, number, boolean, null or a list of them")
+        return {name: params[name] for name in self.parameters}
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "description": self.description,
+            "parameters": self.parameters,
+            "refresh_seconds": self.refresh_seconds,
+        }
+
+
+class NamedResult:
+    __slots__ = ("data", "computed_at", "refreshed_at")
+
+    def __init__(self, data: QueryData):
+        self.data = data
+        # Wall-clock time for reporting; monotonic time for scheduling.
+        self.computed_at = time.time()
+        self.refreshed_at = time.monotonic()
+
+    def age(self) -> float:
+        return time.monotonic() - self.refreshed_at
+
+
+def parameters_key(params: Mapping[str, Any]) -> str:
+    return json.dumps(params, sort_keys=True)
+
+
+class NamedQueryRegistry:
+    """Named queries and their latest results, at most `max_results` of them (least recently used dropped first)."""
+
+    def __init__(self, queries: Sequence[NamedQuery] = (), max_results: int = 256):
+        self.queries: Dict[str, NamedQuery] = {query.name: query for query in queries}
+        self.max_results = max_results
+        self._results: "OrderedDict[Tuple[str, str], NamedResult]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config: Mapping[str, Mapping[str, Any]], max_results: int = 256) -> "NamedQueryRegistry":
+        return cls([NamedQuery.from_config(name, query) for name, query in config.items()], max_results)
+
+    @classmethod
+    def load(cls, path: str, max_results: int = 256) -> "NamedQueryRegistry":
+        with open(path) as f:
+            return cls.from_config(json.load(f), max_results)
+
+    def get(self, name: str) -> NamedQuery:
+        query = self.queries.get(name)
+        if query is None:
+            available = ", ".join(sorted(self.queries)) or "none"
+            raise NamedQueryError(f"Unknown named query '{name}'. Available: {available}")
+        return query
+
+    def list(self) -> List[Dict[str, Any]]:
+        return [query.describe() for query in self.queries.values()]
+
+    def lookup(self, name: str, params: Mapping[str, Any]) -> Optional[NamedResult]:
+        key = (name, parameters_key(params))
+        with self._lock:
+            result = self._results.get(key)
+            if result is not None:
+                self._results.move_to_end(key)
+            return result
+
+    def store(self, name: str, params: Mapping[str, Any], data: QueryData) -> NamedResult:
+        key = (name, parameters_key(params))
+        result = NamedResult(data)
+        with self._lock:
+            self._results[key] = result
+            self._results.move_to_end(key)
+            while len(self._results) > self.max_results:
+                self._results.popitem(last=False)
+        return result
+
+    @property
+    def scheduled(self) -> bool:
+        return any(query.refresh_seconds for query in self.queries.values())
+
+    def due(self) -> List[Tuple[NamedQuery, Dict[str, Any]]]:
+        """Scheduled (query, params) pairs that were never computed or are older than their refresh interval."""
+        with self._lock:
+            results = dict(self._results)
+        due = []
+        for query in self.queries.values():
+            if not query.refresh_seconds:
+                continue
+            wanted = {parameters_key(params): params for params in query.precompute}
+            for name, key in results:
+                if name == query.name:
+                    wanted.setdefault(key, json.loads(key))
+            for key, params in wanted.items():
+                result = results.get((query.name, key))
+                if result is None or result.age() >= query.refresh_seconds:
+                    due.append((query, params))
+        return due
+
+    def next_refresh_in(self) -> float:
+        """Seconds until the next scheduled result goes stale (0 if one already has)."""
+        with self._lock:
+            results = dict(self._results)
+        waits = []
+        for query in self.queries.values():
+            if not query.refresh_seconds:
+                continue
+            if any((query.name, parameters_key(params)) not in results for params in query.precompute):
+                return 0.0
+            waits.extend(query.refresh_seconds - result.age() for (name, _), result in results.items() if name == query.name)
+        return max(0.0, min(waits)) if waits else 60.0
@@ -0,0 +1,131 @@
+import logging
+from typing import Any, Dict, Optional, Tuple
+
+from sql_lexer import subquery
+
+logger = logging.getLogger(__name__)
+
+BUDGET_ACTIONS = ("reject", "limit")
+
+
+class BudgetExceededError(Exception):
+    """Raised when a query's estimated cost is over budget and the action is 'reject'."""
+
+
+class QueryBudget:
+    """
+    Pre-flight cost estimation and ClickHouse-side guards for agent queries.
+
+    `estimate` asks ClickHouse (EXPLAIN ESTIMATE) how many rows a query will read and
+    derives the bytes from each table's average uncompressed row size. `plan` then
+    either rejects an over-budget query or, with action 'limit', caps how much it
+    may read and how many rows it returns. Every query carries the guard settings.
+    """
+
+    def __init__(
+        self,
+        max_rows: int = 1_000_000_000,
+        max_bytes: int = 50 * 1024 ** 3,
+        action: str = "reject",
+        limit_rows: int = 1000,
+        preflight: bool = True,
+        max_execution_time: int = 60,
+        max_result_rows: int = 100_000,
+        max_bytes_to_read: int = 100 * 1024 ** 3,
+    ):
+        if action not in BUDGET_ACTIONS:
+            raise ValueError(f"Unknown budget action '{action}'. Use one of: {', '.join(BUDGET_ACTIONS)}")
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.action = action
+        self.limit_rows = limit_rows
+        self.preflight = preflight
+        self.max_execution_time = max_execution_time
+        self.max_result_rows = max_result_rows
+        self.max_bytes_to_read = max_bytes_to_read
+
+    def guard_settings(self, streaming: bool = False) -> Dict[str, Any]:
+        """
+        Settings sent with every query so ClickHouse enforces the limits itself.
+
+        Streamed results are paged through cursors, so they carry neither
+        `max_result_rows` nor `max_execution_time`: ClickHouse counts the wall time
+        between page fetches, which can span several agent turns. Open streams are
+        bounded by the cursor idle timeout instead, which closes them.
+        """
+        settings = {
+            # readonly=2 forbids writes and DDL but, unlike readonly=1, still lets the
+            # limits below be applied to the same request.
+            "readonly": 2,
+            "max_bytes_to_read": self.max_bytes_to_read,
+        }
+        if not streaming:
+            settings["max_execution_time"] = self.max_execution_time
+            settings["max_result_rows"] = self.max_result_rows
+        return settings
+
+    def estimate(self, client, sql_query: str, parameters: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """Estimate rows, parts, marks and bytes a query will read; None if ClickHouse can't say."""
+        try:
+            plan = client.query(f"EXPLAIN ESTIMATE {sql_query}", parameters=parameters, settings={"readonly": 2})
+        except Exception as e:
+            logger.debug(f"EXPLAIN ESTIMATE failed: {e}")
+            return None
+
+        per_table: Dict[str, int] = {}
+        estimate = {"rows": 0, "bytes": 0, "parts": 0, "marks": 0}
+        for database, table, parts, rows, marks in plan.result_rows:
+            name = f"{database}.{table}"
+            per_table[name] = per_table.get(name, 0) + int(rows)
+            estimate["rows"] += int(rows)
+            estimate["parts"] += int(parts)
+            estimate["marks"] += int(marks)
+
+        if per_table:
+            try:
+                sizes = client.query(
+                    "SELECT concat(database, '.', table), sum(rows), sum(data_uncompressed_bytes) "
+                    "FROM system.parts WHERE active AND concat(database, '.', table) IN %(tables)s "
+                    "GROUP BY database, table",
+                    parameters={"tables": tuple(per_table)},
+                    settings={"readonly": 2},
+                )
+                for name, total_rows, total_bytes in sizes.result_rows:
+                    if total_rows:
+                        estimate["bytes"] += per_table.get(name, 0) * int(total_bytes) // int(total_rows)
+            except Exception as e:
+                logger.debug(f"Table size lookup failed: {e}")
+        return estimate
+
+    def over_budget(self, estimate: Optional[Dict[str, Any]]) -> bool:
+        if estimate is None:
+            return False
+        return estimate["rows"] > self.max_rows or estimate["bytes"] > self.max_bytes
+
+    def plan(
+        self,
+        sql_query: str,
+        estimate: Optional[Dict[str, Any]],
+        streaming: bool = False,
+    ) -> Tuple[str, Dict[str, Any], bool]:
+        """
+        Return `(sql, settings, truncated)` for executing a query.
+
+        Raises BudgetExceededError if the query is over budget and the action is 'reject'.
+        With action 'limit' the query is wrapped in a LIMIT and reading stops (with a
+        partial result) once the row budget has been read.
+        """
+        settings = self.guard_settings(streaming)
+        if not self.over_budget(estimate):
+            return sql_query, settings, False
+
+        if self.action == "reject":
+            raise BudgetExceededError(
+                f"Query would read about {estimate['rows']:,} rows / {estimate['bytes']:,} bytes, "
+                f"over the budget of {self.max_rows:,} rows / {self.max_bytes:,} bytes. "
+                "Add filters on the sorting key, select fewer columns, or aggregate in ClickHouse."
+            )
+
+        settings["max_rows_to_read"] = self.max_rows
+        settings["read_overflow_mode"] = "break"
+        return f"SELECT * FROM {subquery(sql_query)} LIMIT {self.limit_rows}", settings, True
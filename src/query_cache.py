@@ -0,0 +1,175 @@
+import re
+import sys
+import asyncio
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, FrozenSet, Optional, Sequence, Tuple
+
+_TABLE_RE = re.compile(r"\b(?:FROM|JOIN)\s+((?:[`\"]?\w+[`\"]?\.)?[`\"]?\w+[`\"]?)", re.IGNORECASE)
+
+
+def referenced_tables(sql: str) -> FrozenSet[str]:
+    """Best-effort set of (unqualified, lower-cased) table names read by a query."""
+    tables = set()
+    for name in _TABLE_RE.findall(sql):
+        tables.add(name.replace("`", "").replace('"', "").split(".")[-1].lower())
+    return frozenset(tables)
+
+
+def estimate_size(columns: Sequence[Sequence[Any]]) -> int:
+    """Approximate in-memory size of a column-oriented result in bytes, sampling long columns."""
+    size = sys.getsizeof(columns)
+    for column in columns:
+        size += sys.getsizeof(column)
+        if not column:
+            continue
+        sample = column[:100]
+        size += sum(sys.getsizeof(value) for value in sample) * len(column) // len(sample)
+    return size
+
+
+class _CacheEntry:
+    __slots__ = ("value", "size", "expires_at", "tables")
+
+    def __init__(self, value, size: int, expires_at: float, tables: FrozenSet[str]):
+        self.value = value
+        self.size = size
+        self.expires_at = expires_at
+        self.tables = tables
+
+
+class ResultCache:
+    """
+    In-process LRU cache of query results with a TTL and a total byte budget.
+
+    Entries remember the tables their query read from so they can be dropped
+    per table with `invalidate`.
+    """
+
+    def __init__(self, ttl: float = 60.0, max_bytes: int = 64 * 1024 * 1024):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, _CacheEntry]" = OrderedDict()
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.max_bytes > 0
+
+    def get(self, key: str) -> Tuple[bool, Optional[Any]]:
+        """Return `(hit, value)` for a key, counting the lookup in the stats."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at <= time.monotonic():
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self._misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return True, entry.value
+
+    def put(self, key: str, value: Any, size: int, tables: FrozenSet[str] = frozenset()):
+        if not self.enabled or size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = _CacheEntry(value, size, time.monotonic() + self.ttl, tables)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self._evictions += 1
+
+    def invalidate(self, table: Optional[str] = None) -> int:
+        """Drop entries reading from `table`, or every entry if no table is given."""
+        with self._lock:
+            if table is None:
+                keys = list(self._entries)
+            else:
+                table = table.replace("`", "").split(".")[-1].lower()
+                keys = [key for key, entry in self._entries.items() if table in entry.tables]
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+            }
+
+
+class _Flight:
+    __slots__ = ("future", "waiters")
+
+    def __init__(self, future: "asyncio.Future[Any]"):
+        self.future = future
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls that share a key into one execution.
+
+    The first caller for a key starts the work; callers arriving while it is
+    still running wait for the same result instead of starting their own. The
+    work is cancelled only once every waiting caller has been cancelled.
+    """
+
+    def __init__(self):
+        self._flights: Dict[str, _Flight] = {}
+        self._executions = 0
+        self._coalesced = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Return `(result, shared)`, where `shared` is True if another call did the work."""
+        flight = self._flights.get(key)
+        shared = flight is not None
+        if shared:
+            self._coalesced += 1
+        else:
+            flight = _Flight(asyncio.ensure_future(fn()))
+            self._flights[key] = flight
+            self._executions += 1
+            flight.future.add_done_callback(lambda done: self._forget(key, done))
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.future), shared
+        except asyncio.CancelledError:
+            if flight.waiters == 1 and not flight.future.done():
+                flight.future.cancel()
+            raise
+        finally:
+            flight.waiters -= 1
+
+    def _forget(self, key: str, future: "asyncio.Future[Any]"):
+        flight = self._flights.get(key)
+        if flight is not None and flight.future is future:
+            del self._flights[key]
+        if not future.cancelled():
+            # Mark the exception as retrieved even if every waiter has gone.
+            future.exception()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "executions": self._executions,
+            "coalesced": self._coalesced,
+            "in_flight": len(self._flights),
+        }
@@ -0,0 +1,92 @@
+"""
+Column statistics computed inside ClickHouse.
+
+`profile_sql` wraps a SELECT as a subquery and builds one aggregate query that
+summarises every column in a single pass: non-null counts, approximate distinct
+counts (`uniq`), min/max, mean and quantiles for numbers, and the most frequent
+values (`topK`) for strings and enums. `parse_profile` turns its one-row result
+into a compact per-column summary.
+"""
+import re
+from typing import Any, Dict, List, Sequence, Tuple
+
+from sql_lexer import subquery
+
+QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+_WRAPPER_RE = re.compile(r"^(?:Nullable|LowCardinality)\((.*)\)$")
+_NUMERIC_RE = re.compile(r"^(?:U?Int\d+|Float\d+|Decimal(?:\d+)?\b)")
+_TEMPORAL_RE = re.compile(r"^(?:Date|Date32|DateTime|DateTime64)\b")
+_CATEGORICAL_RE = re.compile(r"^(?:String|FixedString|Enum8|Enum16|UUID|Bool|IPv4|IPv6)\b")
+
+
+def base_type(column_type: str) -> str:
+    """Strip Nullable(...) and LowCardinality(...) wrappers from a ClickHouse type."""
+    while True:
+        match = _WRAPPER_RE.match(column_type)
+        if not match:
+            return column_type
+        column_type = match.group(1)
+
+
+def column_kind(column_type: str) -> str:
+    """Classify a type as "numeric", "temporal", "categorical" or "other" (arrays, maps, tuples...)."""
+    column_type = base_type(column_type)
+    if _NUMERIC_RE.match(column_type):
+        return "numeric"
+    if _TEMPORAL_RE.match(column_type):
+        return "temporal"
+    if _CATEGORICAL_RE.match(column_type):
+        return "categorical"
+    return "other"
+
+
+def quote_identifier(name: str) -> str:
+    return "`" + name.replace("\\", "\\\\").replace("`", "\\`") + "`"
+
+
+def _statistics(kind: str, top_k: int) -> List[Tuple[str, str]]:
+    """(name, aggregate template) pairs computed for a column of this kind; `{c}` is the column."""
+    stats = [("non_null", "count({c})"), ("approx_distinct", "uniq({c})")]
+    if kind in ("numeric", "temporal"):
+        stats += [("min", "min({c})"), ("max", "max({c})")]
+    if kind == "numeric":
+        levels = ", ".join(str(level) for level in QUANTILES)
+        stats += [("mean", "avg({c})"), ("quantiles", f"quantiles({levels})({{c}})")]
+    if kind == "categorical" and top_k > 0:
+        stats.append(("top", f"topK({top_k})({{c}})"))
+    return stats
+
+
+def profile_sql(sql_query: str, columns: Sequence[Tuple[str, str]], top_k: int = 5) -> str:
+    """Build the single-pass statistics query for `sql_query`, whose result has these `(name, type)` columns."""
+    selects = ["count() AS `rows`"]
+    for index, (name, column_type) in enumerate(columns):
+        column = quote_identifier(name)
+        for stat, template in _statistics(column_kind(column_type), top_k):
+            selects.append(f"{template.format(c=column)} AS `c{index}_{stat}`")
+    return f"SELECT {', '.join(selects)} FROM {subquery(sql_query)}"
+
+
+def parse_profile(columns: Sequence[Tuple[str, str]], names: Sequence[str], values: Sequence[Any]) -> Dict[str, Any]:
+    """Turn the one-row result of `profile_sql` into {"row_count", "columns": {name: statistics}}."""
+    row = dict(zip(names, values))
+    total = row["rows"]
+    profile: Dict[str, Dict[str, Any]] = {}
+    for index, (name, column_type) in enumerate(columns):
+        prefix = f"c{index}_"
+        stats = {key[len(prefix):]: value for key, value in row.items() if key.startswith(prefix)}
+        non_null = stats.pop("non_null")
+        summary: Dict[str, Any] = {"type": column_type, "nulls": total - non_null}
+        if not non_null:
+            # Aggregates over no values are defaults or NaN rather than statistics.
+            profile[name] = {**summary, "approx_distinct": 0}
+            continue
+        quantiles = stats.pop("quantiles", None)
+        summary.update(stats)
+        if quantiles is not None:
+            summary["quantiles"] = {f"p{round(level * 100)}": value for level, value in zip(QUANTILES, quantiles)}
+        if isinstance(summary.get("mean"), float):
+            summary["mean"] = round(summary["mean"], 6)
+        profile[name] = summary
+    return {"row_count": total, "columns": profile}
@@ -0,0 +1,128 @@
+import time
+import uuid
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+CANCELLED = "cancelled"
+
+
+class QueryCancelledError(Exception):
+    """Raised in a worker when its query was cancelled before it was sent to ClickHouse."""
+
+
+class QueryDeadlineError(Exception):
+    """Raised when a query runs past the configured deadline and is killed."""
+
+
+class _TrackedQuery:
+    __slots__ = ("query_id", "sql", "state", "registered_at", "started_at")
+
+    def __init__(self, query_id: str, sql: str):
+        self.query_id = query_id
+        self.sql = sql
+        self.state = QUEUED
+        self.registered_at = time.monotonic()
+        self.started_at = None
+
+
+class QueryTracker:
+    """
+    Registry of in-flight ClickHouse queries, keyed by the query_id they are sent with.
+
+    A query is registered when a tool call schedules it, started by the worker
+    thread right before it is sent, and finished by that worker. Cancelling a
+    queued query stops it from ever being sent; cancelling a running one issues
+    `KILL QUERY` on a dedicated control connection and thread, so kills go out
+    even when every pooled client and worker is busy.
+    """
+
+    def __init__(self, client_factory: Callable[[], Any]):
+        self._client_factory = client_factory
+        self._control_client = None
+        self._control_lock = threading.Lock()
+        self._queries: Dict[str, _TrackedQuery] = {}
+        self._lock = threading.Lock()
+        self._kill_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="clickhouse-kill")
+        self._kills = 0
+        self._cancelled = 0
+
+    def register(self, sql: str) -> str:
+        query_id = uuid.uuid4().hex
+        with self._lock:
+            self._queries[query_id] = _TrackedQuery(query_id, sql)
+        return query_id
+
+    def start(self, query_id: str):
+        """Mark a query as sent; raises QueryCancelledError if it was cancelled while queued."""
+        with self._lock:
+            tracked = self._queries.get(query_id)
+            if tracked is None or tracked.state == CANCELLED:
+                self._queries.pop(query_id, None)
+                raise QueryCancelledError(f"Query {query_id} was cancelled before it started")
+            tracked.state = RUNNING
+            tracked.started_at = time.monotonic()
+
+    def finish(self, query_id: str):
+        with self._lock:
+            self._queries.pop(query_id, None)
+
+    def cancel(self, query_id: str) -> bool:
+        """
+        Cancel a query without blocking the caller.
+
+        Returns True if the query was still queued or running. Safe to call from a
+        cancelled coroutine, as nothing is awaited.
+        """
+        with self._lock:
+            tracked = self._queries.get(query_id)
+            if tracked is None or tracked.state == CANCELLED:
+                return False
+            running = tracked.state == RUNNING
+            tracked.state = CANCELLED
+            self._cancelled += 1
+        if running:
+            self._kill_executor.submit(self._kill, query_id)
+        return True
+
+    def _kill(self, query_id: str):
+        try:
+            with self._control_lock:
+                if self._control_client is None:
+                    self._control_client = self._client_factory()
+                self._control_client.command(
+                    "KILL QUERY WHERE query_id = %(query_id)s ASYNC",
+                    parameters={"query_id": query_id},
+                )
+            with self._lock:
+                self._kills += 1
+            logger.info(f"Killed ClickHouse query {query_id}")
+        except Exception as e:
+            logger.warning(f"Failed to kill ClickHouse query {query_id}: {e}")
+            with self._control_lock:
+                self._control_client = None
+
+    def in_flight(self) -> List[Dict[str, Any]]:
+        now = time.monotonic()
+        with self._lock:
+            return [
+                {
+                    "query_id": tracked.query_id,
+                    "state": tracked.state,
+                    "age_seconds": round(now - tracked.registered_at, 3),
+                }
+                for tracked in self._queries.values()
+            ]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "in_flight": len(self._queries),
+                "cancelled": self._cancelled,
+                "killed": self._kills,
+            }
@@ -0,0 +1,84 @@
+"""
+Gzip compression of responses to MCP clients.
+
+Starlette's GZipMiddleware leaves SSE streams alone, and those carry the
+results. This layer compresses them as one gzip stream, flushed after every
+chunk so each event is delivered (and decodable) as soon as it is sent. Other
+responses are compressed when their body reaches `minimum_size` bytes.
+"""
+import gzip
+import zlib
+
+from starlette.datastructures import Headers, MutableHeaders
+
+
+def accepts_gzip(scope) -> bool:
+    for name, value in scope["headers"]:
+        if name == b"accept-encoding":
+            return b"gzip" in value
+    return False
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = 1024, level: int = 6):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.level = level
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not accepts_gzip(scope):
+            return await self.app(scope, receive, send)
+        await self.app(scope, receive, _GzipSender(send, self.minimum_size, self.level))
+
+
+class _GzipSender:
+    """The `send` callable handed to the app; rewrites the response as it goes out."""
+
+    def __init__(self, send, minimum_size: int, level: int):
+        self.send = send
+        self.minimum_size = minimum_size
+        self.level = level
+        self.start = None
+        self.compressor = None
+        # True once the start message is sent: compressing (self.compressor) or passing through.
+        self.started = False
+
+    async def __call__(self, message):
+        if message["type"] == "http.response.start":
+            self.start = message
+            return
+        if message["type"] != "http.response.body":
+            return await self.send(message)
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if not self.started:
+            self.started = True
+            headers = Headers(raw=self.start["headers"])
+            if "content-encoding" in headers or (not more_body and len(body) < self.minimum_size):
+                await self.send(self.start)
+                return await self.send(message)
+            if more_body:
+                self.compressor = zlib.compressobj(self.level, zlib.DEFLATED, 31)
+            else:
+                body = gzip.compress(body, self.level)
+            self._set_headers(None if more_body else len(body))
+            await self.send(self.start)
+            if self.compressor is None:
+                return await self.send({**message, "body": body})
+
+        if self.compressor is None:
+            return await self.send(message)
+        compressed = self.compressor.compress(body)
+        compressed += self.compressor.flush(zlib.Z_SYNC_FLUSH if more_body else zlib.Z_FINISH)
+        await self.send({**message, "body": compressed})
+
+    def _set_headers(self, content_length):
+        headers = MutableHeaders(raw=self.start["headers"])
+        headers["Content-Encoding"] = "gzip"
+        headers.add_vary_header("Accept-Encoding")
+        if content_length is None:
+            if "content-length" in headers:
+                del headers["Content-Length"]
+        else:
+            headers["Content-Length"] = str(content_length)
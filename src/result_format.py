@@ -0,0 +1,76 @@
+import io
+import csv
+from typing import Any, Callable, Dict, List, Sequence
+
+
+class QueryData:
+    """
+    Column-oriented query result: column names plus one value sequence per column.
+
+    `stats` carries execution details reported alongside the data, such as the
+    pre-flight cost estimate.
+    """
+
+    __slots__ = ("column_names", "columns", "row_count", "stats")
+
+    def __init__(self, column_names: Sequence[str], columns: Sequence[Sequence[Any]]):
+        self.column_names = list(column_names)
+        self.columns = list(columns)
+        self.row_count = len(self.columns[0]) if self.columns else 0
+        self.stats: Dict[str, Any] = {}
+
+    @classmethod
+    def from_result(cls, result) -> "QueryData":
+        """Build from a clickhouse_connect QueryResult fetched with `column_oriented=True`."""
+        return cls(result.column_names, result.result_columns)
+
+    def iter_rows(self):
+        return zip(*self.columns)
+
+
+def encode_rows(data: QueryData) -> Dict[str, Any]:
+    names = data.column_names
+    return {"rows": [dict(zip(names, row)) for row in data.iter_rows()]}
+
+
+def encode_columnar(data: QueryData) -> Dict[str, Any]:
+    return {"columns": data.column_names, "data": data.columns}
+
+
+def encode_compact(data: QueryData) -> Dict[str, Any]:
+    return {"columns": data.column_names, "rows": [list(row) for row in data.iter_rows()]}
+
+
+def _encode_delimited(data: QueryData, dialect: str) -> Dict[str, Any]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, dialect=dialect, lineterminator="\n")
+    writer.writerow(data.column_names)
+    writer.writerows(data.iter_rows())
+    return {"columns": data.column_names, "text": buffer.getvalue()}
+
+
+def encode_csv(data: QueryData) -> Dict[str, Any]:
+    return _encode_delimited(data, "excel")
+
+
+def encode_tsv(data: QueryData) -> Dict[str, Any]:
+    return _encode_delimited(data, "excel-tab")
+
+
+ENCODERS: Dict[str, Callable[[QueryData], Dict[str, Any]]] = {
+    "rows": encode_rows,
+    "columnar": encode_columnar,
+    "compact": encode_compact,
+    "csv": encode_csv,
+    "tsv": encode_tsv,
+}
+
+FORMATS: List[str] = list(ENCODERS)
+
+
+def encode_result(data: QueryData, format: str = "rows") -> Dict[str, Any]:
+    """Encode a result in one of `FORMATS`; raises ValueError for unknown formats."""
+    encoder = ENCODERS.get(format)
+    if encoder is None:
+        raise ValueError(f"Unknown format '{format}'. Use one of: {', '.join(FORMATS)}")
+    return encoder(data)
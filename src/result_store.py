@@ -0,0 +1,203 @@
+"""
+On-disk store for large query results.
+
+Results are written once as Arrow IPC files and read back through memory maps,
+so slicing, projecting or aggregating a stored result touches only the pages it
+needs and never re-runs the query. Files are evicted least recently used first
+to keep the store within its disk budget.
+
+pyarrow is optional: without it `ResultStore.available` is False and results
+are always returned inline. It is imported on first use, keeping it out of
+server startup.
+"""
+import os
+import re
+import atexit
+import shutil
+import secrets
+import logging
+import tempfile
+import threading
+import importlib.util
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence, Tuple
+
+from result_format import QueryData
+
+HAVE_PYARROW = importlib.util.find_spec("pyarrow") is not None
+
+if TYPE_CHECKING:
+    import pyarrow as pa
+
+logger = logging.getLogger(__name__)
+
+AGGREGATE_FUNCTIONS = ("count", "count_distinct", "sum", "min", "max", "mean")
+
+_AGGREGATION_RE = re.compile(r"^\s*(\w+)\s*\(\s*(\*|[^()]+?)\s*\)\s*$")
+
+
+class ResultNotFoundError(LookupError):
+    """Raised for result handles that are unknown or were evicted."""
+
+
+class _StoredResult:
+    __slots__ = ("path", "size", "row_count", "schema")
+
+    def __init__(self, path: str, size: int, row_count: int, schema: List[Dict[str, str]]):
+        self.path = path
+        self.size = size
+        self.row_count = row_count
+        self.schema = schema
+
+
+def to_table(data: QueryData) -> "pa.Table":
+    """Convert a result to an Arrow table; columns Arrow can't type are stored as strings."""
+    import pyarrow as pa
+
+    arrays = []
+    for values in data.columns:
+        try:
+            arrays.append(pa.array(values))
+        except pa.ArrowException:
+            arrays.append(pa.array([None if value is None else str(value) for value in values], pa.string()))
+    return pa.Table.from_arrays(arrays, names=data.column_names)
+
+
+def to_query_data(table: "pa.Table") -> QueryData:
+    return QueryData(table.column_names, [column.to_pylist() for column in table.columns])
+
+
+def parse_aggregation(expression: str) -> Tuple[str, str]:
+    """Split `"sum(value)"` into `("sum", "value")`; `count(*)` counts rows."""
+    match = _AGGREGATION_RE.match(expression)
+    if not match or match.group(1).lower() not in AGGREGATE_FUNCTIONS:
+        raise ValueError(f"Invalid aggregation '{expression}'. Use function(column) with one of: {', '.join(AGGREGATE_FUNCTIONS)}")
+    function, column = match.group(1).lower(), match.group(2)
+    if column == "*" and function != "count":
+        raise ValueError(f"Only count accepts '*', got '{expression}'")
+    return function, column
+
+
+def aggregate(table: "pa.Table", aggregations: Sequence[str], group_by: Sequence[str] = ()) -> "pa.Table":
+    """Group `table` by the `group_by` columns and compute `aggregations` such as `"sum(value)"`."""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    if not aggregations:
+        raise ValueError("At least one aggregation is required")
+    specs, names = [], list(group_by)
+    for expression in aggregations:
+        function, column = parse_aggregation(expression)
+        if column == "*":
+            # Count every row, nulls included, of any column.
+            specs.append((table.column_names[0], "count", pc.CountOptions(mode="all")))
+        else:
+            if column not in table.column_names:
+                raise ValueError(f"Unknown column '{column}'")
+            specs.append((column, function))
+        names.append(expression.strip())
+    for key in group_by:
+        if key not in table.column_names:
+            raise ValueError(f"Unknown column '{key}'")
+    result = table.group_by(list(group_by)).aggregate(specs)
+    # Where pyarrow places the keys varies by version; return them first, then the aggregations as asked.
+    keys = set(group_by)
+    aggregated = [column for name, column in zip(result.column_names, result.columns) if name not in keys]
+    columns = [result.column(key) for key in group_by] + aggregated
+    return pa.Table.from_arrays(columns, names=names)
+
+
+class ResultStore:
+    """Arrow IPC files in `directory` (a temporary directory by default), capped at `max_bytes` in total."""
+
+    def __init__(self, directory: Optional[str] = None, max_bytes: int = 1024 ** 3):
+        self.max_bytes = max_bytes
+        self._directory = directory
+        self._entries: "OrderedDict[str, _StoredResult]" = OrderedDict()
+        self._bytes = 0
+        self._evictions = 0
+        self._lock = threading.Lock()
+
+    @property
+    def available(self) -> bool:
+        return HAVE_PYARROW and self.max_bytes > 0
+
+    @property
+    def directory(self) -> str:
+        with self._lock:
+            if self._directory is None:
+                self._directory = tempfile.mkdtemp(prefix="clickhouse-mcp-results-")
+                atexit.register(shutil.rmtree, self._directory, ignore_errors=True)
+            else:
+                os.makedirs(self._directory, exist_ok=True)
+            return self._directory
+
+    def put(self, data: QueryData) -> Dict[str, Any]:
+        """Write a result to disk and describe it, including its new "handle"."""
+        if not HAVE_PYARROW:
+            raise RuntimeError("Storing results needs pyarrow installed on the server")
+        import pyarrow as pa
+
+        table = to_table(data)
+        handle = secrets.token_urlsafe(16)
+        path = os.path.join(self.directory, f"{handle}.arrow")
+        with pa.OSFile(path, "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        size = os.path.getsize(path)
+        if size > self.max_bytes:
+            os.remove(path)
+            raise ValueError(f"Result of {size} bytes exceeds the result store budget of {self.max_bytes} bytes")
+
+        schema = [{"name": field.name, "type": str(field.type)} for field in table.schema]
+        entry = _StoredResult(path, size, table.num_rows, schema)
+        with self._lock:
+            self._entries[handle] = entry
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self._evictions += 1
+        return self._describe(handle, entry)
+
+    def table(self, handle: str) -> "pa.Table":
+        """Memory-map a stored result; the table's buffers point into the file rather than copies."""
+        import pyarrow as pa
+
+        entry = self._get(handle)
+        with pa.memory_map(entry.path, "r") as source:
+            return pa.ipc.open_file(source).read_all()
+
+    def describe(self, handle: str) -> Dict[str, Any]:
+        return self._describe(handle, self._get(handle))
+
+    def drop(self, handle: str) -> bool:
+        with self._lock:
+            if handle not in self._entries:
+                return False
+            self._remove(handle)
+            return True
+
+    def _get(self, handle: str) -> _StoredResult:
+        with self._lock:
+            entry = self._entries.get(handle)
+            if entry is None:
+                raise ResultNotFoundError("Unknown or evicted result handle; run the query again")
+            self._entries.move_to_end(handle)
+            return entry
+
+    def _remove(self, handle: str):
+        entry = self._entries.pop(handle)
+        self._bytes -= entry.size
+        try:
+            # Readers holding a memory map keep the data until they are done with it.
+            os.remove(entry.path)
+        except OSError:
+            logger.debug("Error removing stored result %s", entry.path, exc_info=True)
+
+    @staticmethod
+    def _describe(handle: str, entry: _StoredResult) -> Dict[str, Any]:
+        return {"handle": handle, "row_count": entry.row_count, "schema": entry.schema, "bytes": entry.size}
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._bytes, "evictions": self._evictions}
@@ -0,0 +1,94 @@
+"""
+Write a JSON snapshot of the ClickHouse schema.
+
+All tables' columns, types and comments are fetched in one batched query. When the
+output file already exists, only tables whose metadata changed since that snapshot
+are re-fetched.
+
+Usage:
+    python schema_extract.py [--output clickhouse_schema.json] [--full]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from schema_index import fetch_modification_times, fetch_tables
+
+logger = logging.getLogger(__name__)
+
+
+def snapshot_table(table: Dict[str, Any]) -> Dict[str, Any]:
+    """Stable subset of a schema entry; row counts and sizes are left out so re-runs diff cleanly."""
+    entry = {
+        "engine": table["engine"],
+        "modified": table["modified"],
+        "columns": [
+            {"name": column["name"], "type": column["type"], **({"comment": column["comment"]} if column["comment"] else {})}
+            for column in table["columns"]
+        ],
+    }
+    for key in ("comment", "sorting_key", "sampling_key"):
+        if table[key]:
+            entry[key] = table[key]
+    return entry
+
+
+def extract_schema(client, previous: Optional[Dict[str, Any]] = None) -> Tuple[Dict[str, Any], List[str]]:
+    """Return `(snapshot, changed_tables)`, re-fetching only tables changed since `previous`."""
+    if not previous:
+        tables = {name: snapshot_table(table) for name, table in fetch_tables(client).items()}
+        return {"tables": dict(sorted(tables.items()))}, sorted(tables)
+
+    tables = dict(previous.get("tables", {}))
+    modified = fetch_modification_times(client)
+    changed = sorted(name for name, ts in modified.items() if tables.get(name, {}).get("modified") != ts)
+    removed = sorted(name for name in tables if name not in modified)
+    for name in removed:
+        del tables[name]
+    for name, table in fetch_tables(client, changed).items():
+        tables[name] = snapshot_table(table)
+    return {"tables": dict(sorted(tables.items()))}, sorted(changed + removed)
+
+
+def write_snapshot(snapshot: Dict[str, Any], path: str):
+    with open(path, "w") as f:
+        json.dump(snapshot, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Write a JSON snapshot of the ClickHouse schema.")
+    parser.add_argument("--output", default="clickhouse_schema.json", help="Snapshot file to create or update")
+    parser.add_argument("--full", action="store_true", help="Ignore an existing snapshot and fetch every table")
+    args = parser.parse_args(argv)
+
+    from clickhouse_mcp import create_client
+
+    previous = None
+    if not args.full and os.path.exists(args.output):
+        with open(args.output) as f:
+            previous = json.load(f)
+
+    started = time.perf_counter()
+    client = create_client()
+    try:
+        snapshot, changed = extract_schema(client, previous)
+    finally:
+        client.close()
+
+    if snapshot != previous:
+        write_snapshot(snapshot, args.output)
+    logger.info(
+        f"{len(snapshot['tables'])} tables, {len(changed)} fetched or removed, "
+        f"written to {args.output} in {time.perf_counter() - started:.2f}s"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main())
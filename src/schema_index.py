@@ -0,0 +1,167 @@
+import time
+import fnmatch
+import difflib
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+MAX_PATTERN_LENGTH = 100
+
+# One row per table with its columns folded into an array, so the whole schema
+# (or any subset of tables) comes back in a single round trip.
+SCHEMA_QUERY = """
+SELECT
+    t.name,
+    t.engine,
+    t.comment,
+    t.sorting_key,
+    t.sampling_key,
+    t.total_rows,
+    t.total_bytes,
+    toUnixTimestamp(t.metadata_modification_time),
+    arraySort(groupArray((c.position, c.name, c.type, c.comment)))
+FROM system.tables AS t
+INNER JOIN system.columns AS c ON c.database = t.database AND c.table = t.name
+WHERE t.database = currentDatabase() {table_filter}
+GROUP BY t.name, t.engine, t.comment, t.sorting_key, t.sampling_key,
+         t.total_rows, t.total_bytes, t.metadata_modification_time
+"""
+
+MODIFICATION_QUERY = """
+SELECT name, toUnixTimestamp(metadata_modification_time)
+FROM system.tables
+WHERE database = currentDatabase()
+"""
+
+
+def fetch_tables(client, tables: Optional[Sequence[str]] = None) -> Dict[str, Dict[str, Any]]:
+    """Fetch schema entries for all tables, or only `tables`, in one query."""
+    if tables is not None and not tables:
+        return {}
+    table_filter = "AND t.name IN %(tables)s" if tables is not None else ""
+    parameters = {"tables": tuple(tables)} if tables is not None else None
+    result = client.query(SCHEMA_QUERY.format(table_filter=table_filter), parameters=parameters)
+
+    schema = {}
+    for name, engine, comment, sorting_key, sampling_key, total_rows, total_bytes, modified, columns in result.result_rows:
+        schema[name] = {
+            "name": name,
+            "engine": engine,
+            "comment": comment,
+            "sorting_key": sorting_key,
+            "sampling_key": sampling_key,
+            "total_rows": total_rows,
+            "total_bytes": total_bytes,
+            "modified": modified,
+            "columns": [
+                {"name": column, "type": column_type, "comment": column_comment}
+                for _, column, column_type, column_comment in columns
+            ],
+        }
+    return schema
+
+
+def fetch_modification_times(client) -> Dict[str, int]:
+    return {name: modified for name, modified in client.query(MODIFICATION_QUERY).result_rows}
+
+
+class SchemaIndex:
+    """
+    In-memory index of the current database's tables and columns.
+
+    Filled by one bulk query; `refresh` compares `metadata_modification_time` and
+    re-fetches only tables that were added or altered. Lookups never touch ClickHouse.
+    """
+
+    def __init__(self, refresh_interval: float = 60.0):
+        self.refresh_interval = refresh_interval
+        self._tables: Dict[str, Dict[str, Any]] = {}
+        self._columns: List[tuple] = []
+        self._loaded_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded_at is not None
+
+    def is_stale(self) -> bool:
+        return self._loaded_at is None or time.monotonic() - self._loaded_at > self.refresh_interval
+
+    def load(self, client):
+        """Replace the index with a full snapshot of the schema."""
+        self._swap(fetch_tables(client))
+
+    def refresh(self, client) -> List[str]:
+        """Re-fetch added or altered tables and drop removed ones; returns the changed names."""
+        if not self.loaded:
+            self.load(client)
+            return sorted(self._tables)
+        modified = fetch_modification_times(client)
+        tables = dict(self._tables)
+        changed = [name for name, ts in modified.items() if name not in tables or tables[name]["modified"] != ts]
+        removed = [name for name in tables if name not in modified]
+        for name in removed:
+            del tables[name]
+        tables.update(fetch_tables(client, changed))
+        self._swap(tables)
+        if changed or removed:
+            logger.info(f"Schema index refreshed: {len(changed)} changed, {len(removed)} removed")
+        return sorted(changed + removed)
+
+    def _swap(self, tables: Dict[str, Dict[str, Any]]):
+        columns = [
+            (column["name"].lower(), table["name"], column)
+            for table in tables.values()
+            for column in table["columns"]
+        ]
+        with self._lock:
+            self._tables = tables
+            self._columns = columns
+            self._loaded_at = time.monotonic()
+
+    def list_tables(self, pattern: Optional[str] = None) -> List[Dict[str, Any]]:
+        needle = pattern.lower() if pattern else None
+        return [
+            {
+                "name": table["name"],
+                "engine": table["engine"],
+                "total_rows": table["total_rows"],
+                "columns": len(table["columns"]),
+                "comment": table["comment"],
+            }
+            for name, table in sorted(self._tables.items())
+            if needle is None or needle in name.lower()
+        ]
+
+    def describe_table(self, name: str) -> Optional[Dict[str, Any]]:
+        return self._tables.get(name.replace("`", "").split(".")[-1])
+
+    def similar_tables(self, name: str, limit: int = 5) -> List[str]:
+        return difflib.get_close_matches(name, list(self._tables), n=limit, cutoff=0.5)
+
+    def search_columns(self, pattern: str, limit: int = 50) -> List[Dict[str, Any]]:
+        """
+        Find columns whose name contains `pattern`, or matches it as a glob when it has
+        `*`, `?` or `[`; case-insensitive. Globs, unlike agent-written regexes, can't
+        backtrack catastrophically.
+        """
+        if len(pattern) > MAX_PATTERN_LENGTH:
+            raise ValueError(f"Pattern is longer than {MAX_PATTERN_LENGTH} characters")
+        needle = pattern.lower()
+        glob = any(char in needle for char in "*?[")
+        matches = []
+        for lower_name, table, column in self._columns:
+            if fnmatch.fnmatchcase(lower_name, needle) if glob else needle in lower_name:
+                matches.append({"table": table, **column})
+                if len(matches) >= limit:
+                    break
+        return matches
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "tables": len(self._tables),
+            "columns": len(self._columns),
+            "age_seconds": None if self._loaded_at is None else round(time.monotonic() - self._loaded_at, 1),
+        }
@@ -0,0 +1,158 @@
+import os
+import re
+import logging
+import threading
+from typing import Dict, Optional
+from urllib.parse import parse_qs
+
+import httpx
+from starlette.responses import Response
+
+logger = logging.getLogger(__name__)
+
+# The SSE transport announces a session's POST URL in its first event:
+#   event: endpoint\r\ndata: /messages/?session_id=<hex>
+ENDPOINT_SESSION_RE = re.compile(rb"session_id=([0-9a-f]+)")
+SESSION_ID_RE = re.compile(r"^[0-9a-f]+$")
+
+
+class MemorySessionRegistry:
+    """Session owners in a dict; only shared by apps running in the same process (tests)."""
+
+    def __init__(self):
+        self._owners: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def register(self, session_id: str, owner: str):
+        with self._lock:
+            self._owners[session_id] = owner
+
+    def lookup(self, session_id: str) -> Optional[str]:
+        with self._lock:
+            return self._owners.get(session_id)
+
+    def unregister(self, session_id: str):
+        with self._lock:
+            self._owners.pop(session_id, None)
+
+
+class FileSessionRegistry:
+    """
+    Session owners as one small file per session in a directory shared by the
+    worker processes on a host. Writes are atomic renames, so a reader never
+    sees a partial owner address.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, session_id: str) -> str:
+        if not SESSION_ID_RE.match(session_id):
+            raise ValueError(f"Invalid session id {session_id!r}")
+        return os.path.join(self.directory, session_id)
+
+    def register(self, session_id: str, owner: str):
+        path = self._path(session_id)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            f.write(owner)
+        os.replace(tmp, path)
+
+    def lookup(self, session_id: str) -> Optional[str]:
+        try:
+            with open(self._path(session_id)) as f:
+                return f.read()
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def unregister(self, session_id: str):
+        try:
+            os.unlink(self._path(session_id))
+        except (FileNotFoundError, ValueError):
+            pass
+
+
+class SessionRouter:
+    """
+    ASGI middleware that lets several workers serve one set of SSE sessions.
+
+    Each worker records the sessions whose `/sse` stream it holds in a shared
+    registry under its own `owner` address (a private URL only the workers can
+    reach). A message POST that lands on a worker that doesn't hold the session
+    is forwarded to the owner; everything else passes straight through.
+    """
+
+    def __init__(self, app, registry, owner: str, sse_path: str = "/sse", message_path: str = "/messages/"):
+        self.app = app
+        self.registry = registry
+        self.owner = owner
+        self.sse_path = sse_path
+        self.message_path = message_path
+        self._local = set()
+        self._client: Optional[httpx.AsyncClient] = None
+        self.forwarded = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            if scope["path"] == self.sse_path:
+                return await self._serve_stream(scope, receive, send)
+            if scope["path"].startswith(self.message_path.rstrip("/")) and scope["method"] == "POST":
+                session_id = parse_qs(scope["query_string"].decode()).get("session_id", [None])[0]
+                if session_id and session_id not in self._local:
+                    owner = self.registry.lookup(session_id)
+                    if owner and owner != self.owner:
+                        return await self._forward(owner, session_id, scope, receive, send)
+        return await self.app(scope, receive, send)
+
+    async def _serve_stream(self, scope, receive, send):
+        session_id = None
+
+        async def record_session(message):
+            nonlocal session_id
+            if session_id is None and message["type"] == "http.response.body":
+                match = ENDPOINT_SESSION_RE.search(message.get("body", b""))
+                if match:
+                    session_id = match.group(1).decode()
+                    self._local.add(session_id)
+                    self.registry.register(session_id, self.owner)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, record_session)
+        finally:
+            if session_id is not None:
+                self._local.discard(session_id)
+                self.registry.unregister(session_id)
+
+    async def _forward(self, owner: str, session_id: str, scope, receive, send):
+        body = b""
+        more_body = True
+        while more_body:
+            message = await receive()
+            body += message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+        headers = {
+            name.decode("latin-1"): value.decode("latin-1")
+            for name, value in scope["headers"]
+            if name in (b"authorization", b"content-type")
+        }
+        url = f"{owner}{scope['path']}?{scope['query_string'].decode()}"
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=30)
+        try:
+            upstream = await self._client.post(url, content=body, headers=headers)
+        except httpx.TransportError as e:
+            # The owning worker is gone, and with it the session.
+            logger.warning(f"Dropping session {session_id}: owner {owner} unreachable ({e})")
+            self.registry.unregister(session_id)
+            return await Response("Could not find session", status_code=404)(scope, receive, send)
+
+        self.forwarded += 1
+        response = Response(
+            upstream.content,
+            status_code=upstream.status_code,
+            media_type=upstream.headers.get("content-type"),
+        )
+        return await response(scope, receive, send)
@@ -0,0 +1,162 @@
+"""
+Single-pass SQL tokenizer, normalizer and read-only validator.
+
+The tokenizer knows string literals, quoted identifiers and comments, so
+keywords are only matched as whole words in the query itself: `updatedAt` or
+`'DROP'` in a filter no longer look like an UPDATE or a DROP. Verdicts are
+cached by query text.
+"""
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+_TOKEN_RE = re.compile(r"""
+    (?P<string>'(?:[^'\\]|\\.|'')*')
+  | (?P<quoted>"(?:[^"\\]|\\.)*"|`(?:[^`\\]|\\.)*`)
+  | (?P<space>\s+)
+  | (?P<comment>--[^\n]*|/\*.*?\*/)
+  | (?P<word>[A-Za-z_][A-Za-z0-9_]*)
+  | (?P<number>\d+(?:\.\d*)?(?:[eE][+-]?\d+)?)
+  | (?P<unterminated>['"`]|/\*)
+  | (?P<semicolon>;)
+  | (?P<other>.)
+""", re.VERBOSE | re.DOTALL)
+
+# Keywords are case-insensitive in ClickHouse; identifiers and literals are not,
+# so only these words are folded when building cache keys.
+KEYWORDS = frozenset("""
+    SELECT FROM WHERE AND OR NOT IN IS NULL AS ON JOIN INNER LEFT RIGHT FULL OUTER
+    CROSS ANY ALL GLOBAL USING GROUP BY ORDER ASC DESC LIMIT OFFSET HAVING WITH
+    DISTINCT UNION CASE WHEN THEN ELSE END BETWEEN LIKE ILIKE PREWHERE FINAL SAMPLE
+    FORMAT SETTINGS INTERVAL TOTALS FILL TIES ARRAY EXPLAIN DESCRIBE SHOW TABLES
+""".split())
+
+ALLOWED_STATEMENTS = frozenset({"SELECT", "WITH", "EXPLAIN"})
+FORBIDDEN_KEYWORDS = frozenset({"INSERT", "UPDATE", "DELETE", "DROP", "CREATE", "ALTER", "TRUNCATE"})
+
+
+def tokenize(sql: str) -> List[Tuple[str, str]]:
+    """Split `sql` into `(kind, text)` tokens that join back into it; kinds are the groups of `_TOKEN_RE`."""
+    return [(match.lastgroup, match.group()) for match in _TOKEN_RE.finditer(sql)]
+
+
+def subquery(sql: str) -> str:
+    """
+    `sql` in parentheses, to select from. Trailing comments and `;` are dropped and
+    the query goes on its own lines, so a line comment can't swallow the `)`.
+    """
+    tokens = tokenize(sql)
+    end = len(tokens)
+    while end and tokens[end - 1][0] in ("space", "comment", "semicolon"):
+        end -= 1
+    inner = "".join(text for _, text in tokens[:end]).strip()
+    return f"(\n{inner}\n)"
+
+
+def analyze(sql: str) -> Tuple[str, Optional[str]]:
+    """
+    In one pass over `sql`, return its normalized text (whitespace collapsed, comments
+    dropped, keyword case folded outside literals and quoted identifiers) and why it is
+    not allowed to run, or None if it may run.
+    """
+    parts: List[str] = []
+    error: Optional[str] = None
+    first: Optional[str] = None
+    ended = False
+    for match in _TOKEN_RE.finditer(sql):
+        kind = match.lastgroup
+        text = match.group()
+        if kind == "space" or kind == "comment":
+            if parts and parts[-1] != " ":
+                parts.append(" ")
+            continue
+        if kind == "word":
+            upper = text.upper()
+            parts.append(upper if upper in KEYWORDS else text)
+        else:
+            upper = text
+            parts.append(text)
+        if error is not None:
+            continue
+        if kind == "semicolon":
+            ended = True
+        elif ended:
+            error = "Multiple statements are not allowed"
+        elif first is None:
+            if kind == "other" and text == "(":
+                continue
+            first = upper
+            if first not in ALLOWED_STATEMENTS:
+                error = "Only SELECT queries are allowed"
+        elif kind == "unterminated":
+            error = "Query has an unterminated string, quoted identifier or comment"
+        elif kind == "word" and upper in FORBIDDEN_KEYWORDS:
+            error = f"Query contains forbidden keyword {upper}"
+    if first is None and error is None:
+        error = "Only SELECT queries are allowed"
+    return "".join(parts).strip().rstrip(";").strip(), error
+
+
+def normalize_sql(sql: str) -> str:
+    return analyze(sql)[0]
+
+
+class Verdict:
+    __slots__ = ("normalized", "error")
+
+    def __init__(self, normalized: str, error: Optional[str]):
+        self.normalized = normalized
+        self.error = error
+
+
+class QueryValidator:
+    """
+    Validates queries and remembers the verdicts of the last `max_entries` query texts.
+
+    Verdicts are stored under both the text as sent and its normalized form, so a
+    resent query is answered without tokenizing it.
+    """
+
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self._verdicts: "OrderedDict[str, Verdict]" = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+        self._lock = threading.Lock()
+
+    def check(self, sql: str) -> Verdict:
+        with self._lock:
+            verdict = self._lookup(sql)
+            if verdict is not None:
+                self._hits += 1
+                return verdict
+        normalized, error = analyze(sql)
+        with self._lock:
+            verdict = self._lookup(normalized)
+        if verdict is None:
+            verdict = Verdict(normalized, error)
+        with self._lock:
+            if normalized in self._verdicts:
+                self._hits += 1
+            else:
+                self._misses += 1
+                self._store(normalized, verdict)
+            self._store(sql, verdict)
+        return verdict
+
+    def _lookup(self, key: str) -> Optional[Verdict]:
+        verdict = self._verdicts.get(key)
+        if verdict is not None:
+            self._verdicts.move_to_end(key)
+        return verdict
+
+    def _store(self, key: str, verdict: Verdict):
+        self._verdicts[key] = verdict
+        self._verdicts.move_to_end(key)
+        while len(self._verdicts) > self.max_entries:
+            self._verdicts.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._verdicts), "hits": self._hits, "misses": self._misses}
@@ -0,0 +1,100 @@
+import json
+import typing
+import asyncio
+import logging
+from typing import Any, Dict, Optional
+
+from mcp import types
+from pydantic import ValidationError
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+
+logger = logging.getLogger(__name__)
+
+# JSON-RPC method name -> request model, e.g. "tools/call" -> CallToolRequest.
+REQUEST_TYPES = {
+    typing.get_args(request_type.model_fields["method"].annotation)[0]: request_type
+    for request_type in typing.get_args(types.ClientRequest.model_fields["root"].annotation)
+}
+
+
+def error_response(request_id, code: int, message: str) -> Dict[str, Any]:
+    return {"jsonrpc": "2.0", "id": request_id, "error": {"code": code, "message": message}}
+
+
+class StatelessHTTPEndpoint:
+    """
+    MCP over plain HTTP: each POST carries one JSON-RPC message (or a batch) and
+    the responses come back in the HTTP response body.
+
+    Nothing is kept between requests, so any worker or instance behind a load
+    balancer can answer any request. Requests are dispatched to the same
+    handlers the SSE sessions use; `initialize` is answered directly, and
+    notifications are accepted and ignored.
+    """
+
+    def __init__(self, server):
+        self.server = server
+        self._init_options = None
+
+    async def __call__(self, scope, receive, send):
+        request = Request(scope, receive)
+        try:
+            payload = json.loads(await request.body())
+        except ValueError:
+            response = JSONResponse(error_response(None, types.PARSE_ERROR, "Parse error"), status_code=400)
+            return await response(scope, receive, send)
+
+        if isinstance(payload, list):
+            results = await asyncio.gather(*[self.handle(message) for message in payload])
+            body = [result for result in results if result is not None]
+        else:
+            body = await self.handle(payload)
+
+        response = JSONResponse(body) if body else Response(status_code=202)
+        return await response(scope, receive, send)
+
+    async def handle(self, message: Any) -> Optional[Dict[str, Any]]:
+        """Answer one JSON-RPC message; returns None for notifications."""
+        if not isinstance(message, dict) or message.get("jsonrpc") != "2.0" or "method" not in message:
+            return error_response(None, types.INVALID_REQUEST, "Invalid request")
+        if "id" not in message:
+            return None
+
+        request_id = message["id"]
+        request_type = REQUEST_TYPES.get(message["method"])
+        if request_type is None:
+            return error_response(request_id, types.METHOD_NOT_FOUND, f"Method not found: {message['method']}")
+        try:
+            request = request_type.model_validate({key: message[key] for key in ("method", "params") if key in message})
+        except ValidationError as e:
+            return error_response(request_id, types.INVALID_PARAMS, str(e))
+
+        try:
+            if isinstance(request, types.InitializeRequest):
+                result = self.initialize_result()
+            else:
+                handler = self.server.request_handlers.get(request_type)
+                if handler is None:
+                    return error_response(request_id, types.METHOD_NOT_FOUND, f"Method not found: {message['method']}")
+                result = await handler(request)
+        except Exception as e:
+            logger.exception(f"Error handling {message['method']}")
+            return error_response(request_id, types.INTERNAL_ERROR, str(e))
+
+        return {
+            "jsonrpc": "2.0",
+            "id": request_id,
+            "result": result.model_dump(by_alias=True, mode="json", exclude_none=True),
+        }
+
+    def initialize_result(self) -> types.InitializeResult:
+        if self._init_options is None:
+            self._init_options = self.server.create_initialization_options()
+        options = self._init_options
+        return types.InitializeResult(
+            protocolVersion=types.LATEST_PROTOCOL_VERSION,
+            capabilities=options.capabilities,
+            serverInfo=types.Implementation(name=options.server_name, version=options.server_version),
+            instructions=options.instructions,
+        )
@@ -0,0 +1,65 @@
+"""
+How results travel from ClickHouse to the server.
+
+Results are read in a binary columnar format and decoded straight into columns:
+ClickHouse's Native format (clickhouse_connect's default) or Arrow. Either is
+compressed on the wire:
+
+- Native negotiates HTTP compression, LZ4 first then ZSTD, gzip and deflate
+  ("auto"), or uses the one method configured.
+- Arrow compresses the IPC buffers themselves with LZ4 or ZSTD
+  (`output_format_arrow_compression_method`), which pyarrow decodes natively;
+  gzip is requested as HTTP compression instead.
+
+Arrow needs pyarrow; without it results are read as Native.
+"""
+import logging
+from typing import Any, Dict, Optional, Tuple, Union
+
+from result_format import QueryData
+from result_store import HAVE_PYARROW, to_query_data
+
+logger = logging.getLogger(__name__)
+
+COMPRESSION_METHODS = ("auto", "lz4", "zstd", "gzip", "none")
+TRANSFER_FORMATS = ("native", "arrow")
+
+_ARROW_CODECS = {"auto": "lz4_frame", "lz4": "lz4_frame", "zstd": "zstd", "gzip": "none", "none": "none"}
+
+
+class Transfer:
+    def __init__(self, compression: str = "auto", transfer_format: str = "native"):
+        compression, transfer_format = compression.lower(), transfer_format.lower()
+        if compression not in COMPRESSION_METHODS:
+            raise ValueError(f"Unknown compression '{compression}'. Use one of: {', '.join(COMPRESSION_METHODS)}")
+        if transfer_format not in TRANSFER_FORMATS:
+            raise ValueError(f"Unknown transfer format '{transfer_format}'. Use one of: {', '.join(TRANSFER_FORMATS)}")
+        if transfer_format == "arrow" and not HAVE_PYARROW:
+            logger.warning("Arrow transfer needs pyarrow installed; reading results as Native")
+            transfer_format = "native"
+        self.compression = compression
+        self.format = transfer_format
+
+    @property
+    def client_compression(self) -> Union[bool, str]:
+        """The `compress` argument for clickhouse_connect.get_client."""
+        return {"auto": True, "none": False}.get(self.compression, self.compression)
+
+    def query(
+        self,
+        client,
+        sql_query: str,
+        parameters: Optional[Dict[str, Any]] = None,
+        settings: Optional[Dict[str, Any]] = None,
+    ) -> Tuple[QueryData, Dict[str, Any]]:
+        """Run a query and return its columns with ClickHouse's summary of it (empty for Arrow, which has none)."""
+        if self.format == "native":
+            result = client.query(sql_query, parameters=parameters, settings=settings, column_oriented=True)
+            return QueryData.from_result(result), result.summary
+        settings = {**(settings or {}), "output_format_arrow_compression_method": _ARROW_CODECS[self.compression]}
+        transport_settings = None
+        if self.compression == "gzip":
+            settings["enable_http_compression"] = 1
+            transport_settings = {"Accept-Encoding": "gzip"}
+        table = client.query_arrow(sql_query, parameters=parameters, settings=settings, transport_settings=transport_settings)
+        return to_query_data(table), {}
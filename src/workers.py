@@ -0,0 +1,91 @@
+"""
+Run the server as several worker processes sharing one listening port.
+
+Each worker also listens on a private loopback port, which is the address it
+registers for the SSE sessions it holds; message POSTs that the kernel hands to
+another worker are forwarded there (see session_routing.SessionRouter).
+"""
+import time
+import shutil
+import signal
+import socket
+import logging
+import tempfile
+import multiprocessing
+from typing import Callable, List, Optional
+
+import uvicorn
+
+from session_routing import FileSessionRegistry
+
+logger = logging.getLogger(__name__)
+
+
+def _bind(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(app_factory: Callable, public: socket.socket, registry_dir: str, log_level: str):
+    private = _bind("127.0.0.1", 0)
+    owner = f"http://127.0.0.1:{private.getsockname()[1]}"
+    app = app_factory(FileSessionRegistry(registry_dir), owner)
+    config = uvicorn.Config(app, log_level=log_level)
+    uvicorn.Server(config).run(sockets=[public, private])
+
+
+def serve(
+    app_factory: Callable,
+    host: str,
+    port: int,
+    workers: int,
+    registry_dir: Optional[str] = None,
+    log_level: str = "info",
+):
+    """
+    Serve `app_factory(registry, owner)` from `workers` processes, restarting any that exit.
+
+    Returns when the supervisor receives SIGINT or SIGTERM, after stopping the workers.
+    """
+    own_registry_dir = registry_dir is None
+    registry_dir = registry_dir or tempfile.mkdtemp(prefix="mcp-sessions-")
+    public = _bind(host, port)
+    context = multiprocessing.get_context("spawn")
+
+    def start() -> multiprocessing.Process:
+        process = context.Process(target=_run_worker, args=(app_factory, public, registry_dir, log_level))
+        process.start()
+        return process
+
+    processes: List[multiprocessing.Process] = [start() for _ in range(workers)]
+    logger.info(f"Started {workers} workers on {host}:{port}, sessions registered in {registry_dir}")
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    while not stopping:
+        for i, process in enumerate(processes):
+            if not process.is_alive():
+                logger.warning(f"Worker {process.pid} exited with {process.exitcode}; restarting")
+                processes[i] = start()
+        time.sleep(0.5)
+
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        process.join(10)
+        if process.is_alive():
+            process.kill()
+    public.close()
+    if own_registry_dir:
+        shutil.rmtree(registry_dir, ignore_errors=True)
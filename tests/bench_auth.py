@@ -0,0 +1,51 @@
+"""
+Micro-benchmark of per-request JWT auth overhead.
+
+Compares the previous per-request path (read the secret from the environment and
+decode the token every time) with TokenVerifier's cached verification.
+
+    python tests/bench_auth.py [iterations]
+"""
+import os
+import sys
+import time
+import timeit
+
+import jwt
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from auth import TokenVerifier
+
+SECRET = "benchmark-secret"
+os.environ.setdefault("ACCESS_TOKEN_SECRET", SECRET)
+TOKEN = jwt.encode(
+    {"sub": "agent", "iss": "clickhouse_mcp_client", "iat": int(time.time()), "exp": int(time.time()) + 3600},
+    SECRET,
+    algorithm="HS256",
+)
+
+
+def uncached():
+    jwt_secret = os.getenv("ACCESS_TOKEN_SECRET")
+    jwt.decode(TOKEN, jwt_secret, algorithms=["HS256"], verify=True)
+
+
+verifier = TokenVerifier([SECRET])
+
+
+def cached():
+    verifier.verify(TOKEN)
+
+
+def per_call_us(fn, iterations):
+    fn()
+    return min(timeit.repeat(fn, number=iterations, repeat=5)) / iterations * 1e6
+
+
+if __name__ == "__main__":
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    before = per_call_us(uncached, iterations)
+    after = per_call_us(cached, iterations)
+    print(f"before (getenv + decode): {before:8.2f} us/request")
+    print(f"after  (cached verify):   {after:8.2f} us/request")
+    print(f"speedup: {before / after:.1f}x")
@@ -0,0 +1,219 @@
+"""
+Load benchmark of the MCP server against a local ClickHouse stand-in.
+
+Each scenario starts the SSE app in a subprocess with FakeClickHouseClient
+(configurable latency and result size) in place of ClickHouse, then drives it
+with concurrent MCP ClientSessions calling `query_clickhouse`. Reports call
+latency percentiles, throughput and the server's peak RSS, and can save the
+results as JSON and compare them with an earlier run.
+
+    python tests/bench_load.py [--scenario small large auth_churn slow]
+                               [--output results.json] [--compare previous.json]
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import asyncio
+import argparse
+import platform
+import statistics
+import subprocess
+
+import httpx
+import jwt
+from mcp import ClientSession
+from mcp.client.sse import sse_client
+
+TESTS = os.path.dirname(os.path.abspath(__file__))
+SRC = os.path.join(TESTS, "..", "src")
+SECRET = "bench-secret"
+
+SERVER = """
+import sys, uvicorn
+sys.path[:0] = [{src!r}, {tests!r}]
+import clickhouse_mcp
+from fake_clickhouse import FakeClickHouseClient, install
+install(clickhouse_mcp, FakeClickHouseClient(latency={latency}, rows={rows}))
+uvicorn.run(clickhouse_mcp.mcp.sse_app(), host="127.0.0.1", port={port}, log_level="warning")
+"""
+
+# sessions: concurrent clients; calls: sequential tool calls per client.
+# reconnect: open a new session with a freshly signed token for every call.
+SCENARIOS = {
+    "small": {"latency": 0.005, "rows": 10, "sessions": 50, "calls": 20, "reconnect": False},
+    "large": {"latency": 0.05, "rows": 100_000, "sessions": 8, "calls": 3, "reconnect": False},
+    "auth_churn": {"latency": 0.005, "rows": 10, "sessions": 25, "calls": 8, "reconnect": True},
+    "slow": {"latency": 1.0, "rows": 10, "sessions": 32, "calls": 2, "reconnect": False},
+}
+
+# Lower is better for every reported metric except throughput.
+HIGHER_IS_BETTER = {"throughput_per_s"}
+
+
+def make_token() -> str:
+    claims = {"sub": "bench", "iss": "bench", "jti": uuid.uuid4().hex, "exp": int(time.time()) + 3600}
+    return jwt.encode(claims, SECRET, algorithm="HS256")
+
+
+def peak_rss_mb(pid: int) -> float:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return round(int(line.split()[1]) / 1024, 1)
+    return 0.0
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def start_server(port: int, latency: float, rows: int) -> subprocess.Popen:
+    env = {**os.environ, "ACCESS_TOKEN_SECRET": SECRET, "FASTMCP_LOG_LEVEL": "WARNING", "QUERY_CACHE_TTL_SECONDS": "0"}
+    process = subprocess.Popen(
+        [sys.executable, "-c", SERVER.format(src=SRC, tests=TESTS, port=port, latency=latency, rows=rows)],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/", timeout=1)
+            return process
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("Server did not start")
+
+
+def stop_server(process: subprocess.Popen):
+    # uvicorn waits for open SSE streams to drain on SIGTERM; don't wait for it.
+    process.terminate()
+    try:
+        process.wait(timeout=5)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+async def call_query(session: ClientSession, client_id: int, call: int, timeout: float):
+    sql = f"SELECT id, value FROM bench WHERE client = {client_id} AND call = {call}"
+    result = await asyncio.wait_for(session.call_tool("query_clickhouse", {"sql_query": sql, "format": "compact"}), timeout)
+    if result.isError or '"error"' in result.content[0].text[:100]:
+        raise RuntimeError(result.content[0].text[:200])
+
+
+async def run_client(url: str, client_id: int, scenario, latencies, failures, timeout: float):
+    async def with_session(calls):
+        headers = {"Authorization": f"Bearer {make_token()}"}
+        async with sse_client(url, headers=headers, timeout=timeout) as streams:
+            async with ClientSession(*streams) as session:
+                await asyncio.wait_for(session.initialize(), timeout)
+                await calls(session)
+
+    async def timed_call(session, call):
+        started = time.perf_counter()
+        try:
+            await call_query(session, client_id, call, timeout)
+            latencies.append(time.perf_counter() - started)
+        except Exception as e:
+            failures.append(f"{type(e).__name__}: {e}")
+
+    if scenario["reconnect"]:
+        for call in range(scenario["calls"]):
+            started = time.perf_counter()
+            try:
+                await with_session(lambda session: call_query(session, client_id, call, timeout))
+                latencies.append(time.perf_counter() - started)
+            except Exception as e:
+                failures.append(f"{type(e).__name__}: {e}")
+        return
+
+    async def calls(session):
+        for call in range(scenario["calls"]):
+            await timed_call(session, call)
+
+    try:
+        await with_session(calls)
+    except Exception as e:
+        failures.append(f"{type(e).__name__}: {e}")
+
+
+async def run_scenario(name: str, scenario, port: int, timeout: float):
+    process = start_server(port, scenario["latency"], scenario["rows"])
+    latencies, failures = [], []
+    try:
+        started = time.perf_counter()
+        await asyncio.gather(*[
+            run_client(f"http://127.0.0.1:{port}/sse", client_id, scenario, latencies, failures, timeout)
+            for client_id in range(scenario["sessions"])
+        ])
+        wall = time.perf_counter() - started
+        rss = peak_rss_mb(process.pid)
+    finally:
+        stop_server(process)
+
+    report = {
+        **scenario,
+        "completed": len(latencies),
+        "failed": len(failures),
+        "wall_s": round(wall, 2),
+        "throughput_per_s": round(len(latencies) / wall, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 1) if latencies else None,
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1) if latencies else None,
+        "max_ms": round(max(latencies) * 1000, 1) if latencies else None,
+        "server_peak_rss_mb": rss,
+    }
+    if failures:
+        report["first_failure"] = failures[0]
+    return report
+
+
+def compare(current, previous):
+    print(f"\n{'scenario':<12} {'metric':<18} {'previous':>10} {'current':>10} {'change':>8}")
+    for name, report in current.items():
+        before = previous.get(name)
+        if not before:
+            continue
+        for metric in ("p50_ms", "p99_ms", "throughput_per_s", "server_peak_rss_mb"):
+            old, new = before.get(metric), report.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old * 100
+            better = change > 0 if metric in HIGHER_IS_BETTER else change < 0
+            print(f"{name:<12} {metric:<18} {old:>10} {new:>10} {change:>+7.1f}%{'' if abs(change) < 5 else (' better' if better else ' worse')}")
+
+
+async def main(args):
+    results = {}
+    for i, name in enumerate(args.scenario):
+        scenario = dict(SCENARIOS[name])
+        if args.sessions:
+            scenario["sessions"] = args.sessions
+        if args.calls:
+            scenario["calls"] = args.calls
+        results[name] = await run_scenario(name, scenario, args.port + i, args.timeout)
+        print(json.dumps({name: results[name]}, indent=2), flush=True)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"python": platform.python_version(), "cpus": os.cpu_count(), "scenarios": results}, f, indent=2)
+            f.write("\n")
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f)["scenarios"])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scenario", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--sessions", type=int, help="Override each scenario's concurrent sessions")
+    parser.add_argument("--calls", type=int, help="Override each scenario's calls per session")
+    parser.add_argument("--port", type=int, default=8790)
+    parser.add_argument("--timeout", type=float, default=60.0, help="Seconds before a call counts as failed")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--compare", help="Compare with the results in this JSON file")
+    asyncio.run(main(parser.parse_args()))
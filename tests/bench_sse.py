@@ -0,0 +1,179 @@
+"""
+Load test for concurrent SSE sessions.
+
+Starts the MCP server in a subprocess, opens N authenticated SSE sessions, completes
+the MCP handshake on each, then has every session send a ping at once and measures
+the time until the response event arrives on its stream. Reports ping latency and the
+server's resident memory per open connection.
+
+    python tests/bench_sse.py [--sessions 1000] [--port 8765] [--timeout 30]
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import statistics
+import subprocess
+
+import httpx
+import jwt
+from httpx_sse import aconnect_sse
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+SECRET = "bench-secret"
+
+SERVER = """
+import sys, uvicorn
+sys.path.insert(0, {src!r})
+import clickhouse_mcp
+uvicorn.run(clickhouse_mcp.mcp.sse_app(), host="127.0.0.1", port={port}, log_level="warning", backlog=4096)
+"""
+
+
+def server_rss_kb(pid: int) -> int:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+
+def start_server(port: int) -> subprocess.Popen:
+    env = {**os.environ, "ACCESS_TOKEN_SECRET": SECRET, "FASTMCP_LOG_LEVEL": "WARNING"}
+    process = subprocess.Popen(
+        [sys.executable, "-c", SERVER.format(src=SRC, port=port)],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/", timeout=1)
+            return process
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("Server did not start")
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class Barrier:
+    """Counts sessions through a phase, whether they succeeded or failed, so one stuck session can't hang the run."""
+
+    def __init__(self, parties: int):
+        self.parties = parties
+        self.arrived = 0
+        self.failed = 0
+        self.event = asyncio.Event()
+
+    def arrive(self, ok: bool = True):
+        self.arrived += 1
+        self.failed += not ok
+        if self.arrived == self.parties:
+            self.event.set()
+
+
+async def run_session(client, base, headers, connected, pinged, go, done, latencies, timeout):
+    async with aconnect_sse(client, "GET", f"{base}/sse", headers=headers) as source:
+        events = source.aiter_sse()
+        post_url = None
+
+        async def request(message):
+            await client.post(post_url, json=message, headers=headers)
+            while True:
+                event = await events.__anext__()
+                if event.event == "message" and json.loads(event.data).get("id") == message["id"]:
+                    return
+
+        try:
+            endpoint = (await asyncio.wait_for(events.__anext__(), timeout)).data
+            post_url = f"{base}{endpoint}"
+            await asyncio.wait_for(request({
+                "jsonrpc": "2.0", "id": 1, "method": "initialize",
+                "params": {"protocolVersion": "2024-11-05", "capabilities": {}, "clientInfo": {"name": "bench", "version": "0"}},
+            }), timeout)
+            await client.post(post_url, json={"jsonrpc": "2.0", "method": "notifications/initialized"}, headers=headers)
+        except Exception:
+            connected.arrive(ok=False)
+            pinged.arrive(ok=False)
+            return
+        connected.arrive()
+
+        await go.wait()
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(request({"jsonrpc": "2.0", "id": 2, "method": "ping"}), timeout)
+        except Exception:
+            pinged.arrive(ok=False)
+        else:
+            latencies.append((time.perf_counter() - started) * 1000)
+            pinged.arrive()
+        await done.wait()
+
+
+async def run(sessions: int, port: int, timeout: float):
+    process = start_server(port)
+    base = f"http://127.0.0.1:{port}"
+    token = jwt.encode({"sub": "bench", "iss": "bench", "exp": int(time.time()) + 3600}, SECRET, algorithm="HS256")
+    headers = {"Authorization": f"Bearer {token}"}
+    try:
+        baseline_kb = server_rss_kb(process.pid)
+        limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+        async with httpx.AsyncClient(limits=limits, timeout=httpx.Timeout(timeout)) as client:
+            connected, pinged = Barrier(sessions), Barrier(sessions)
+            go, done = asyncio.Event(), asyncio.Event()
+            latencies = []
+
+            started = time.perf_counter()
+            tasks = [
+                asyncio.create_task(run_session(client, base, headers, connected, pinged, go, done, latencies, timeout))
+                for _ in range(sessions)
+            ]
+            await connected.event.wait()
+            connect_seconds = time.perf_counter() - started
+            connected_kb = server_rss_kb(process.pid)
+
+            go.set()
+            await pinged.event.wait()
+            done.set()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        open_sessions = sessions - connected.failed
+        report = {
+            "sessions": sessions,
+            "failed_handshakes": connected.failed,
+            "failed_pings": pinged.failed - connected.failed,
+            "connect_seconds": round(connect_seconds, 2),
+            "ping_ms_p50": round(statistics.median(latencies), 2) if latencies else None,
+            "ping_ms_p99": round(percentile(latencies, 99), 2) if latencies else None,
+            "ping_ms_max": round(max(latencies), 2) if latencies else None,
+            "server_rss_baseline_mb": round(baseline_kb / 1024, 1),
+            "server_rss_connected_mb": round(connected_kb / 1024, 1),
+            "server_kb_per_session": round((connected_kb - baseline_kb) / max(open_sessions, 1), 1),
+        }
+        print(json.dumps(report, indent=2))
+        return report
+    finally:
+        # uvicorn waits for open SSE streams to drain on SIGTERM; don't wait for it.
+        process.terminate()
+        try:
+            process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=1000)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--timeout", type=float, default=30.0, help="Seconds to wait for each handshake or ping")
+    args = parser.parse_args()
+    asyncio.run(run(args.sessions, args.port, args.timeout))
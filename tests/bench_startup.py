@@ -0,0 +1,117 @@
+"""
+Startup benchmark: time from process start to the first served query.
+
+Starts the server in a subprocess against tests/fake_clickhouse.py, where opening
+a ClickHouse client and loading the schema take configurable time, and records
+when the server answers /healthz, when /readyz reports it ready, and how long
+the first `query_clickhouse` and `list_tables` calls (on /mcp) then take.
+
+"warm-up" is the default configuration: queries are sent once /readyz answers,
+as the load balancer would. "lazy" disables the warm-up (MCP_WARMUP=false), so
+queries are sent as soon as the server listens and open connections and load
+the schema themselves.
+
+    python tests/bench_startup.py [--runs 5] [--connect-latency 0.2] [--schema-latency 0.3]
+"""
+import os
+import sys
+import time
+import uuid
+import argparse
+import statistics
+import subprocess
+
+import httpx
+import jwt
+
+TESTS = os.path.dirname(os.path.abspath(__file__))
+SRC = os.path.join(TESTS, "..", "src")
+SECRET = "bench-secret"
+
+SERVER = """
+import sys, time, uvicorn
+sys.path[:0] = [{src!r}, {tests!r}]
+import clickhouse_mcp
+from clickhouse_pool import ClickHousePool
+from fake_clickhouse import FakeClickHouseClient, FakeSchema, install
+
+client = FakeClickHouseClient(rows=10)
+schema = FakeSchema(client)
+fetch = schema.schema
+schema_query = next(prefix for prefix, respond in client.responses.items() if respond == fetch)
+client.responses[schema_query] = lambda query, parameters: time.sleep({schema_latency}) or fetch(query, parameters)
+install(clickhouse_mcp, client)
+
+def connect():
+    time.sleep({connect_latency})
+    return client
+
+clickhouse_mcp.pool = ClickHousePool(connect, size=clickhouse_mcp.QUERY_CONCURRENCY)
+uvicorn.run(clickhouse_mcp.mcp.sse_app(), host="127.0.0.1", port={port}, log_level="warning")
+"""
+
+
+def make_token() -> str:
+    claims = {"sub": "bench", "iss": "bench", "jti": uuid.uuid4().hex, "exp": int(time.time()) + 3600}
+    return jwt.encode(claims, SECRET, algorithm="HS256")
+
+
+def wait_for(client: httpx.Client, path: str, started: float, timeout: float = 60) -> float:
+    """Poll `path` until it answers 200; returns seconds since `started`."""
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            if client.get(path, timeout=1).status_code == 200:
+                return time.perf_counter() - started
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.005)
+    raise RuntimeError(f"{path} did not become available")
+
+
+def call_tool(client: httpx.Client, name: str, arguments) -> float:
+    started = time.perf_counter()
+    response = client.post("/mcp", json={"jsonrpc": "2.0", "id": 1, "method": "tools/call", "params": {"name": name, "arguments": arguments}})
+    elapsed = time.perf_counter() - started
+    text = response.json()["result"]["content"][0]["text"]
+    if '"error"' in text[:100]:
+        raise RuntimeError(text[:200])
+    return elapsed
+
+
+def run(port: int, warmup: bool, connect_latency: float, schema_latency: float):
+    env = {**os.environ, "ACCESS_TOKEN_SECRET": SECRET, "FASTMCP_LOG_LEVEL": "WARNING", "MCP_WARMUP": str(warmup).lower()}
+    source = SERVER.format(src=SRC, tests=TESTS, port=port, connect_latency=connect_latency, schema_latency=schema_latency)
+    # One client, created up front, so polling doesn't pay for setting up new ones.
+    client = httpx.Client(base_url=f"http://127.0.0.1:{port}", headers={"Authorization": f"Bearer {make_token()}"}, timeout=30)
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "-c", source], env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        listening = wait_for(client, "/healthz", started)
+        ready = wait_for(client, "/readyz", started)
+        query = call_tool(client, "query_clickhouse", {"sql_query": "SELECT id, value FROM bench", "format": "compact"})
+        served = time.perf_counter() - started
+        tables = call_tool(client, "list_tables", {})
+        return {"listening": listening, "ready": ready, "first_query": query, "first_list_tables": tables, "served": served}
+    finally:
+        client.close()
+        process.kill()
+        process.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--port", type=int, default=18091)
+    parser.add_argument("--connect-latency", type=float, default=0.2, help="seconds to open one ClickHouse client")
+    parser.add_argument("--schema-latency", type=float, default=0.3, help="seconds to load the schema index")
+    args = parser.parse_args()
+
+    print(f"median of {args.runs} runs, seconds; connect {args.connect_latency:g}s, schema load {args.schema_latency:g}s")
+    print(f"{'mode':<8} {'listening':>10} {'ready':>8} {'query':>8} {'tables':>8} {'served':>8}")
+    for mode, warmup in (("warm-up", True), ("lazy", False)):
+        results = [run(args.port, warmup, args.connect_latency, args.schema_latency) for _ in range(args.runs)]
+        median = {key: statistics.median(result[key] for result in results) for key in results[0]}
+        print(f"{mode:<8} {median['listening']:>10.3f} {median['ready']:>8.3f} {median['first_query']:>8.3f} "
+              f"{median['first_list_tables']:>8.3f} {median['served']:>8.3f}")
+    print("served: process start to the first query_clickhouse answer")
@@ -0,0 +1,158 @@
+"""
+Bytes on the wire and decode time for result transfer formats.
+
+Encodes synthetic results the way ClickHouse sends them and times decoding them
+back into columns the way the server does:
+
+- Native: ClickHouse's columnar format, parsed by clickhouse_connect.
+- Arrow: an IPC file converted to Python columns (transfer.py), with LZ4 or ZSTD
+  buffer compression, or gzip as HTTP compression.
+- JSON: JSONCompact, a text format, for comparison; decoding includes converting
+  quoted integers and timestamps back to Python values.
+
+Native and JSON are compressed over HTTP with each codec. Decode time includes
+decompression. Results are "wide" (many columns, few rows) and "long" (few
+columns, many rows).
+
+    python tests/bench_transfer.py [--rows-scale 1.0]
+"""
+import os
+import sys
+import gzip
+import json
+import random
+import timeit
+import argparse
+from datetime import datetime, timezone
+
+import lz4.frame
+import zstandard
+import pyarrow as pa
+
+from clickhouse_connect.datatypes.registry import get_from_name
+from clickhouse_connect.driver.buffer import ResponseBuffer
+from clickhouse_connect.driver.insert import InsertContext
+from clickhouse_connect.driver.query import QueryContext
+from clickhouse_connect.driver.transform import NativeTransform
+
+TESTS = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(TESTS, "..", "src"))
+from result_store import to_query_data
+
+CODECS = ("none", "lz4", "zstd", "gzip")
+
+HTTP_CODECS = {
+    "none": (lambda data: data, lambda data: data),
+    "lz4": (lz4.frame.compress, lz4.frame.decompress),
+    "zstd": (zstandard.ZstdCompressor(level=3).compress, zstandard.ZstdDecompressor().decompress),
+    # ClickHouse's default http_zlib_compression_level.
+    "gzip": (lambda data: gzip.compress(data, 3), gzip.decompress),
+}
+
+ARROW_CODECS = {"none": None, "lz4": "lz4", "zstd": "zstd", "gzip": None}
+
+CAMPAIGNS = [f"campaign-{i}" for i in range(50)]
+
+
+def column(rng, column_type, rows):
+    if column_type == "UInt64":
+        return [rng.randrange(1_000_000) for _ in range(rows)]
+    if column_type == "Float64":
+        return [round(rng.uniform(0, 10_000), 2) for _ in range(rows)]
+    if column_type == "DateTime":
+        return [1_700_000_000 + rng.randrange(86_400 * 90) for _ in range(rows)]
+    return [rng.choice(CAMPAIGNS) for _ in range(rows)]
+
+
+def synthetic(columns, rows, seed=0):
+    rng = random.Random(seed)
+    types = [("UInt64", "Float64", "String", "DateTime")[i % 4] for i in range(columns)]
+    names = [f"c{i}" for i in range(columns)]
+    return names, types, [column(rng, column_type, rows) for column_type in types]
+
+
+class _Source:
+    def __init__(self, payload):
+        self.gen = iter([payload])
+
+    def close(self):
+        pass
+
+
+def native_encode(names, types, data):
+    context = InsertContext("t", names, [get_from_name(t) for t in types], data, column_oriented=True, compression=False)
+    payload = b"".join(NativeTransform.build_insert(context))
+    # Drop the "INSERT INTO ... FORMAT Native" line; the rest is what a SELECT returns.
+    return payload[payload.index(b"\n") + 1:]
+
+
+def native_decode(payload):
+    result = NativeTransform.parse_response(ResponseBuffer(_Source(payload)), QueryContext(column_oriented=True))
+    return result.result_columns
+
+
+def arrow_encode(names, types, data, codec):
+    arrays = [pa.array(values, pa.timestamp("s") if t == "DateTime" else None) for values, t in zip(data, types)]
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_file(sink, pa.schema([(n, a.type) for n, a in zip(names, arrays)]),
+                         options=pa.ipc.IpcWriteOptions(compression=codec)) as writer:
+        writer.write_table(pa.Table.from_arrays(arrays, names=names))
+    return sink.getvalue().to_pybytes()
+
+
+def arrow_decode(payload):
+    return to_query_data(pa.ipc.open_file(pa.py_buffer(payload)).read_all()).columns
+
+
+def json_encode(names, types, data):
+    # As ClickHouse writes JSONCompact: 64-bit integers quoted, DateTime as text.
+    text = {
+        "UInt64": lambda values: [str(value) for value in values],
+        "DateTime": lambda values: [datetime.fromtimestamp(value, timezone.utc).strftime("%Y-%m-%d %H:%M:%S") for value in values],
+    }
+    data = [text.get(t, list)(values) for values, t in zip(data, types)]
+    rows = [list(row) for row in zip(*data)]
+    return json.dumps({"meta": [{"name": n, "type": t} for n, t in zip(names, types)], "data": rows}).encode()
+
+
+def json_decode(payload):
+    result = json.loads(payload)
+    parse = {"UInt64": int, "DateTime": datetime.fromisoformat}
+    columns = []
+    for meta, values in zip(result["meta"], zip(*result["data"])):
+        convert = parse.get(meta["type"])
+        columns.append([convert(value) for value in values] if convert else list(values))
+    return columns
+
+
+def measure(payload, decode, repeat):
+    decode(payload)
+    return min(timeit.repeat(lambda: decode(payload), number=1, repeat=repeat)) * 1000
+
+
+def report(label, names, types, data, repeat):
+    rows = len(data[0])
+    print(f"\n{label}: {len(names)} columns x {rows} rows")
+    print(f"{'format':<8} {'codec':<6} {'wire bytes':>12} {'ratio':>7} {'decode ms':>10}")
+    native = native_encode(names, types, data)
+    plain = json_encode(names, types, data)
+    json_bytes = len(plain)
+    for codec in CODECS:
+        compress, decompress = HTTP_CODECS[codec]
+        cases = [
+            ("native", compress(native), lambda payload: native_decode(decompress(payload))),
+            ("arrow", compress(arrow_encode(names, types, data, ARROW_CODECS[codec])), lambda payload: arrow_decode(decompress(payload))),
+            ("json", compress(plain), lambda payload: json_decode(decompress(payload))),
+        ]
+        for name, payload, decode in cases:
+            print(f"{name:<8} {codec:<6} {len(payload):>12,} {json_bytes / len(payload):>6.1f}x {measure(payload, decode, repeat):>10.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rows-scale", type=float, default=1.0, help="multiply the row counts, e.g. 0.1 for a quick run")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    print("ratio is JSON's uncompressed size over the format's bytes on the wire")
+    report("wide", *synthetic(200, max(1, int(2_000 * args.rows_scale))), args.repeat)
+    report("long", *synthetic(5, max(1, int(300_000 * args.rows_scale))), args.repeat)
@@ -0,0 +1,101 @@
+"""
+Micro-benchmark of query validation over a corpus of agent queries.
+
+Compares the previous per-call work (a substring scan of the upper-cased query
+for each forbidden keyword, then a separate pass to normalize it into a cache
+key) with the single-pass tokenizer doing both, uncached and with
+QueryValidator's remembered verdicts. Also counts each validator's wrong
+verdicts against tests/files/agent_queries.json.
+
+    python tests/bench_validator.py [iterations]
+"""
+import os
+import re
+import sys
+import json
+import timeit
+
+TESTS = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(TESTS, "..", "src"))
+from sql_lexer import KEYWORDS, QueryValidator, analyze
+
+with open(os.path.join(TESTS, "files", "agent_queries.json")) as f:
+    CORPUS = json.load(f)
+QUERIES = [entry["sql"] for entry in CORPUS]
+
+
+_TOKEN_RE = re.compile(r"""
+    (?P<string>'(?:[^'\\]|\\.|'')*')
+  | (?P<quoted>"(?:[^"\\]|\\.)*"|`(?:[^`\\]|\\.)*`)
+  | (?P<space>\s+)
+  | (?P<word>[A-Za-z_][A-Za-z0-9_]*)
+  | (?P<other>.)
+""", re.VERBOSE | re.DOTALL)
+
+
+def previous_normalize(sql):
+    parts = []
+    for match in _TOKEN_RE.finditer(sql):
+        kind = match.lastgroup
+        text = match.group()
+        if kind == "space":
+            parts.append(" ")
+        elif kind == "word" and text.upper() in KEYWORDS:
+            parts.append(text.upper())
+        else:
+            parts.append(text)
+    return "".join(parts).strip().rstrip(";").strip()
+
+
+def substring_scan(sql_query):
+    sql_query_upper = sql_query.strip().upper()
+    if not sql_query_upper.startswith('SELECT'):
+        return "Only SELECT queries are allowed"
+    forbidden_keywords = ['INSERT', 'UPDATE', 'DELETE', 'DROP', 'CREATE', 'ALTER', 'TRUNCATE']
+    if any(keyword in sql_query_upper for keyword in forbidden_keywords):
+        return "Query contains forbidden keywords"
+    return None
+
+
+def scan_and_normalize(sql_query):
+    # Normalized even when rejected, to time the path of a query that is allowed.
+    error = substring_scan(sql_query)
+    previous_normalize(sql_query)
+    return error
+
+
+def single_pass(sql_query):
+    return analyze(sql_query)[1]
+
+
+validator = QueryValidator()
+
+
+def cached(sql_query):
+    return validator.check(sql_query).error
+
+
+def wrong_verdicts(validate):
+    return [entry["sql"] for entry in CORPUS if (validate(entry["sql"]) is None) != entry["allowed"]]
+
+
+def per_query_us(validate, iterations):
+    run = lambda: [validate(sql) for sql in QUERIES]  # noqa: E731
+    run()
+    return min(timeit.repeat(run, number=iterations, repeat=5)) / iterations / len(QUERIES) * 1e6
+
+
+if __name__ == "__main__":
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    print(f"{len(QUERIES)} queries ({sum(entry['allowed'] for entry in CORPUS)} allowed)")
+    validators = (
+        ("substring scan", substring_scan),
+        ("scan + normalize", scan_and_normalize),
+        ("single pass", single_pass),
+        ("single pass, cached", cached),
+    )
+    for name, validate in validators:
+        wrong = wrong_verdicts(validate)
+        print(f"{name:<20} {per_query_us(validate, iterations):8.2f} us/query   wrong verdicts: {len(wrong)}")
+        for sql in wrong:
+            print(f"    {sql[:90]!r}")
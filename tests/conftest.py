@@ -0,0 +1,28 @@
+import pytest
+
+import clickhouse_mcp
+from admission import TenantScheduler
+from clickhouse_pool import ClickHousePool
+from cursors import CursorStore
+from query_tracker import QueryTracker
+from query_cache import ResultCache, SingleFlight
+from result_store import ResultStore
+from fake_clickhouse import FakeClickHouseClient, FakeQueryResult, FakeSchema  # noqa: F401  (re-exported for tests)
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def fake_client(monkeypatch, tmp_path):
+    client = FakeClickHouseClient()
+    monkeypatch.setattr(clickhouse_mcp, "pool", ClickHousePool(lambda: client, size=clickhouse_mcp.QUERY_CONCURRENCY))
+    monkeypatch.setattr(clickhouse_mcp, "result_cache", ResultCache())
+    monkeypatch.setattr(clickhouse_mcp, "single_flight", SingleFlight())
+    monkeypatch.setattr(clickhouse_mcp, "cursor_store", CursorStore())
+    monkeypatch.setattr(clickhouse_mcp, "query_tracker", QueryTracker(lambda: client))
+    monkeypatch.setattr(clickhouse_mcp, "result_store", ResultStore(str(tmp_path / "results")))
+    monkeypatch.setattr(clickhouse_mcp, "scheduler", TenantScheduler(clickhouse_mcp.QUERY_CONCURRENCY, clickhouse_mcp.QUERY_CONCURRENCY))
+    return client
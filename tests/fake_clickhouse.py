@@ -0,0 +1,179 @@
+"""
+Local stand-in for a ClickHouse server, shared by the unit tests and the benchmarks.
+
+FakeClickHouseClient answers queries with generated rows after a configurable
+latency; running queries can be interrupted with `KILL QUERY` like the real thing.
+FakeSchema answers the schema index's system table queries from an in-memory schema.
+"""
+import threading
+
+from clickhouse_pool import ClickHousePool
+from cursors import CursorStore
+from query_cache import ResultCache, SingleFlight
+from query_tracker import QueryTracker
+
+
+class FakeQueryResult:
+    """Minimal stand-in for clickhouse_connect's QueryResult."""
+
+    def __init__(self, column_names, columns):
+        self.column_names = tuple(column_names)
+        self.result_columns = columns
+        self.summary = {}
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+    @property
+    def result_rows(self):
+        return [list(row) for row in zip(*self.result_columns)]
+
+    result_set = result_rows
+
+
+class FakeClickHouseClient:
+    """Local ClickHouse stand-in with configurable latency and result size."""
+
+    def __init__(self, latency=0.0, rows=1, columns=("id", "value"), block_size=100):
+        self.latency = latency
+        self.rows = rows
+        self.columns = tuple(columns)
+        self.block_size = block_size
+        self.streams = []
+        self.query_settings = []
+        self.query_parameters = []
+        self.commands = []
+        self._running = {}
+        self.internal_queries = []
+        self.table_rows = 1000
+        # Canned answers for metadata queries, keyed by SQL prefix. These are kept
+        # out of `queries`, which records only the queries agents asked for.
+        self.responses = {
+            "EXPLAIN ESTIMATE": lambda query, parameters: (
+                ("database", "table", "parts", "rows", "marks"),
+                [["db"], ["t"], [1], [self.rows], [1]],
+            ),
+            "SELECT concat(database, '.', table)": lambda query, parameters: (
+                ("name", "rows", "bytes"),
+                [["db.t"], [self.table_rows], [self.table_rows * 100]],
+            ),
+        }
+        self.queries = []
+        self.settings = {}
+        self.closed = False
+        self.healthy = True
+        self._lock = threading.Lock()
+
+    def set_client_setting(self, key, value):
+        self.settings[key] = value
+
+    def ping(self):
+        return self.healthy
+
+    def close(self):
+        self.closed = True
+
+    def _columns(self, start, stop):
+        ids = list(range(start, stop))
+        return [ids] + [[f"{col}_{i}" for i in ids] for col in self.columns[1:]]
+
+    def _canned(self, query, parameters):
+        for prefix, respond in self.responses.items():
+            if query.lstrip().startswith(prefix):
+                with self._lock:
+                    self.internal_queries.append(query)
+                return FakeQueryResult(*respond(query, parameters))
+        return None
+
+    def _execute(self, query, settings):
+        query_id = (settings or {}).get("query_id")
+        killed = threading.Event()
+        with self._lock:
+            self.queries.append(query)
+            self.query_settings.append(settings)
+            if query_id:
+                self._running[query_id] = killed
+        try:
+            if self.latency and killed.wait(self.latency):
+                raise RuntimeError(f"Code: 394. Query was cancelled. (QUERY_WAS_CANCELLED) query_id={query_id}")
+        finally:
+            with self._lock:
+                self._running.pop(query_id, None)
+
+    def command(self, cmd, parameters=None, settings=None, **kwargs):
+        with self._lock:
+            self.commands.append((cmd, parameters))
+            if cmd.startswith("KILL QUERY"):
+                killed = self._running.get(parameters["query_id"])
+                if killed is not None:
+                    killed.set()
+        return ""
+
+    def query(self, query, parameters=None, settings=None, **kwargs):
+        canned = self._canned(query, parameters)
+        if canned is not None:
+            return canned
+        self._execute(query, settings)
+        self.query_parameters.append(parameters)
+        result = FakeQueryResult(self.columns, self._columns(0, self.rows))
+        # Values arrive as strings in the X-ClickHouse-Summary header.
+        result.summary = {"read_rows": str(self.rows), "read_bytes": str(self.rows * 8), "elapsed_ns": str(int(self.latency * 1e9))}
+        return result
+
+    def query_arrow(self, query, parameters=None, settings=None, **kwargs):
+        import pyarrow
+
+        self._execute(query, settings)
+        self.query_parameters.append(parameters)
+        return pyarrow.Table.from_arrays([pyarrow.array(values) for values in self._columns(0, self.rows)], names=list(self.columns))
+
+    def query_column_block_stream(self, query, parameters=None, settings=None, **kwargs):
+        # Imported here so the startup benchmark's server doesn't load clickhouse_connect early.
+        from clickhouse_connect.driver.common import StreamContext
+
+        self._execute(query, settings)
+        source = FakeQueryResult(self.columns, [])
+        self.streams.append(source)
+        blocks = (
+            self._columns(start, min(start + self.block_size, self.rows))
+            for start in range(0, self.rows, self.block_size)
+        )
+        return StreamContext(source, blocks)
+
+
+class FakeSchema:
+    """Serves system.tables / system.columns lookups for a mutable in-memory schema."""
+
+    def __init__(self, client):
+        self.tables = {
+            "actualized_volumes": (1, [("_id", "String"), ("campaignId", "String"), ("updatedAt", "DateTime")]),
+            "campaigns": (1, [("_id", "String"), ("organizationId", "String")]),
+        }
+        self.fetches = []
+        self.sampling_keys = {}
+        client.responses["SELECT\n    t.name"] = self.schema
+        client.responses["SELECT name, toUnixTimestamp"] = self.modification_times
+
+    def schema(self, query, parameters):
+        names = sorted(parameters["tables"] if parameters else self.tables)
+        self.fetches.append(names)
+        rows = [
+            (name, "MergeTree", "", "campaignId", self.sampling_keys.get(name, ""), 10, 100, self.tables[name][0],
+             [(i + 1, column, column_type, "") for i, (column, column_type) in enumerate(self.tables[name][1])])
+            for name in names
+        ]
+        return ("name", "engine", "comment", "sorting_key", "sampling_key", "total_rows", "total_bytes", "modified", "columns"), [list(c) for c in zip(*rows)]
+
+    def modification_times(self, query, parameters):
+        names = sorted(self.tables)
+        return ("name", "modified"), [names, [self.tables[name][0] for name in names]]
+
+
+def install(clickhouse_mcp, client: FakeClickHouseClient):
+    """Point the server module's pool, caches, cursors and tracker at `client`, starting from empty state."""
+    clickhouse_mcp.pool = ClickHousePool(lambda: client, size=clickhouse_mcp.QUERY_CONCURRENCY)
+    clickhouse_mcp.result_cache = ResultCache()
+    clickhouse_mcp.single_flight = SingleFlight()
+    clickhouse_mcp.cursor_store = CursorStore()
+    clickhouse_mcp.query_tracker = QueryTracker(lambda: client)
@@ -0,0 +1,111 @@
+import asyncio
+
+import httpx
+import pytest
+
+import clickhouse_mcp
+from admission import AdmissionRejected, TenantScheduler, current_tenant
+from auth import TokenVerifier
+from clickhouse_mcp import JWTAuthMiddleware
+from stateless_http import StatelessHTTPEndpoint
+from test_auth import make_token
+
+
+async def hold(scheduler, tenant, order, release):
+    async with scheduler.slot(tenant):
+        order.append(tenant)
+        await release.wait()
+
+
+@pytest.mark.anyio
+async def test_queued_work_is_shared_by_weight():
+    scheduler = TenantScheduler(capacity=1, max_concurrency=1, weights={"heavy": 2})
+    order, release = [], asyncio.Event()
+    blocker = asyncio.ensure_future(hold(scheduler, "blocker", order, release))
+    await asyncio.sleep(0)
+
+    async def run(tenant):
+        async with scheduler.slot(tenant):
+            order.append(tenant)
+
+    tasks = [asyncio.ensure_future(run(tenant)) for tenant in ["heavy"] * 4 + ["light"] * 2]
+    await asyncio.sleep(0)
+    assert scheduler.stats()["heavy"]["queued"] == 4 and scheduler.stats()["light"]["queued"] == 2
+
+    release.set()
+    await asyncio.gather(blocker, *tasks)
+    assert order == ["blocker", "heavy", "light", "heavy", "heavy", "light", "heavy"]
+    assert all(stats["running"] == 0 and stats["queued"] == 0 for stats in scheduler.stats().values())
+
+
+@pytest.mark.anyio
+async def test_full_queues_rate_limits_and_timeouts_are_rejected():
+    scheduler = TenantScheduler(capacity=4, max_concurrency=1, queue_limit=1)
+    release = asyncio.Event()
+    running = asyncio.ensure_future(hold(scheduler, "a", [], release))
+    await asyncio.sleep(0)
+    queued = asyncio.ensure_future(hold(scheduler, "a", [], release))
+    await asyncio.sleep(0)
+
+    with pytest.raises(AdmissionRejected) as rejected:
+        await scheduler.acquire("a")
+    assert rejected.value.retry_after >= 1
+    # Another tenant still runs straight away.
+    async with scheduler.slot("b"):
+        assert scheduler.stats()["b"]["running"] == 1
+
+    queued.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await queued
+    assert scheduler.stats()["a"]["queued"] == 0
+    with pytest.raises(AdmissionRejected, match="within 0.01s"):
+        await scheduler.acquire("a", timeout=0.01)
+    release.set()
+    await running
+    assert scheduler.stats()["a"] == {"running": 0, "queued": 0, "admitted": 1, "rejected": 2, "wait_seconds_total": 0}
+
+    limited = TenantScheduler(capacity=4, max_concurrency=4, rate=1, burst=2)
+    for _ in range(2):
+        async with limited.slot("a"):
+            pass
+    with pytest.raises(AdmissionRejected, match="Rate limit") as rejected:
+        await limited.acquire("a")
+    assert 0 < rejected.value.retry_after <= 1
+
+
+@pytest.mark.anyio
+async def test_one_tenant_flooding_the_pool_leaves_slots_for_others():
+    scheduler = TenantScheduler(capacity=4)
+    assert scheduler.max_concurrency == 2 and TenantScheduler(capacity=1).max_concurrency == 1
+    order, release = [], asyncio.Event()
+    flood = [asyncio.ensure_future(hold(scheduler, "flood", order, release)) for _ in range(8)]
+    await asyncio.sleep(0)
+    assert scheduler.stats()["flood"]["running"] == 2
+
+    async with scheduler.slot("other"):
+        assert scheduler.stats()["other"]["running"] == 1
+    async with scheduler.slot("third"):
+        assert order == ["flood", "flood"]
+
+    release.set()
+    await asyncio.gather(*flood)
+    assert scheduler.stats()["flood"]["admitted"] == 8
+
+
+@pytest.mark.anyio
+async def test_tool_calls_are_admitted_as_the_token_tenant(fake_client, monkeypatch):
+    app = JWTAuthMiddleware(StatelessHTTPEndpoint(clickhouse_mcp.mcp._mcp_server), verifier=TokenVerifier(["secret"]))
+    headers = {"Authorization": f"Bearer {make_token('secret', sub='alice', iss='acme')}"}
+    call = {"jsonrpc": "2.0", "id": 1, "method": "tools/call", "params": {
+        "name": "query_clickhouse", "arguments": {"sql_query": "SELECT id FROM t", "use_cache": False},
+    }}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        assert (await client.post("/mcp", json=call, headers=headers)).json()["result"]["isError"] is False
+        assert clickhouse_mcp.scheduler.stats()["acme:alice"]["admitted"] == 1
+        assert current_tenant.get() == "anonymous"
+
+        monkeypatch.setattr(clickhouse_mcp, "scheduler", TenantScheduler(4, 4, rate=0.001, burst=1))
+        assert "error" not in await clickhouse_mcp.query_clickhouse("SELECT 1", use_cache=False)
+        result = await clickhouse_mcp.query_clickhouse("SELECT 2", use_cache=False)
+    assert "Rate limit" in result["error"] and result["retry_after"] > 1
+    assert 'mcp_tenant_rejections_total{tenant="anonymous"} 1' in clickhouse_mcp.metrics.render()
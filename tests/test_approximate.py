@@ -0,0 +1,146 @@
+import math
+import random
+
+import pytest
+
+import clickhouse_mcp
+from approximate import SAMPLE_ROWS_COLUMN, Approximation, approximate_query, relative_error
+from conftest import FakeSchema
+from result_format import QueryData
+from schema_index import SchemaIndex
+
+TABLES = {
+    "events": {"name": "events", "sampling_key": "intHash32(userId)", "total_rows": 10 ** 9},
+    "lookup": {"name": "lookup", "sampling_key": "id", "total_rows": 1000},
+    "plain": {"name": "plain", "sampling_key": "", "total_rows": 10 ** 9},
+}
+
+
+def approximate(sql):
+    return approximate_query(sql, lambda name: TABLES.get(name.split(".")[-1]), sample_ratio=0.1, min_rows=10 ** 6)
+
+
+def test_sampled_counts_and_sums_are_scaled_and_keep_their_names():
+    approximation = approximate(
+        "SELECT region, count(), sum(amount) AS revenue, avg(amount), countIf(amount > 5) "
+        "FROM db.events AS e WHERE day = today() GROUP BY region HAVING count() > 10 ORDER BY count() DESC"
+    )
+    assert approximation.sql == (
+        "SELECT region, round(sum(_sample_factor)) AS `count()`, sum((amount) * _sample_factor) AS revenue, avg(amount), "
+        "round(sumIf(_sample_factor, amount > 5)) AS `countIf(amount > 5)`, count() AS _sample_rows, "
+        "count() AS _sample_0_sum, sum(amount) AS _sample_1_sum, sum(pow(amount, 2)) AS _sample_1_squares, "
+        "countIf(amount > 5) AS _sample_2_sum FROM db.events AS e SAMPLE 0.1 WHERE day = today() GROUP BY region "
+        "HAVING round(sum(_sample_factor)) > 10 ORDER BY round(sum(_sample_factor)) DESC"
+    )
+    assert approximation.sample_ratio == 0.1 and approximation.table == "events"
+
+    data = QueryData(
+        ["region", "count()", SAMPLE_ROWS_COLUMN, "_sample_0_sum", "_sample_1_sum", "_sample_1_squares", "_sample_2_sum"],
+        [["eu", "us"], [1000.0, 40.0], [100, 4], [100, 4], [50.0, 8.0], [100.0, 16.0], [25, 0]],
+    )
+    data.stats["estimate"] = {"rows": 10}
+    finished, info = approximation.finish(data)
+    assert finished.column_names == ["region", "count()"] and finished.columns[1] == [1000.0, 40.0]
+    assert finished.stats == {"estimate": {"rows": 10}} and SAMPLE_ROWS_COLUMN in data.column_names
+    assert info["sampled_rows"] == 104
+    errors = info["relative_error_95"]
+    assert errors["count()"]["max"] == round(relative_error(4, 0.1), 4) == 0.9297
+    assert errors["sum(amount)"]["median"] == round((relative_error(50.0, 0.1, 100.0) + relative_error(8.0, 0.1, 16.0)) / 2, 4)
+    assert errors["countIf(amount > 5)"]["max"] == math.inf
+
+
+def test_sum_errors_cover_skewed_values():
+    # Heavy-tailed amounts: the spread of the values, not just how many were sampled, sets a sum's error.
+    rng = random.Random(7)
+    population = [rng.lognormvariate(0, 2) for _ in range(5000)]
+    total = sum(population)
+    approximation = approximate("SELECT sum(amount) FROM events")
+    trials, row_bound_held, sum_bound_held = 100, 0, 0
+    for _ in range(trials):
+        sample = [value for value in population if rng.random() < 0.1]
+        data = QueryData(
+            ["sum(amount)", SAMPLE_ROWS_COLUMN, "_sample_0_sum", "_sample_0_squares"],
+            [[sum(sample) * 10], [len(sample)], [sum(sample)], [sum(value * value for value in sample)]],
+        )
+        _, info = approximation.finish(data)
+        error = abs(sum(sample) * 10 - total) / total
+        row_bound_held += error <= relative_error(len(sample), 0.1)
+        sum_bound_held += error <= info["relative_error_95"]["sum(amount)"]["max"]
+    assert row_bound_held / trials < 0.5
+    assert sum_bound_held / trials >= 0.85
+
+
+@pytest.mark.parametrize("sql, reason", [
+    ("SELECT min(amount), count() FROM events", "min can't be estimated"),
+    ("SELECT count() FROM lookup", "fewer than 1000000 rows"),
+    ("SELECT count() FROM plain", "no sampling key"),
+    ("SELECT * FROM events LIMIT 5", "no counts, sums"),
+    ("SELECT count() FROM events e JOIN plain p ON e.id = p.id", "single-table"),
+    ("SELECT count() FROM events WHERE id IN (SELECT id FROM plain)", "single-table"),
+    ("SELECT count() FROM numbers(10)", "table functions"),
+    ("SELECT count() FROM events SAMPLE 0.5", "single-table"),
+    ("SELECT count(), sumOrNull(x) FROM events", "sumOrNull can't be estimated"),
+    ("SELECT sumArray(xs), countArray(xs) FROM events", "countArray, sumArray can't"),
+    ("SELECT sumWithOverflow(x), sumKahan(y) FROM events", "sumKahan, sumWithOverflow can't"),
+    ("SELECT countDistinctIf(x, y > 1), avg(x) FROM events", "countDistinctIf can't"),
+    ("SELECT avgState(x), count() FROM events", "avgState can't"),
+    ("SELECT stddevPop(x), groupBitmap(y) FROM events", "groupBitmap can't"),
+])
+def test_queries_a_sample_cant_answer_are_not_sampled(sql, reason):
+    approximation = approximate(sql)
+    assert approximation.sample_ratio is None and approximation.sql == sql
+    assert reason in approximation.notes[0]
+
+
+def test_exact_aggregates_are_replaced_by_approximate_ones():
+    approximation = approximate("SELECT count(DISTINCT userId), quantileExact(0.9)(amount) AS p90 FROM events FINAL")
+    assert approximation.sql == "SELECT uniq(userId) AS `count(DISTINCT userId)`, quantileTDigest(0.9)(amount) AS p90 FROM events FINAL"
+    assert approximation.substitutions == ["count(DISTINCT) -> uniq", "quantileExact -> quantileTDigest"]
+    finished, info = approximation.finish(QueryData(["a", "p90"], [[5], [1.5]]))
+    assert finished.columns == [[5], [1.5]] and "relative_error_95" not in info
+    assert set(info["function_errors"]) == {"uniq", "quantileTDigest"}
+
+    sampled = approximate("SELECT medianExact(amount), count(*) FROM events")
+    assert sampled.sql.startswith("SELECT medianTDigest(amount) AS `medianExact(amount)`, round(sum(_sample_factor)) AS `count(*)`")
+    assert sampled.sample_ratio == 0.1
+
+
+def test_estimable_combinators_and_scalar_functions_keep_the_query_sampled():
+    approximation = approximate(
+        "SELECT multiIf(x > 1, 'a', 'b') AS bucket, round(avgIf(x, y > 0)), quantilesTDigestOrNull(0.5)(x), "
+        "stddevPop(x), sumIf(x, y > 0) AS total FROM events GROUP BY bucket"
+    )
+    assert approximation.sample_ratio == 0.1
+    assert "sumIf((x) * _sample_factor, y > 0) AS total" in approximation.sql
+
+
+@pytest.mark.anyio
+async def test_query_clickhouse_answers_approximately(fake_client, monkeypatch):
+    monkeypatch.setattr(clickhouse_mcp, "schema_index", SchemaIndex())
+    monkeypatch.setattr(clickhouse_mcp, "APPROXIMATE_MIN_ROWS", 0)
+    FakeSchema(fake_client).sampling_keys["actualized_volumes"] = "intHash32(campaignId)"
+    fake_client.responses["SELECT campaignId, round("] = lambda query, parameters: (
+        ("campaignId", "volume", SAMPLE_ROWS_COLUMN, "_sample_0_sum"), [["c1", "c2"], [1200.0, 300.0], [120, 30], [120, 30]],
+    )
+
+    result = await clickhouse_mcp.query_clickhouse(
+        "SELECT campaignId, count() AS volume FROM actualized_volumes GROUP BY campaignId", format="compact", approximate=True,
+    )
+    assert result["columns"] == ["campaignId", "volume"] and result["rows"] == [["c1", 1200.0], ["c2", 300.0]]
+    assert "SAMPLE 0.1" in fake_client.internal_queries[-1]
+    assert result["approximation"]["sample_ratio"] == 0.1 and result["approximation"]["sampled_rows"] == 150
+    assert result["approximation"]["relative_error_95"]["count()"]["max"] == round(relative_error(30, 0.1), 4)
+
+    exact = await clickhouse_mcp.query_clickhouse("SELECT campaignId FROM actualized_volumes", approximate=True)
+    assert exact["approximation"]["sample_ratio"] is None and "Not sampled" in exact["approximation"]["notes"][0]
+    assert (await clickhouse_mcp.query_clickhouse("SELECT 1", stream=True, approximate=True))["error"]
+
+
+@pytest.mark.anyio
+async def test_rewritten_query_is_validated_again(fake_client, monkeypatch):
+    monkeypatch.setattr(clickhouse_mcp, "schema_index", SchemaIndex())
+    monkeypatch.setattr(clickhouse_mcp, "approximate_query", lambda sql, *args: Approximation(sql + "; DROP TABLE t"))
+    FakeSchema(fake_client)
+    result = await clickhouse_mcp.query_clickhouse("SELECT count() FROM t", approximate=True)
+    assert result == {"error": "Multiple statements are not allowed"}
+    assert not any("DROP" in query for query in fake_client.queries)
@@ -0,0 +1,86 @@
+import time
+
+import jwt
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Mount, Route
+from starlette.testclient import TestClient
+
+import auth
+from auth import TokenVerifier
+from clickhouse_mcp import JWTAuthMiddleware
+
+
+def make_token(secret, expires_in=3600, **claims):
+    payload = {"sub": "agent", "iss": "clickhouse_mcp_client", "exp": int(time.time()) + expires_in, **claims}
+    return jwt.encode(payload, secret, algorithm="HS256")
+
+
+def test_verified_tokens_are_cached_until_exp(monkeypatch):
+    verifier = TokenVerifier(["secret"])
+    decodes = []
+    real_decode = jwt.decode
+    monkeypatch.setattr(auth.jwt, "decode", lambda *a, **kw: decodes.append(1) or real_decode(*a, **kw))
+
+    token = make_token("secret")
+    assert verifier.verify(token)["sub"] == "agent"
+    assert verifier.verify(token)["sub"] == "agent"
+    assert len(decodes) == 1
+    assert (verifier.hits, verifier.misses) == (1, 1)
+
+    short_lived = make_token("secret", expires_in=1)
+    verifier.verify(short_lived)
+    time.sleep(1.1)
+    with pytest.raises(jwt.ExpiredSignatureError):
+        verifier.verify(short_lived)
+
+
+def test_any_active_secret_is_accepted():
+    verifier = TokenVerifier(["new", "old"])
+    assert verifier.verify(make_token("old"))["sub"] == "agent"
+    assert verifier.verify(make_token("new"))["sub"] == "agent"
+    with pytest.raises(jwt.InvalidSignatureError):
+        verifier.verify(make_token("unknown"))
+
+
+def test_cache_is_bounded():
+    verifier = TokenVerifier(["secret"], cache_size=2)
+    for i in range(3):
+        verifier.verify(make_token("secret", jti=str(i)))
+    assert len(verifier._cache) == 2
+
+
+def test_middleware_protects_sse_and_messages_and_serves_status():
+    app = Starlette(routes=[
+        Route("/sse", lambda request: PlainTextResponse("stream")),
+        Mount("/messages/", app=PlainTextResponse("Accepted", status_code=202)),
+        Route("/other", lambda request: PlainTextResponse("open")),
+    ])
+    app.add_middleware(JWTAuthMiddleware, verifier=TokenVerifier(["secret"]))
+    client = TestClient(app)
+
+    assert client.get("/").json()["status"] == "online"
+    assert client.get("/sse").status_code == 401
+    assert client.get("/sse", headers={"Authorization": "Bearer bad"}).status_code == 401
+    expired = make_token("secret", expires_in=-10)
+    assert client.get("/sse", headers={"Authorization": f"Bearer {expired}"}).text == "Unauthorized: Token expired"
+    response = client.get("/sse", headers={"Authorization": f"Bearer {make_token('secret')}"})
+    assert response.status_code == 200 and response.text == "stream"
+
+    assert client.post("/messages/?session_id=abc").status_code == 401
+    posted = client.post("/messages/?session_id=abc", headers={"Authorization": f"Bearer {make_token('secret')}"})
+    assert posted.status_code == 202
+    # The message endpoint is a mount: paths below it reach the transport too.
+    assert client.post("/messages/x?session_id=abc").status_code == 401
+    assert client.post("/messages?session_id=abc").status_code == 401
+    assert client.post("/mcp/x").status_code == 401
+    assert client.post("/messages/x?session_id=abc", headers={"Authorization": f"Bearer {make_token('secret')}"}).status_code == 202
+    assert client.get("/other").text == "open"
+
+
+def test_middleware_reports_missing_secret():
+    app = Starlette(routes=[Route("/sse", lambda request: PlainTextResponse("stream"))])
+    app.add_middleware(JWTAuthMiddleware, verifier=TokenVerifier([""]))
+    response = TestClient(app).get("/sse", headers={"Authorization": "Bearer x"})
+    assert response.status_code == 500
@@ -0,0 +1,135 @@
+import threading
+import time
+
+import pytest
+from clickhouse_connect.driver.exceptions import OperationalError
+
+from clickhouse_pool import ClickHousePool, PoolTimeoutError
+from conftest import FakeClickHouseClient
+
+
+def test_checkouts_are_isolated_and_reused():
+    created = []
+
+    def factory():
+        created.append(FakeClickHouseClient())
+        return created[-1]
+
+    pool = ClickHousePool(factory, size=2)
+    with pool.connection() as first, pool.connection() as second:
+        assert first is not second
+        assert first.settings["session_id"] != second.settings["session_id"]
+    with pool.connection() as again:
+        assert again in created
+
+    assert len(created) == 2
+    assert pool.stats()["idle"] == 2
+
+
+def test_checkout_waits_for_a_free_client_and_times_out():
+    pool = ClickHousePool(FakeClickHouseClient, size=1, checkout_timeout=0.1)
+    with pool.connection():
+        with pytest.raises(PoolTimeoutError):
+            with pool.connection():
+                pass
+
+    released = threading.Event()
+
+    def hold():
+        with pool.connection():
+            released.wait()
+
+    holder = threading.Thread(target=hold)
+    holder.start()
+    time.sleep(0.02)
+    pool.checkout_timeout = 2
+    threading.Timer(0.05, released.set).start()
+    with pool.connection() as client:
+        assert client is not None
+    holder.join()
+
+
+def test_connect_retries_with_backoff():
+    attempts = []
+
+    def flaky():
+        attempts.append(time.monotonic())
+        if len(attempts) < 3:
+            raise OperationalError("connection refused")
+        return FakeClickHouseClient()
+
+    pool = ClickHousePool(flaky, size=1, backoff_base=0.01)
+    with pool.connection() as client:
+        assert isinstance(client, FakeClickHouseClient)
+    assert len(attempts) == 3
+
+    pool = ClickHousePool(lambda: (_ for _ in ()).throw(OperationalError("down")), connect_retries=1, backoff_base=0.01)
+    with pytest.raises(OperationalError):
+        with pool.connection():
+            pass
+    assert pool.stats()["in_use"] == 0
+
+
+def test_unhealthy_and_broken_clients_are_replaced():
+    created = []
+
+    def factory():
+        created.append(FakeClickHouseClient())
+        return created[-1]
+
+    pool = ClickHousePool(factory, size=1, health_check_interval=0)
+    with pool.connection() as client:
+        client.healthy = False
+    with pool.connection() as replacement:
+        assert replacement is not client
+    assert client.closed
+    assert pool.stats()["reconnects"] == 1
+
+    with pytest.raises(OperationalError):
+        with pool.connection():
+            raise OperationalError("connection reset")
+    assert replacement.closed
+    assert pool.stats()["idle"] == 0
+
+
+def test_idle_clients_are_evicted():
+    pool = ClickHousePool(FakeClickHouseClient, size=2, idle_timeout=0.01)
+    with pool.connection() as client:
+        pass
+    time.sleep(0.02)
+    pool.evict_idle()
+
+    assert client.closed
+    assert pool.stats()["idle"] == 0
+    assert pool.stats()["evicted"] == 1
+
+
+def test_warm_opens_idle_clients_without_waiting():
+    pool = ClickHousePool(FakeClickHouseClient, size=3)
+    assert pool.warm(2) == 2 and pool.warm(2) == 0
+    with pool.connection(), pool.connection():
+        # Two clients in use and one slot left: warming opens at most that one.
+        assert pool.warm() == 1
+    assert pool.stats() == {"size": 3, "in_use": 0, "idle": 3, "opened": 3, "reconnects": 0, "evicted": 0}
+
+    # Errors that aren't connection failures leave the client in the pool.
+    with pytest.raises(ValueError):
+        with pool.connection():
+            raise ValueError("bad query")
+    assert pool.stats()["idle"] == 3
+
+
+def test_concurrent_warming_opens_in_parallel():
+    def slow():
+        time.sleep(0.05)
+        return FakeClickHouseClient()
+
+    pool = ClickHousePool(slow, size=8)
+    threads = [threading.Thread(target=pool.warm, args=(4,)) for _ in range(4)]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert time.monotonic() - started < 0.15
+    assert pool.stats()["idle"] == 4 and pool.stats()["opened"] == 4
@@ -0,0 +1,96 @@
+import time
+import asyncio
+
+import pytest
+
+import clickhouse_mcp
+from cursors import Cursor, CursorLimitError, CursorNotFoundError, CursorStore
+
+
+def make_cursor(rows=25, block_size=10, page_size=7):
+    blocks = iter([
+        [list(range(start, min(start + block_size, rows)))]
+        for start in range(0, rows, block_size)
+    ])
+    closed = []
+    return Cursor(["n"], blocks, lambda: closed.append(True), page_size), closed
+
+
+def test_pages_span_block_boundaries():
+    cursor, _ = make_cursor()
+    pages = []
+    while not cursor.exhausted:
+        pages.append(cursor.read_page().columns[0])
+
+    assert [len(page) for page in pages] == [7, 7, 7, 4]
+    assert sum(pages, []) == list(range(25))
+    assert cursor.rows_served == 25
+
+
+def test_store_caps_open_cursors_and_expires_idle_ones():
+    store = CursorStore(max_open=1, idle_timeout=0.01)
+    first, first_closed = make_cursor()
+    token = store.add(first)
+    second, second_closed = make_cursor()
+    with pytest.raises(CursorLimitError):
+        store.add(second)
+    assert second_closed == [True]
+
+    time.sleep(0.02)
+    with pytest.raises(CursorNotFoundError):
+        store.get(token)
+    assert first_closed == [True]
+    assert len(store) == 0
+
+
+@pytest.mark.anyio
+async def test_streamed_query_is_paged_through_fetch_page(fake_client):
+    fake_client.rows = 250
+    first = await clickhouse_mcp.query_clickhouse("SELECT id, value FROM big", format="compact", stream=True, page_size=100)
+
+    assert first["row_count"] == 100 and first["has_more"]
+    assert "cache" not in first
+    source = fake_client.streams[0]
+    assert clickhouse_mcp.pool.stats()["in_use"] == 1
+    assert [query["state"] for query in clickhouse_mcp.query_tracker.in_flight()] == ["running"]
+
+    second = await clickhouse_mcp.fetch_page(first["cursor"], format="columnar")
+    last = await clickhouse_mcp.fetch_page(second["cursor"])
+
+    assert second["data"][0] == list(range(100, 200))
+    assert last["row_count"] == 50 and last["cursor"] is None
+    assert last["rows"][-1] == {"id": 249, "value": "value_249"}
+    assert source.closed
+    assert clickhouse_mcp.pool.stats()["in_use"] == 0
+    assert clickhouse_mcp.query_tracker.in_flight() == []
+    assert "error" in await clickhouse_mcp.fetch_page(first["cursor"])
+
+
+@pytest.mark.anyio
+async def test_small_streamed_result_needs_no_cursor_and_cursors_can_be_closed(fake_client):
+    fake_client.rows = 5
+    result = await clickhouse_mcp.query_clickhouse("SELECT id, value FROM small", stream=True)
+    assert result["cursor"] is None and result["row_count"] == 5
+
+    fake_client.rows = 50
+    result = await clickhouse_mcp.query_clickhouse("SELECT id, value FROM t", stream=True, page_size=10)
+    assert await clickhouse_mcp.close_cursor(result["cursor"]) == {"closed": True}
+    assert clickhouse_mcp.pool.stats()["in_use"] == 0
+
+
+@pytest.mark.anyio
+async def test_abandoned_cursors_are_swept_in_the_background(fake_client, monkeypatch):
+    monkeypatch.setattr(clickhouse_mcp, "cursor_store", CursorStore(idle_timeout=0.01))
+    monkeypatch.setattr(clickhouse_mcp, "CURSOR_SWEEP_INTERVAL", 0.01)
+    fake_client.rows = 50
+    result = await clickhouse_mcp.query_clickhouse("SELECT id, value FROM t", stream=True, page_size=10)
+    assert result["has_more"] and clickhouse_mcp.pool.stats()["in_use"] == 1
+
+    sweeper = asyncio.ensure_future(clickhouse_mcp.sweep_cursors())
+    try:
+        await asyncio.sleep(0.1)
+    finally:
+        sweeper.cancel()
+    assert len(clickhouse_mcp.cursor_store) == 0 and fake_client.streams[0].closed
+    assert clickhouse_mcp.pool.stats()["in_use"] == 0
+    assert clickhouse_mcp.query_tracker.in_flight() == []
@@ -0,0 +1,108 @@
+import asyncio
+
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+import clickhouse_mcp
+from admission import current_tenant
+from auth import TokenVerifier
+from clickhouse_mcp import JWTAuthMiddleware
+from metrics import Registry
+from test_auth import make_token
+from test_query_tracker import open_sse_session
+
+
+def test_render_text_format():
+    registry = Registry()
+    calls = registry.counter("calls_total", "Calls.", ["tool"])
+    registry.gauge("idle", "Idle things.")
+    latency = registry.histogram("latency_seconds", "Latency.", buckets=(0.1, 1))
+    registry.add_collector(lambda: [("pool_size", "gauge", "Pool size.", [("pool_size", {}, 4)])])
+
+    calls.inc('say "hi"\n')
+    latency.observe(0.05)
+    latency.observe(0.5)
+    latency.observe(5)
+
+    text = registry.render()
+    assert '# TYPE calls_total counter\ncalls_total{tool="say \\"hi\\"\\n"} 1\n' in text
+    assert "idle 0\n" in text
+    assert 'latency_seconds_bucket{le="0.1"} 1\n' in text
+    assert 'latency_seconds_bucket{le="1"} 2\n' in text
+    assert 'latency_seconds_bucket{le="+Inf"} 3\n' in text
+    assert "latency_seconds_sum 5.55\nlatency_seconds_count 3\n" in text
+    assert "# TYPE pool_size gauge\npool_size 4\n" in text
+    with pytest.raises(ValueError):
+        calls.inc()
+
+
+@pytest.mark.anyio
+async def test_query_phases_results_and_errors_are_recorded(fake_client):
+    phases = ("validate", "queue_wait", "plan", "execute", "serialize")
+    before = {phase: clickhouse_mcp.tool_phase_seconds.count("query_clickhouse", phase) for phase in phases}
+    read_rows = clickhouse_mcp.clickhouse_read_rows.value()
+    rejected = clickhouse_mcp.tool_errors.value("query_clickhouse", "InvalidRequest")
+    calls = clickhouse_mcp.tool_duration_seconds.count("query_clickhouse")
+
+    result = await clickhouse_mcp.query_clickhouse("SELECT id FROM t", use_cache=False)
+    assert "error" not in result
+    assert "error" in await clickhouse_mcp.query_clickhouse("DROP TABLE t")
+
+    for phase in phases:
+        assert clickhouse_mcp.tool_phase_seconds.count("query_clickhouse", phase) == before[phase] + 1 + (phase == "validate")
+    assert clickhouse_mcp.clickhouse_read_rows.value() == read_rows + fake_client.rows
+    assert clickhouse_mcp.tool_errors.value("query_clickhouse", "InvalidRequest") == rejected + 1
+    assert clickhouse_mcp.tool_duration_seconds.count("query_clickhouse") == calls + 2
+    assert "clickhouse_pool_clients{state=\"idle\"} 1" in clickhouse_mcp.metrics.render()
+
+
+def test_metrics_route_needs_a_token_and_sse_sessions_are_counted():
+    seen = []
+    app = Starlette(routes=[Route("/sse", lambda request: seen.append(clickhouse_mcp.sse_sessions.value()) or PlainTextResponse("stream"))])
+    app.add_middleware(JWTAuthMiddleware, verifier=TokenVerifier(["secret"]), metrics_token="scrape")
+    client = TestClient(app)
+
+    open_sessions = clickhouse_mcp.sse_sessions.value()
+    client.get("/sse", headers={"Authorization": f"Bearer {make_token('secret')}"})
+    assert seen == [open_sessions + 1]
+    assert clickhouse_mcp.sse_sessions.value() == open_sessions
+
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 401
+    response = client.get("/metrics", headers={"Authorization": "Bearer scrape"})
+    assert response.status_code == 200 and response.headers["content-type"].startswith("text/plain")
+    assert "# TYPE mcp_tool_phase_seconds histogram" in response.text
+    assert client.get("/metrics", headers={"Authorization": f"Bearer {make_token('secret')}"}).status_code == 200
+
+
+@pytest.mark.anyio
+async def test_tenant_labels_are_bounded(fake_client, monkeypatch):
+    monkeypatch.setattr(clickhouse_mcp, "METRICS_MAX_TENANTS", 2)
+    monkeypatch.setattr(clickhouse_mcp, "labelled_tenants", set())
+    for tenant in ("iss:a", "iss:b", "iss:c", "iss:d"):
+        token = current_tenant.set(tenant)
+        try:
+            await clickhouse_mcp.query_clickhouse("SELECT 1", use_cache=False)
+        finally:
+            current_tenant.reset(token)
+
+    text = clickhouse_mcp.metrics.render()
+    assert 'mcp_tenant_queries{tenant="iss:a",state="running"} 0' in text
+    assert 'mcp_tenant_rejections_total{tenant="iss:b"} 0' in text
+    assert 'mcp_tenant_queries{tenant="other",state="queued"} 0' in text
+    assert "iss:c" not in text and "iss:d" not in text
+
+
+@pytest.mark.anyio
+async def test_sse_session_gauge_drops_when_the_client_disconnects(fake_client, monkeypatch):
+    monkeypatch.setenv("ACCESS_TOKEN_SECRET", "secret")
+    open_sessions = clickhouse_mcp.sse_sessions.value()
+    stream, _, _, disconnect = await open_sse_session(clickhouse_mcp.custom_sse_app(), make_token("secret"))
+    assert clickhouse_mcp.sse_sessions.value() == open_sessions + 1
+
+    disconnect()
+    await asyncio.wait_for(stream, 2)
+    assert clickhouse_mcp.sse_sessions.value() == open_sessions
@@ -0,0 +1,71 @@
+import os
+import asyncio
+
+import pytest
+
+import clickhouse_mcp
+from named_queries import NamedQuery, NamedQueryError, NamedQueryRegistry
+
+SQL = "SELECT campaignId, sum(revenue) FROM actualized_volumes WHERE organizationId = {org:String} AND createdAt >= {since: DateTime} GROUP BY campaignId"
+
+
+def test_parameters_are_checked_against_placeholders():
+    query = NamedQuery("by_campaign", SQL)
+    assert query.parameters == {"org": "String", "since": "DateTime"}
+    assert query.bind({"since": "2024-01-01 00:00:00", "org": "o'1"}) == {"org": "o'1", "since": "2024-01-01 00:00:00"}
+    with pytest.raises(NamedQueryError, match="missing since; unexpected other. Expected: org \\(String\\), since \\(DateTime\\)"):
+        query.bind({"org": "o1", "other": 1})
+    with pytest.raises(NamedQueryError, match="must be a string"):
+        query.bind({"org": {"nested": 1}, "since": "x"})
+
+    shipped = NamedQueryRegistry.load(os.path.join(os.path.dirname(clickhouse_mcp.__file__), "named_queries.json"))
+    assert shipped.get("volumes_by_campaign").parameters == {"organization_id": "String"}
+    with pytest.raises(NamedQueryError, match="Available: revenue_by_organization, volumes_by_campaign"):
+        shipped.get("nope")
+
+
+def test_scheduled_results_fall_due_for_presets_and_requested_parameters():
+    registry = NamedQueryRegistry.from_config({
+        "daily": {"sql": "SELECT {days:UInt32}", "refresh_seconds": 60, "precompute": [{"days": 7}]},
+        "adhoc": {"sql": "SELECT 1"},
+    })
+    assert [(query.name, params) for query, params in registry.due()] == [("daily", {"days": 7})]
+    assert registry.next_refresh_in() == 0
+
+    registry.store("daily", {"days": 7}, clickhouse_mcp.QueryData(["x"], [[1]]))
+    registry.store("daily", {"days": 30}, clickhouse_mcp.QueryData(["x"], [[2]]))
+    assert registry.due() == [] and 59 < registry.next_refresh_in() <= 60
+    registry.lookup("daily", {"days": 30}).refreshed_at -= 61
+    assert [params for _, params in registry.due()] == [{"days": 30}]
+
+
+@pytest.mark.anyio
+async def test_run_named_query_binds_parameters_and_reuses_results(fake_client, monkeypatch):
+    registry = NamedQueryRegistry.from_config({
+        "by_campaign": {"sql": SQL, "max_age_seconds": 300},
+        "daily": {"sql": "SELECT id, value FROM t WHERE day >= today() - {days:UInt32}", "refresh_seconds": 60, "precompute": [{"days": 7}]},
+    })
+    monkeypatch.setattr(clickhouse_mcp, "named_queries", registry)
+    params = {"org": "x' OR 1=1 --", "since": "2024-01-01 00:00:00"}
+
+    first = await clickhouse_mcp.run_named_query("by_campaign", params, format="compact")
+    assert first["precomputed"] is False and first["row_count"] == fake_client.rows
+    assert fake_client.queries[-1] == SQL and fake_client.query_parameters[-1] == params
+    second = await clickhouse_mcp.run_named_query("by_campaign", params)
+    assert second["precomputed"] is True and len(fake_client.queries) == 1
+    assert (await clickhouse_mcp.run_named_query("by_campaign", params, max_age_seconds=0))["precomputed"] is False
+    assert "missing since" in (await clickhouse_mcp.run_named_query("by_campaign", {"org": "x"}))["error"]
+
+    refresher = asyncio.ensure_future(clickhouse_mcp.refresh_named_queries())
+    try:
+        for _ in range(100):
+            if registry.lookup("daily", {"days": 7}):
+                break
+            await asyncio.sleep(0.01)
+    finally:
+        refresher.cancel()
+    assert fake_client.query_parameters[-1] == {"days": 7}
+    assert clickhouse_mcp.scheduler.stats()["named_queries"]["admitted"] == 1
+    daily = await clickhouse_mcp.run_named_query("daily", {"days": 7})
+    assert daily["precomputed"] is True and daily["age_seconds"] < 5 and daily["computed_at"].endswith("+00:00")
+    assert clickhouse_mcp.list_named_queries()["queries"][1]["parameters"] == {"days": "UInt32"}
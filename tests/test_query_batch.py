@@ -0,0 +1,43 @@
+import time
+
+import pytest
+
+import clickhouse_mcp
+
+
+@pytest.mark.anyio
+async def test_batch_runs_queries_in_parallel_and_reports_each(fake_client, monkeypatch):
+    monkeypatch.setattr(clickhouse_mcp, "BATCH_CONCURRENCY", 4)
+    fake_client.latency = 0.3
+    queries = [f"SELECT count() AS id FROM table_{i}" for i in range(4)] + ["DROP TABLE campaigns"]
+
+    started = time.perf_counter()
+    batch = await clickhouse_mcp.query_clickhouse_batch(queries, format="compact")
+    elapsed = time.perf_counter() - started
+
+    assert elapsed < fake_client.latency * 2
+    assert [result["index"] for result in batch["results"]] == [0, 1, 2, 3, 4]
+    assert batch["errors"] == 1
+    assert batch["results"][4]["error"] == "Only SELECT queries are allowed"
+    assert batch["results"][0]["rows"] == [[0, "value_0"]]
+    assert all(result["elapsed_ms"] >= 0 for result in batch["results"])
+    assert len(fake_client.queries) == 4
+
+
+@pytest.mark.anyio
+async def test_batch_respects_concurrency_limit(fake_client):
+    fake_client.latency = 0.1
+    started = time.perf_counter()
+    batch = await clickhouse_mcp.query_clickhouse_batch(
+        [f"SELECT {i} AS id FROM t" for i in range(3)], max_concurrency=1
+    )
+
+    assert time.perf_counter() - started >= 0.3
+    assert batch["errors"] == 0
+
+
+@pytest.mark.anyio
+async def test_batch_rejects_oversized_batches(fake_client):
+    too_many = ["SELECT 1"] * (clickhouse_mcp.BATCH_MAX_QUERIES + 1)
+    assert "error" in await clickhouse_mcp.query_clickhouse_batch(too_many)
+    assert "error" in await clickhouse_mcp.query_clickhouse_batch([])
@@ -0,0 +1,64 @@
+import pytest
+
+import clickhouse_mcp
+from query_budget import QueryBudget
+
+
+@pytest.mark.anyio
+async def test_estimate_is_reported_and_guards_are_sent(fake_client):
+    fake_client.rows = 10
+    result = await clickhouse_mcp.query_clickhouse("SELECT id, value FROM t")
+
+    # 10 of the table's 1000 rows at 100 bytes per row.
+    assert result["estimate"] == {"rows": 10, "bytes": 1000, "parts": 1, "marks": 1}
+    settings = fake_client.query_settings[0]
+    assert settings["readonly"] == 2
+    assert {"max_execution_time", "max_result_rows", "max_bytes_to_read"} <= set(settings)
+
+
+@pytest.mark.anyio
+async def test_over_budget_queries_are_rejected(fake_client, monkeypatch):
+    monkeypatch.setattr(clickhouse_mcp, "query_budget", QueryBudget(max_rows=5))
+    fake_client.rows = 10
+
+    result = await clickhouse_mcp.query_clickhouse("SELECT id, value FROM t")
+
+    assert "over the budget" in result["error"]
+    assert fake_client.queries == []
+
+
+@pytest.mark.anyio
+async def test_over_budget_queries_can_be_limited(fake_client, monkeypatch):
+    monkeypatch.setattr(clickhouse_mcp, "query_budget", QueryBudget(max_rows=5, action="limit", limit_rows=3))
+    fake_client.rows = 10
+
+    result = await clickhouse_mcp.query_clickhouse("SELECT id, value FROM t;")
+
+    assert result["truncated"] is True
+    assert fake_client.queries == ["SELECT * FROM (\nSELECT id, value FROM t\n) LIMIT 3"]
+    assert fake_client.query_settings[0]["read_overflow_mode"] == "break"
+    assert fake_client.query_settings[0]["max_rows_to_read"] == 5
+
+    await clickhouse_mcp.query_clickhouse("SELECT id FROM t -- ids\n; -- done")
+    assert fake_client.queries[-1] == "SELECT * FROM (\nSELECT id FROM t\n) LIMIT 3"
+    await clickhouse_mcp.query_clickhouse("SELECT id FROM t WHERE id > 1 -- recent ones")
+    assert fake_client.queries[-1] == "SELECT * FROM (\nSELECT id FROM t WHERE id > 1\n) LIMIT 3"
+
+
+def test_streaming_guards_do_not_cap_result_rows_or_time():
+    budget = QueryBudget()
+    assert "max_result_rows" not in budget.guard_settings(streaming=True)
+    assert "max_result_rows" in budget.guard_settings()
+    assert "max_execution_time" not in budget.guard_settings(streaming=True)
+    assert budget.guard_settings()["max_execution_time"] == budget.max_execution_time
+
+
+def test_failed_estimate_does_not_block_queries():
+    class Unexplainable:
+        def query(self, *args, **kwargs):
+            raise RuntimeError("EXPLAIN not supported")
+
+    budget = QueryBudget(max_rows=1)
+    estimate = budget.estimate(Unexplainable(), "SELECT 1")
+    assert estimate is None
+    assert budget.plan("SELECT 1", estimate)[2] is False
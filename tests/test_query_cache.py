@@ -0,0 +1,128 @@
+import asyncio
+import time
+
+import pytest
+
+import clickhouse_mcp
+from query_cache import ResultCache, SingleFlight, referenced_tables
+from sql_lexer import normalize_sql
+
+
+def test_normalize_sql_folds_whitespace_and_keyword_case_only():
+    assert normalize_sql("select  id\n FROM\tt where name = 'A  b';") == "SELECT id FROM t WHERE name = 'A  b'"
+    assert normalize_sql("SELECT campaignId FROM t") != normalize_sql("SELECT campaignid FROM t")
+    assert normalize_sql("select 'Foo'") != normalize_sql("select 'foo'")
+
+
+def test_referenced_tables():
+    sql = "SELECT * FROM db.`actualized_volumes` a JOIN campaigns c ON a.campaignId = c._id"
+    assert referenced_tables(sql) == {"actualized_volumes", "campaigns"}
+
+
+def test_entries_expire_after_ttl():
+    cache = ResultCache(ttl=0.01)
+    cache.put("k", [1], 10)
+    assert cache.get("k") == (True, [1])
+    time.sleep(0.02)
+    assert cache.get("k") == (False, None)
+    assert cache.stats()["entries"] == 0
+
+
+def test_eviction_is_bounded_by_bytes():
+    cache = ResultCache(max_bytes=100)
+    cache.put("a", "a", 40)
+    cache.put("b", "b", 40)
+    cache.get("a")
+    cache.put("c", "c", 40)
+    cache.put("huge", "huge", 500)
+
+    assert cache.get("b") == (False, None)
+    assert cache.get("a")[0] and cache.get("c")[0]
+    assert cache.get("huge") == (False, None)
+    assert cache.stats()["bytes"] == 80
+    assert cache.stats()["evictions"] == 1
+
+
+def test_invalidate_by_table():
+    cache = ResultCache()
+    cache.put("a", 1, 1, frozenset({"campaigns"}))
+    cache.put("b", 2, 1, frozenset({"actualized_volumes"}))
+
+    assert cache.invalidate("db.campaigns") == 1
+    assert cache.get("a") == (False, None)
+    assert cache.get("b") == (True, 2)
+    assert cache.invalidate() == 1
+
+
+@pytest.mark.anyio
+async def test_query_clickhouse_serves_repeats_from_cache(fake_client):
+    first = await clickhouse_mcp.query_clickhouse("SELECT count() FROM actualized_volumes")
+    second = await clickhouse_mcp.query_clickhouse("select count()\n  from actualized_volumes;")
+    bypassed = await clickhouse_mcp.query_clickhouse("SELECT count() FROM actualized_volumes", use_cache=False)
+
+    assert len(fake_client.queries) == 2
+    assert first["cache"] == {"hit": False, "coalesced": False, "hits": 0, "misses": 1, "coalesced_calls": 0}
+    assert second["cache"] == {"hit": True, "coalesced": False, "hits": 1, "misses": 1, "coalesced_calls": 0}
+    assert bypassed["cache"]["hit"] is False
+    assert second["rows"] == first["rows"]
+
+    assert clickhouse_mcp.invalidate_cache("actualized_volumes") == {"invalidated": 1}
+
+
+@pytest.mark.anyio
+async def test_single_flight_shares_one_execution():
+    flight = SingleFlight()
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "result"
+
+    results = await asyncio.gather(*[flight.do("k", work) for _ in range(5)])
+
+    assert calls == [1]
+    assert [result for result, _ in results] == ["result"] * 5
+    assert sorted(shared for _, shared in results) == [False] + [True] * 4
+    assert flight.stats() == {"executions": 1, "coalesced": 4, "in_flight": 0}
+
+
+@pytest.mark.anyio
+async def test_single_flight_propagates_errors_to_every_waiter():
+    flight = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("boom")
+
+    results = await asyncio.gather(flight.do("k", fail), flight.do("k", fail), return_exceptions=True)
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+@pytest.mark.anyio
+async def test_identical_concurrent_queries_are_coalesced_without_cache(fake_client, monkeypatch):
+    monkeypatch.setattr(clickhouse_mcp, "result_cache", ResultCache(ttl=0))
+    fake_client.latency = 0.1
+
+    results = await asyncio.gather(*[
+        clickhouse_mcp.query_clickhouse("SELECT DISTINCT campaignId FROM actualized_volumes")
+        for _ in range(4)
+    ])
+
+    assert len(fake_client.queries) == 1
+    assert sum(result["cache"]["coalesced"] for result in results) == 3
+    assert clickhouse_mcp.single_flight.stats()["coalesced"] == 3
+
+
+@pytest.mark.anyio
+async def test_fresh_reads_are_not_coalesced(fake_client):
+    fake_client.latency = 0.1
+
+    running = asyncio.ensure_future(clickhouse_mcp.query_clickhouse("SELECT DISTINCT campaignId FROM actualized_volumes"))
+    await asyncio.sleep(0.02)
+    fresh = await clickhouse_mcp.query_clickhouse("SELECT DISTINCT campaignId FROM actualized_volumes", use_cache=False)
+    await running
+
+    assert len(fake_client.queries) == 2
+    assert fresh["cache"]["coalesced"] is False
+    assert clickhouse_mcp.single_flight.stats()["coalesced"] == 0
@@ -0,0 +1,38 @@
+import asyncio
+import time
+
+import pytest
+
+import clickhouse_mcp
+
+
+@pytest.mark.anyio
+async def test_parallel_slow_queries_finish_in_about_one_query_time(fake_client):
+    fake_client.latency = 0.5
+    parallel = min(clickhouse_mcp.QUERY_CONCURRENCY, 8)
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*[
+        clickhouse_mcp.query_clickhouse(f"SELECT {i} AS id, 'x' AS value")
+        for i in range(parallel)
+    ])
+    elapsed = time.perf_counter() - started
+
+    assert len(fake_client.queries) == parallel
+    assert all(result["rows"] == [{"id": 0, "value": "value_0"}] for result in results)
+    # Sequential execution would take parallel * latency.
+    assert elapsed < fake_client.latency * 2
+
+
+@pytest.mark.anyio
+async def test_slow_query_does_not_block_event_loop(fake_client):
+    fake_client.latency = 0.5
+    query = asyncio.ensure_future(clickhouse_mcp.query_clickhouse("SELECT 1"))
+
+    ticks = 0
+    while not query.done():
+        await asyncio.sleep(0.01)
+        ticks += 1
+
+    assert ticks > 10
+    assert query.result()["rows"] == [{"id": 0, "value": "value_0"}]
@@ -0,0 +1,57 @@
+import pytest
+
+import clickhouse_mcp
+from query_profile import column_kind, parse_profile, profile_sql
+
+COLUMNS = [("amount", "Nullable(Decimal(18, 2))"), ("region", "LowCardinality(String)"), ("day", "Date"), ("tags", "Array(String)"), ("odd`name", "UInt8")]
+
+
+def test_profile_sql_picks_statistics_by_type():
+    assert [column_kind(column_type) for _, column_type in COLUMNS] == ["numeric", "categorical", "temporal", "other", "numeric"]
+    sql = profile_sql("SELECT * FROM sales;", COLUMNS, top_k=3)
+    assert sql.startswith("SELECT count() AS `rows`, count(`amount`) AS `c0_non_null`, uniq(`amount`) AS `c0_approx_distinct`, min(`amount`)")
+    assert "quantiles(0.05, 0.25, 0.5, 0.75, 0.95)(`amount`) AS `c0_quantiles`" in sql
+    assert "topK(3)(`region`) AS `c1_top`" in sql and "min(`region`)" not in sql
+    assert "max(`day`) AS `c2_max`" in sql and "avg(`day`)" not in sql
+    assert "uniq(`tags`) AS `c3_approx_distinct`" in sql and "`c3_min`" not in sql
+    assert "count(`odd\\`name`)" in sql
+    assert sql.endswith("FROM (\nSELECT * FROM sales\n)")
+    assert profile_sql("SELECT * FROM sales -- all of it", COLUMNS).endswith("FROM (\nSELECT * FROM sales\n)")
+    assert profile_sql("SELECT * FROM sales; -- done", COLUMNS).endswith("FROM (\nSELECT * FROM sales\n)")
+
+
+def test_parse_profile_summarises_each_column():
+    row = {
+        "rows": 10,
+        "c0_non_null": 8, "c0_approx_distinct": 7, "c0_min": 1, "c0_max": 9, "c0_mean": 4.123456789, "c0_quantiles": [1, 2, 4, 7, 9],
+        "c1_non_null": 10, "c1_approx_distinct": 2, "c1_top": ["eu", "us"],
+        "c2_non_null": 0, "c2_approx_distinct": 0, "c2_min": "1970-01-01", "c2_max": "1970-01-01",
+    }
+    profile = parse_profile(COLUMNS[:3], list(row), list(row.values()))
+    assert profile == {"row_count": 10, "columns": {
+        "amount": {"type": "Nullable(Decimal(18, 2))", "nulls": 2, "approx_distinct": 7, "min": 1, "max": 9, "mean": 4.123457,
+                   "quantiles": {"p5": 1, "p25": 2, "p50": 4, "p75": 7, "p95": 9}},
+        "region": {"type": "LowCardinality(String)", "nulls": 0, "approx_distinct": 2, "top": ["eu", "us"]},
+        "day": {"type": "Date", "nulls": 10, "approx_distinct": 0},
+    }}
+
+
+@pytest.mark.anyio
+async def test_profile_query_runs_one_aggregate_over_the_subquery(fake_client):
+    fake_client.responses["DESCRIBE TABLE"] = lambda query, parameters: (("name", "type"), [["id", "value"], ["UInt64", "String"]])
+    fake_client.responses["SELECT count() AS `rows`"] = lambda query, parameters: (
+        ("rows", "c0_non_null", "c0_approx_distinct", "c0_top"), [[3], [3], [2], [["a", "b"]]],
+    )
+
+    profile = await clickhouse_mcp.profile_query("SELECT id, value FROM t", columns=["value"], top_k=2)
+    assert profile["row_count"] == 3 and profile["estimate"]["rows"] == fake_client.rows
+    assert profile["columns"] == {"value": {"type": "String", "nulls": 0, "approx_distinct": 2, "top": ["a", "b"]}}
+    assert fake_client.internal_queries[-2] == "DESCRIBE TABLE (\nSELECT id, value FROM t\n)"
+    assert fake_client.internal_queries[-1].endswith("topK(2)(`value`) AS `c0_top` FROM (\nSELECT id, value FROM t\n)")
+
+    await clickhouse_mcp.profile_query("SELECT id, value FROM t -- all rows\n; -- done", columns=["value"], top_k=2)
+    assert fake_client.internal_queries[-2] == "DESCRIBE TABLE (\nSELECT id, value FROM t\n)"
+    assert fake_client.internal_queries[-1].endswith("FROM (\nSELECT id, value FROM t\n)")
+
+    assert "Unknown columns: missing" in (await clickhouse_mcp.profile_query("SELECT id FROM t", columns=["missing"]))["error"]
+    assert "error" in await clickhouse_mcp.profile_query("DROP TABLE t")
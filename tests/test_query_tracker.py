@@ -0,0 +1,131 @@
+import asyncio
+
+import httpx
+import pytest
+from sse_starlette.sse import AppStatus
+
+import clickhouse_mcp
+from query_tracker import QueryCancelledError, QueryTracker
+from test_auth import make_token
+
+
+async def wait_for(condition, timeout=2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "condition not met in time"
+        await asyncio.sleep(0.01)
+
+
+def kill_commands(client):
+    return [params["query_id"] for cmd, params in client.commands if cmd.startswith("KILL QUERY")]
+
+
+@pytest.mark.anyio
+async def test_cancelled_call_kills_its_query(fake_client):
+    fake_client.latency = 5
+    call = asyncio.ensure_future(clickhouse_mcp.query_clickhouse("SELECT id, value FROM slow"))
+    await wait_for(lambda: fake_client.queries)
+
+    call.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await call
+
+    query_id = fake_client.query_settings[0]["query_id"]
+    await wait_for(lambda: kill_commands(fake_client))
+    assert kill_commands(fake_client) == [query_id]
+    await wait_for(lambda: not clickhouse_mcp.query_tracker.in_flight())
+    assert clickhouse_mcp.query_tracker.stats() == {"in_flight": 0, "cancelled": 1, "killed": 1}
+
+
+@pytest.mark.anyio
+async def test_query_past_deadline_is_killed(fake_client, monkeypatch):
+    monkeypatch.setattr(clickhouse_mcp, "QUERY_DEADLINE", 0.1)
+    fake_client.latency = 5
+
+    result = await clickhouse_mcp.query_clickhouse("SELECT id, value FROM slow")
+
+    assert "deadline" in result["error"]
+    await wait_for(lambda: kill_commands(fake_client))
+    assert kill_commands(fake_client) == [fake_client.query_settings[0]["query_id"]]
+
+
+@pytest.mark.anyio
+async def test_coalesced_query_is_killed_only_when_every_caller_is_gone(fake_client):
+    fake_client.latency = 5
+    first = asyncio.ensure_future(clickhouse_mcp.query_clickhouse("SELECT id, value FROM slow"))
+    second = asyncio.ensure_future(clickhouse_mcp.query_clickhouse("SELECT id, value FROM slow"))
+    await wait_for(lambda: fake_client.queries)
+
+    first.cancel()
+    await asyncio.sleep(0.05)
+    assert kill_commands(fake_client) == []
+
+    second.cancel()
+    await wait_for(lambda: kill_commands(fake_client))
+    assert len(fake_client.queries) == 1
+
+
+def test_queued_query_cancelled_before_start_is_never_sent():
+    tracker = QueryTracker(lambda: None)
+    query_id = tracker.register("SELECT 1")
+
+    assert tracker.cancel(query_id) is True
+    with pytest.raises(QueryCancelledError):
+        tracker.start(query_id)
+    assert tracker.stats()["killed"] == 0
+    assert tracker.in_flight() == []
+
+
+async def open_sse_session(app, token):
+    """Open an SSE stream on `app` in the background; returns its task, endpoint, events and a disconnect trigger."""
+    # sse_starlette keeps one shutdown event, bound to the loop of the first stream; each test has its own loop.
+    AppStatus.should_exit_event = None
+    events = asyncio.Queue()
+    disconnected = asyncio.Event()
+
+    async def receive():
+        await disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.body" and message.get("body"):
+            await events.put(message["body"].decode())
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": "/sse", "raw_path": b"/sse", "query_string": b"", "root_path": "",
+        "headers": [(b"authorization", f"Bearer {token}".encode())],
+        "client": ("127.0.0.1", 50000), "server": ("127.0.0.1", 8081),
+    }
+    stream = asyncio.ensure_future(app(scope, receive, send))
+    first = await asyncio.wait_for(events.get(), 2)
+    endpoint = next(line[len("data: "):] for line in first.splitlines() if line.startswith("data: "))
+    return stream, endpoint, events, disconnected.set
+
+
+@pytest.mark.anyio
+async def test_closed_sse_session_kills_its_queries(fake_client, monkeypatch):
+    monkeypatch.setenv("ACCESS_TOKEN_SECRET", "secret")
+    fake_client.latency = 5
+    app = clickhouse_mcp.custom_sse_app()
+    stream, endpoint, events, disconnect = await open_sse_session(app, make_token("secret"))
+
+    headers = {"Authorization": f"Bearer {make_token('secret')}"}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test", headers=headers) as client:
+        await client.post(endpoint, json={"jsonrpc": "2.0", "id": 1, "method": "initialize", "params": {
+            "protocolVersion": "2024-11-05", "capabilities": {}, "clientInfo": {"name": "test", "version": "1"},
+        }})
+        await asyncio.wait_for(events.get(), 2)
+        await client.post(endpoint, json={"jsonrpc": "2.0", "method": "notifications/initialized"})
+        posted = await client.post(endpoint, json={"jsonrpc": "2.0", "id": 2, "method": "tools/call", "params": {
+            "name": "query_clickhouse", "arguments": {"sql_query": "SELECT id, value FROM slow"},
+        }})
+        assert posted.status_code == 202
+    await wait_for(lambda: fake_client.queries)
+
+    disconnect()
+    await asyncio.wait_for(stream, 2)
+
+    await wait_for(lambda: kill_commands(fake_client))
+    assert kill_commands(fake_client) == [fake_client.query_settings[0]["query_id"]]
+    await wait_for(lambda: not clickhouse_mcp.query_tracker.in_flight())
@@ -0,0 +1,52 @@
+import gzip
+import zlib
+
+import pytest
+
+from response_compression import CompressionMiddleware
+
+
+def app_sending(*chunks, content_type=b"application/json", headers=()):
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", content_type), *headers]})
+        for i, chunk in enumerate(chunks):
+            await send({"type": "http.response.body", "body": chunk, "more_body": i < len(chunks) - 1})
+    return app
+
+
+async def call(app, accept_encoding=b"gzip, deflate"):
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {"type": "http", "method": "GET", "path": "/", "headers": [(b"accept-encoding", accept_encoding)]}
+    await CompressionMiddleware(app, minimum_size=100)(scope, None, send)
+    return dict(messages[0]["headers"]), [m["body"] for m in messages[1:]]
+
+
+@pytest.mark.anyio
+async def test_compresses_bodies_above_the_threshold():
+    body = b'{"rows": [' + b"1, " * 200 + b"1]}"
+    headers, bodies = await call(app_sending(body))
+    assert headers[b"content-encoding"] == b"gzip" and headers[b"vary"] == b"Accept-Encoding"
+    assert int(headers[b"content-length"]) == len(bodies[0]) and gzip.decompress(bodies[0]) == body
+
+    # Small, not accepted, or already encoded: passed through untouched.
+    for sent, accept, extra in ((b"{}", b"gzip", ()), (body, b"identity", ()), (body, b"gzip", [(b"content-encoding", b"br")])):
+        headers, bodies = await call(app_sending(sent, headers=extra), accept)
+        assert headers.get(b"content-encoding") != b"gzip" and bodies == [sent]
+
+
+@pytest.mark.anyio
+async def test_sse_events_are_decodable_as_they_arrive():
+    events = [f"event: message\r\ndata: {{\"id\": {i}, \"rows\": [{'1, ' * 50}1]}}\r\n\r\n".encode() for i in range(5)]
+    headers, bodies = await call(app_sending(*events, b"", content_type=b"text/event-stream"))
+    assert headers[b"content-encoding"] == b"gzip" and b"content-length" not in headers
+
+    decoder = zlib.decompressobj(31)
+    for event, body in zip(events, bodies):
+        # Each event is flushed, so it decodes fully before the next one is sent.
+        assert decoder.decompress(body) == event
+    decoder.decompress(bodies[-1])
+    assert decoder.eof and sum(map(len, bodies)) < sum(map(len, events)) / 3
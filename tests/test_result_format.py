@@ -0,0 +1,40 @@
+import pytest
+
+import clickhouse_mcp
+from result_format import QueryData, encode_result
+
+DATA = QueryData(["id", "name"], [[1, 2], ["a", "b,c"]])
+
+
+def test_rows_format_matches_original_layout():
+    assert encode_result(DATA, "rows") == {"rows": [{"id": 1, "name": "a"}, {"id": 2, "name": "b,c"}]}
+
+
+def test_columnar_format_reuses_result_columns():
+    encoded = encode_result(DATA, "columnar")
+    assert encoded == {"columns": ["id", "name"], "data": [[1, 2], ["a", "b,c"]]}
+    assert encoded["data"][0] is DATA.columns[0]
+
+
+def test_compact_and_delimited_formats():
+    assert encode_result(DATA, "compact") == {"columns": ["id", "name"], "rows": [[1, "a"], [2, "b,c"]]}
+    assert encode_result(DATA, "csv")["text"] == 'id,name\n1,a\n2,"b,c"\n'
+    assert encode_result(DATA, "tsv")["text"] == "id\tname\n1\ta\n2\tb,c\n"
+
+
+def test_unknown_format():
+    with pytest.raises(ValueError):
+        encode_result(DATA, "xml")
+
+
+@pytest.mark.anyio
+async def test_query_clickhouse_formats(fake_client):
+    fake_client.rows = 3
+    columnar = await clickhouse_mcp.query_clickhouse("SELECT id, value FROM t", format="columnar")
+    rows = await clickhouse_mcp.query_clickhouse("SELECT id, value FROM t")
+
+    assert columnar["data"] == [[0, 1, 2], ["value_0", "value_1", "value_2"]]
+    assert columnar["row_count"] == 3
+    assert rows["rows"][2] == {"id": 2, "value": "value_2"}
+    assert len(fake_client.queries) == 1
+    assert "error" in await clickhouse_mcp.query_clickhouse("SELECT 1", format="xml")
@@ -0,0 +1,74 @@
+import pytest
+
+pytest.importorskip("pyarrow")
+
+import clickhouse_mcp
+from result_format import QueryData
+from result_store import ResultNotFoundError, ResultStore, aggregate
+
+
+def sample(rows=6):
+    return QueryData(
+        ["region", "amount", "note"],
+        [[["eu", "us"][i % 2] for i in range(rows)], list(range(rows)), [None if i % 3 else f"n{i}" for i in range(rows)]],
+    )
+
+
+def test_store_reads_back_and_evicts_least_recently_used(tmp_path):
+    store = ResultStore(str(tmp_path))
+    first = store.put(sample())
+    assert first["row_count"] == 6 and first["bytes"] > 0
+    assert first["schema"] == [{"name": "region", "type": "string"}, {"name": "amount", "type": "int64"}, {"name": "note", "type": "string"}]
+    table = store.table(first["handle"])
+    assert table.slice(2, 2).column("amount").to_pylist() == [2, 3]
+
+    store.max_bytes = first["bytes"] * 2
+    second = store.put(sample())
+    store.table(first["handle"])
+    third = store.put(sample())
+    with pytest.raises(ResultNotFoundError):
+        store.describe(second["handle"])
+    assert store.stats() == {"entries": 2, "bytes": first["bytes"] * 2, "evictions": 1}
+    assert sorted(path.name for path in tmp_path.iterdir()) == sorted(f"{h['handle']}.arrow" for h in (first, third))
+
+    assert store.drop(third["handle"]) and not store.drop(third["handle"])
+    with pytest.raises(ValueError, match="exceeds"):
+        ResultStore(str(tmp_path), max_bytes=10).put(sample())
+
+
+def test_aggregate_groups_and_orders_columns(tmp_path):
+    store = ResultStore(str(tmp_path))
+    table = store.table(store.put(sample())["handle"])
+
+    grouped = aggregate(table, ["sum(amount)", "count(*)", "count(note)"], ["region"]).sort_by("region")
+    assert grouped.column_names == ["region", "sum(amount)", "count(*)", "count(note)"]
+    assert grouped.to_pylist() == [
+        {"region": "eu", "sum(amount)": 6, "count(*)": 3, "count(note)": 1},
+        {"region": "us", "sum(amount)": 9, "count(*)": 3, "count(note)": 1},
+    ]
+    assert aggregate(table, ["max(amount)"]).to_pylist() == [{"max(amount)": 5}]
+    for bad in (["median(amount)"], ["sum(*)"], ["sum(missing)"]):
+        with pytest.raises(ValueError):
+            aggregate(table, bad)
+
+
+@pytest.mark.anyio
+async def test_large_results_are_returned_as_handles(fake_client, monkeypatch):
+    fake_client.rows = 50
+    monkeypatch.setattr(clickhouse_mcp, "RESULT_SPILL_BYTES", 100)
+
+    stored = await clickhouse_mcp.query_clickhouse("SELECT id, value FROM t", format="compact")
+    assert stored["row_count"] == 50 and "rows" not in stored
+    assert stored["preview"]["row_count"] == clickhouse_mcp.RESULT_PREVIEW_ROWS
+    assert stored["preview"]["rows"][0] == [0, "value_0"]
+    handle = stored["handle"]
+
+    page = await clickhouse_mcp.read_result(handle, offset=45, limit=10, columns=["value"], format="compact")
+    assert page == {"columns": ["value"], "rows": [[f"value_{i}"] for i in range(45, 50)], "row_count": 5, "total_rows": 50, "has_more": False}
+    summary = await clickhouse_mcp.aggregate_result(handle, ["count(*)", "sum(id)"])
+    assert summary["rows"] == [{"count(*)": 50, "sum(id)": sum(range(50))}] and summary["total_groups"] == 1
+
+    inline = await clickhouse_mcp.query_clickhouse("SELECT id, value FROM t", spill=False)
+    assert inline["row_count"] == 50 and len(inline["rows"]) == 50
+    assert clickhouse_mcp.drop_result(handle) == {"dropped": True}
+    assert "Unknown or evicted" in (await clickhouse_mcp.read_result(handle))["error"]
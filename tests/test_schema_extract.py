@@ -0,0 +1,38 @@
+import json
+
+from conftest import FakeClickHouseClient, FakeSchema
+from schema_extract import extract_schema, write_snapshot
+
+
+def test_snapshot_is_compact_and_incremental(tmp_path):
+    client = FakeClickHouseClient()
+    schema = FakeSchema(client)
+
+    snapshot, changed = extract_schema(client)
+    assert changed == ["actualized_volumes", "campaigns"]
+    assert snapshot["tables"]["campaigns"] == {
+        "engine": "MergeTree",
+        "modified": 1,
+        "sorting_key": "campaignId",
+        "columns": [{"name": "_id", "type": "String"}, {"name": "organizationId", "type": "String"}],
+    }
+
+    schema.tables["campaigns"] = (2, schema.tables["campaigns"][1] + [("name", "String")])
+    del schema.tables["actualized_volumes"]
+    updated, changed = extract_schema(client, snapshot)
+
+    assert changed == ["actualized_volumes", "campaigns"]
+    assert schema.fetches[-1] == ["campaigns"]
+    assert list(updated["tables"]) == ["campaigns"]
+    assert updated["tables"]["campaigns"]["columns"][-1] == {"name": "name", "type": "String"}
+
+
+def test_snapshot_file_is_deterministic(tmp_path):
+    client = FakeClickHouseClient()
+    FakeSchema(client)
+    first, second = tmp_path / "first.json", tmp_path / "second.json"
+
+    write_snapshot(extract_schema(client)[0], first)
+    write_snapshot(extract_schema(client, json.loads(first.read_text()))[0], second)
+
+    assert first.read_text() == second.read_text()
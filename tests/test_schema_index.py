@@ -0,0 +1,64 @@
+import asyncio
+
+import pytest
+
+import clickhouse_mcp
+from conftest import FakeSchema
+from schema_index import SchemaIndex
+
+
+@pytest.fixture
+def schema(fake_client, monkeypatch):
+    monkeypatch.setattr(clickhouse_mcp, "schema_index", SchemaIndex())
+    return FakeSchema(fake_client)
+
+
+def test_refresh_only_refetches_changed_tables(fake_client, schema):
+    index = SchemaIndex()
+    index.load(fake_client)
+    assert schema.fetches == [["actualized_volumes", "campaigns"]]
+
+    schema.tables["campaigns"] = (2, schema.tables["campaigns"][1] + [("name", "String")])
+    schema.tables["organizations"] = (1, [("_id", "String")])
+    del schema.tables["actualized_volumes"]
+
+    assert index.refresh(fake_client) == ["actualized_volumes", "campaigns", "organizations"]
+    assert schema.fetches[-1] == ["campaigns", "organizations"]
+    assert [table["name"] for table in index.list_tables()] == ["campaigns", "organizations"]
+    assert index.describe_table("campaigns")["columns"][-1] == {"name": "name", "type": "String", "comment": ""}
+    assert index.refresh(fake_client) == []
+
+
+@pytest.mark.anyio
+async def test_schema_tools_are_served_from_one_bulk_load(fake_client, schema):
+    tables = await clickhouse_mcp.list_tables()
+    described = await clickhouse_mcp.describe_table("db.actualized_volumes")
+    found = await clickhouse_mcp.search_columns("campaign")
+    missing = await clickhouse_mcp.describe_table("campaign")
+
+    assert [table["name"] for table in tables["tables"]] == ["actualized_volumes", "campaigns"]
+    assert [column["name"] for column in described["columns"]] == ["_id", "campaignId", "updatedAt"]
+    assert described["sorting_key"] == "campaignId"
+    assert found["columns"] == [{"table": "actualized_volumes", "name": "campaignId", "type": "String", "comment": ""}]
+    globbed = await clickhouse_mcp.search_columns("campaign*ID")
+    assert [column["name"] for column in globbed["columns"]] == ["campaignId"]
+    assert (await clickhouse_mcp.search_columns("^(\\w|\\w\\w)*-"))["columns"] == []
+    assert "error" in await clickhouse_mcp.search_columns("*" * 101)
+    assert missing["similar_tables"] == ["campaigns"]
+    assert len(schema.fetches) == 1
+    assert fake_client.queries == []
+
+
+@pytest.mark.anyio
+async def test_stale_index_refreshes_in_background(fake_client, schema):
+    clickhouse_mcp.schema_index.refresh_interval = 0
+    await clickhouse_mcp.list_tables()
+    schema.tables["organizations"] = (1, [("_id", "String")])
+
+    stale = await clickhouse_mcp.list_tables()
+    assert len(stale["tables"]) == 2
+    for _ in range(100):
+        if len(clickhouse_mcp.schema_index.list_tables()) == 3:
+            break
+        await asyncio.sleep(0.01)
+    assert len(clickhouse_mcp.schema_index.list_tables()) == 3
@@ -0,0 +1,88 @@
+import httpx
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Mount, Route
+
+from session_routing import FileSessionRegistry, MemorySessionRegistry, SessionRouter
+
+
+def test_file_registry_round_trip(tmp_path):
+    registry = FileSessionRegistry(str(tmp_path))
+    registry.register("abc123", "http://127.0.0.1:9001")
+    assert FileSessionRegistry(str(tmp_path)).lookup("abc123") == "http://127.0.0.1:9001"
+    registry.unregister("abc123")
+    assert registry.lookup("abc123") is None
+    assert registry.lookup("../etc/passwd") is None
+    with pytest.raises(ValueError):
+        registry.register("../escape", "http://127.0.0.1:9001")
+
+
+@pytest.mark.anyio
+async def test_stream_registers_its_session_until_it_closes():
+    registry = MemorySessionRegistry()
+    seen_during_stream = []
+
+    async def sse_app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"text/event-stream")]})
+        await send({
+            "type": "http.response.body",
+            "body": b"event: endpoint\r\ndata: /messages/?session_id=abc123\r\n\r\n",
+            "more_body": True,
+        })
+        seen_during_stream.append(registry.lookup("abc123"))
+        await send({"type": "http.response.body", "body": b""})
+
+    router = SessionRouter(sse_app, registry, owner="http://worker-a")
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=router), base_url="http://test") as client:
+        response = await client.get("/sse")
+    assert "session_id=abc123" in response.text
+    assert seen_during_stream == ["http://worker-a"]
+    assert registry.lookup("abc123") is None
+
+
+def message_app(name):
+    async def accept(request):
+        return PlainTextResponse(
+            f"{name} {request.query_params['session_id']} {request.headers.get('authorization')} {(await request.body()).decode()}",
+            status_code=202,
+        )
+    return Starlette(routes=[Mount("/messages/", Starlette(routes=[Route("/{rest:path}", accept, methods=["POST"])]))])
+
+
+@pytest.mark.anyio
+async def test_posts_are_forwarded_to_the_owning_worker():
+    registry = MemorySessionRegistry()
+    registry.register("aaa", "http://worker-a")
+    registry.register("bbb", "http://worker-b")
+
+    router = SessionRouter(message_app("b"), registry, owner="http://worker-b")
+    router._client = httpx.AsyncClient(transport=httpx.ASGITransport(app=message_app("a")))
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=router), base_url="http://test") as client:
+        forwarded = await client.post("/messages/?session_id=aaa", content=b"{}", headers={"Authorization": "Bearer t"})
+        local = await client.post("/messages/?session_id=bbb", content=b"{}")
+        below = await client.post("/messages/x?session_id=aaa", content=b"{}")
+
+    assert (forwarded.status_code, forwarded.text) == (202, "a aaa Bearer t {}")
+    assert local.text == "b bbb None {}"
+    assert below.text == "a aaa None {}"
+    assert router.forwarded == 2
+
+
+@pytest.mark.anyio
+async def test_unreachable_owner_drops_the_session():
+    registry = MemorySessionRegistry()
+    registry.register("aaa", "http://worker-a")
+
+    def refuse(request):
+        raise httpx.ConnectError("connection refused")
+
+    router = SessionRouter(message_app("b"), registry, owner="http://worker-b")
+    router._client = httpx.AsyncClient(transport=httpx.MockTransport(refuse))
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=router), base_url="http://test") as client:
+        response = await client.post("/messages/?session_id=aaa", content=b"{}")
+
+    assert (response.status_code, response.text) == (404, "Could not find session")
+    assert registry.lookup("aaa") is None
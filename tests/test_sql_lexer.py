@@ -0,0 +1,38 @@
+import os
+import json
+
+import pytest
+
+from sql_lexer import QueryValidator, analyze, normalize_sql
+
+with open(os.path.join(os.path.dirname(__file__), "files", "agent_queries.json")) as f:
+    CORPUS = json.load(f)
+
+
+@pytest.mark.parametrize("entry", CORPUS, ids=lambda entry: entry["sql"][:40])
+def test_agent_query_corpus_verdicts(entry):
+    assert (analyze(entry["sql"])[1] is None) == entry["allowed"]
+
+
+def test_errors_and_normalized_text():
+    assert analyze("SELECT updatedAt FROM t WHERE note = 'drop' -- delete later") == ("SELECT updatedAt FROM t WHERE note = 'drop'", None)
+    assert analyze("select 1; drop table t")[1] == "Multiple statements are not allowed"
+    assert analyze("SELECT 1 FROM t WHERE 1 IN (SELECT 1 FROM `x` UNION ALL SELECT 1 FROM t); ") == (
+        "SELECT 1 FROM t WHERE 1 IN (SELECT 1 FROM `x` UNION ALL SELECT 1 FROM t)", None,
+    )
+    assert analyze("SELECT * FROM t WHERE a = 1 OR delete = 1")[1] == "Query contains forbidden keyword DELETE"
+    assert analyze("SELECT 'abc")[1] == "Query has an unterminated string, quoted identifier or comment"
+    assert analyze("DESCRIBE t")[1] == "Only SELECT queries are allowed"
+    assert normalize_sql("select /* a */ id\n--b\nfrom t") == "SELECT id FROM t"
+
+
+def test_verdicts_are_remembered_by_text_and_normalized_text():
+    validator = QueryValidator(max_entries=4)
+    first = validator.check("select id from t")
+    assert first.error is None and first.normalized == "SELECT id FROM t"
+    assert validator.check("select id from t") is first
+    assert validator.check("SELECT  id\nFROM t -- again") is first
+    assert validator.stats() == {"entries": 3, "hits": 2, "misses": 1}
+
+    assert validator.check("DROP TABLE t").error
+    assert validator.stats()["entries"] == 4
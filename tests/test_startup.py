@@ -0,0 +1,43 @@
+import asyncio
+
+import pytest
+from starlette.applications import Starlette
+from starlette.testclient import TestClient
+
+import clickhouse_mcp
+from auth import TokenVerifier
+from clickhouse_mcp import JWTAuthMiddleware
+from conftest import FakeSchema
+from schema_index import SchemaIndex
+
+
+@pytest.fixture
+def warmup(fake_client, monkeypatch):
+    monkeypatch.setattr(clickhouse_mcp, "schema_index", SchemaIndex())
+    monkeypatch.setattr(clickhouse_mcp, "WARMUP", True)
+    monkeypatch.setattr(clickhouse_mcp, "WARMUP_CONNECTIONS", 2)
+    monkeypatch.setattr(clickhouse_mcp, "WARMUP_RETRY_SECONDS", 0.01)
+    monkeypatch.setattr(clickhouse_mcp, "warmup_state", {"clickhouse": False, "schema_index": False, "error": None})
+    app = Starlette()
+    app.add_middleware(JWTAuthMiddleware, verifier=TokenVerifier(["secret"]))
+    return TestClient(app)
+
+
+@pytest.mark.anyio
+async def test_readyz_waits_for_the_warm_up(fake_client, warmup):
+    assert warmup.get("/healthz").json() == {"status": "ok"}
+    response = warmup.get("/readyz")
+    assert response.status_code == 503
+    assert response.json() == {"status": "warming", "clickhouse": False, "schema_index": False}
+
+    # The schema isn't served yet, so loading the index fails and is retried.
+    task = asyncio.ensure_future(clickhouse_mcp.warm_up())
+    await asyncio.sleep(0.05)
+    response = warmup.get("/readyz")
+    assert response.status_code == 503 and response.json()["clickhouse"] and "error" in response.json()
+
+    FakeSchema(fake_client)
+    await asyncio.wait_for(task, 1)
+    assert warmup.get("/readyz").json() == {"status": "ready", "clickhouse": True, "schema_index": True}
+    assert clickhouse_mcp.pool.stats()["idle"] == 2
+    assert clickhouse_mcp.schema_index.loaded
@@ -0,0 +1,59 @@
+import json
+
+import httpx
+import pytest
+
+import clickhouse_mcp
+from stateless_http import StatelessHTTPEndpoint
+
+
+def endpoint_client():
+    endpoint = StatelessHTTPEndpoint(clickhouse_mcp.mcp._mcp_server)
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=endpoint), base_url="http://test")
+
+
+def request(request_id, method, params=None):
+    message = {"jsonrpc": "2.0", "id": request_id, "method": method}
+    if params is not None:
+        message["params"] = params
+    return message
+
+
+@pytest.mark.anyio
+async def test_initialize_and_tool_call_without_a_session(fake_client):
+    async with endpoint_client() as client:
+        initialized = (await client.post("/", json=request(1, "initialize", {
+            "protocolVersion": "2024-11-05",
+            "capabilities": {},
+            "clientInfo": {"name": "test", "version": "0"},
+        }))).json()
+        called = (await client.post("/", json=request(2, "tools/call", {
+            "name": "query_clickhouse",
+            "arguments": {"sql_query": "SELECT id, value FROM t", "format": "compact"},
+        }))).json()
+
+    assert initialized["result"]["serverInfo"]["name"] == "ClickhouseTools"
+    assert "tools" in initialized["result"]["capabilities"]
+    assert called["id"] == 2 and called["result"]["isError"] is False
+    payload = json.loads(called["result"]["content"][0]["text"])
+    assert payload["columns"] == list(fake_client.columns) and payload["row_count"] == fake_client.rows
+
+
+@pytest.mark.anyio
+async def test_batches_notifications_and_errors():
+    async with endpoint_client() as client:
+        batch = await client.post("/", json=[
+            request(1, "tools/list"),
+            {"jsonrpc": "2.0", "method": "notifications/initialized"},
+            request(2, "no/such/method"),
+            request(3, "tools/call", {"arguments": {}}),
+        ])
+        notification = await client.post("/", json={"jsonrpc": "2.0", "method": "notifications/initialized"})
+        malformed = await client.post("/", content=b"{not json")
+
+    listed, unknown, invalid = batch.json()
+    assert "query_clickhouse" in {tool["name"] for tool in listed["result"]["tools"]}
+    assert unknown["error"]["code"] == -32601
+    assert invalid["id"] == 3 and invalid["error"]["code"] == -32602
+    assert notification.status_code == 202
+    assert malformed.status_code == 400 and malformed.json()["error"]["code"] == -32700
@@ -0,0 +1,37 @@
+import pytest
+
+import clickhouse_mcp
+from transfer import Transfer
+
+
+def test_compression_options():
+    assert Transfer("auto").client_compression is True
+    assert Transfer("none").client_compression is False
+    assert Transfer("ZSTD").client_compression == "zstd"
+    with pytest.raises(ValueError, match="compression"):
+        Transfer("brotli")
+    with pytest.raises(ValueError, match="transfer format"):
+        Transfer(transfer_format="csv")
+
+
+def test_native_transfer_keeps_summary(fake_client):
+    fake_client.rows = 3
+    data, summary = Transfer().query(fake_client, "SELECT id, value FROM t", {"x": 1}, {"query_id": "q"})
+    assert data.column_names == ["id", "value"] and data.columns[0] == [0, 1, 2]
+    assert summary["read_rows"] == "3"
+    assert fake_client.query_parameters == [{"x": 1}]
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("compression, codec", [("auto", "lz4_frame"), ("zstd", "zstd"), ("gzip", "none")])
+async def test_arrow_transfer(fake_client, monkeypatch, compression, codec):
+    pytest.importorskip("pyarrow")
+    fake_client.rows = 4
+    monkeypatch.setattr(clickhouse_mcp, "transfer", Transfer(compression, "arrow"))
+
+    result = await clickhouse_mcp.query_clickhouse("SELECT id, value FROM t", format="compact")
+    assert result["columns"] == ["id", "value"]
+    assert result["rows"] == [[i, f"value_{i}"] for i in range(4)]
+    settings = fake_client.query_settings[-1]
+    assert settings["output_format_arrow_compression_method"] == codec
+    assert ("enable_http_compression" in settings) == (compression == "gzip")